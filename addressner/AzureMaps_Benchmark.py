@@ -0,0 +1,53 @@
+from json import load as json_load
+from json import dump as json_dump
+from time import perf_counter
+from asyncio import run
+from pandas import DataFrame
+from addressner.sources.fetching import GeocodingClient
+from addressner.sources.mock_azure import MockAzureMaps
+
+
+# Addresses to query (the test addresses of the NER, already clean)
+n_queries = 2000
+with open('../Data/NER/train_test_pred/test_batch0.json', 'r') as f:
+    addresses = [address for address, _ in json_load(f)][:n_queries]
+
+# Behaviour of the local stand-in of Azure Maps: latency (mean and jitter), ratio of 5xx errors and 429 throttling
+server_config = {'latency': 0.05, 'jitter': 0.02, 'error_rate': 0.01, 'throttle_rps': 500, 'retry_after': 0.5,
+                 'seed': 0}
+
+# Settings of the client to sweep: requests per second, simultaneous queries and attempts per query
+settings = [{'rate': rate, 'concurrency': concurrency, 'attempts': 5}
+            for rate in [100, 400, 1000] for concurrency in [10, 60, 200]]
+
+
+async def benchmark(setting: dict) -> dict:
+    server = MockAzureMaps(**server_config)
+    url = await server.start()
+    queries = [url + '?api-version=1.0&language=en-US&query=' + address for address in addresses]
+    async with GeocodingClient(backoff=0.1, **setting) as client:
+        t0 = perf_counter()
+        results = await client.fetch_all(queries)
+        t = perf_counter() - t0
+        stats = client.stats()
+    await server.stop()
+
+    ok = sum(1 for result in results if isinstance(result, dict))
+    return {**setting,
+            'throughput': ok / t,
+            'p50_ms': stats['latency_p50'] * 1000,
+            'p95_ms': stats['latency_p95'] * 1000,
+            'p99_ms': stats['latency_p99'] * 1000,
+            'requests': stats['requests'],
+            'retries': stats['retries'],
+            'throttled': server.throttled,
+            'failures': stats['failures'],
+            'duplicates': stats['duplicates']}
+
+
+if __name__ == '__main__':
+    report = [run(benchmark(setting)) for setting in settings]
+    print(DataFrame(report).round(1).to_string(index=False))
+
+    with open('../Data/AzureMaps results/benchmark.json', 'w') as f:
+        json_dump({'server': server_config, 'n_queries': len(addresses), 'results': report}, f)
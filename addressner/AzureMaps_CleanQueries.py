@@ -1,30 +1,28 @@
-from pandas import read_csv
 from zipfile import ZipFile
-from addressner.sources.cleaning import cleaning
+from tqdm import tqdm
+from addressner.sources.cleaning import Cleaner
+from addressner.sources.ingest import read_batches, prefetch, clean_batches, join_fields
 from pickle import dump as pickle_dump
+from addressner.sources.instrumentation import save_report
 
 
-# Load the data. The csv separator is "μ" (\u03bc)
-header = ['CLIENT_ID', 'ADDRESS', 'POSTALCODE', 'CITY', 'STATE', 'COUNTRY']
-zf_read = ZipFile('../Data/20210311_GBOGL_Addresses.zip')
-df = read_csv(zf_read.open('20210311_GBOGL_Addresses.csv'),
-              sep='\u03bc', header=None, names=header, engine='python')
-zf_read.close()
+# Stream the data in batches. The csv separator is "μ" (\u03bc) and the columns are
+# 'CLIENT_ID', 'ADDRESS', 'POSTALCODE', 'CITY', 'STATE', 'COUNTRY'
+batches = prefetch(read_batches('../Data/20210311_GBOGL_Addresses.zip', '20210311_GBOGL_Addresses.csv'))
 
-# Drop 'NaN's in 'ADDRESS' column
-df.dropna(subset=['ADDRESS'], inplace=True)
-df.reset_index(drop=True, inplace=True)
-
-# Clean 'ADDRESS' field
-df['ADDRESS_clean'] = [cleaning(row) for row in df['ADDRESS'].to_list()]
-
-# Create new column 'all_clean' joining all information of each row
-df['all_clean'] = df['ADDRESS_clean'].str.cat(df[['POSTALCODE', 'CITY', 'STATE', 'COUNTRY']], sep=' ', na_rep='')
+# Clean 'ADDRESS' field of the records with 'ADDRESS' (while the next batches are read), and join all information of
+# each record: 'all_clean'
+all_clean = []
+for batch in tqdm(clean_batches(batches, Cleaner(), text=lambda record: record[1]), desc='Cleaning batches'):
+    all_clean += [join_fields((address_clean,) + record[2:]) for record, address_clean in batch]
 
 # Save clean addresses into .txt file, and compress it
 with open('../Data/AzureMaps results/addresses.txt', 'wb') as f:
-    pickle_dump(df['all_clean'].to_list(), f)
+    pickle_dump(all_clean, f)
 
 zf_write = ZipFile('addresses.zip', 'w')
 zf_write.write('addresses.csv')
 zf_write.close()
+
+# Save timing and throughput of the cleaning
+save_report('../Data/reports/AzureMaps_CleanQueries.json')
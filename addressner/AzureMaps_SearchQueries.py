@@ -1,10 +1,12 @@
 from zipfile import ZipFile
 from pickle import load as pickle_load
 from time import time, strftime
-from addressner.sources.fetching import fetch_all
-from asyncio import get_event_loop
+from addressner.sources.fetching import GeocodingClient
+from addressner.sources.geocache import GeocodingCache
+from addressner.sources.sink import ResultsSink, fetch_to_sink, import_slices
+from asyncio import run
 from addressner.sources.elapsed_time import elapsed_time
-from json import dump as json_dump
+from addressner.sources.instrumentation import save_report
 
 
 # Load addresses
@@ -20,22 +22,29 @@ query_template = 'https://atlas.microsoft.com/search/address/json?&subscription-
 
 # Queries for addresses
 queries = [query_template.format(a) for a in addresses]
-# Modify these values in order to fetch more or less queries at a time
-start = 0
-end = 2000
 
 
-print(f'Getting results. Started at {strftime("%d/%m/%Y-%H:%M:%S")} ...', end=' ')
-t0 = time()
-
-if __name__ == '__main__':
-    loop = get_event_loop()
-    results = loop.run_until_complete(fetch_all(2000, 5, queries[start:end], loop))
+async def search(urls: list) -> dict:
+    # Modify these values in order to change the requests per second, simultaneous queries and attempts per query.
+    # Results already in the cache (from previous runs) are not queried again
+    with GeocodingCache('../Data/AzureMaps results/geocoding_cache.sqlite') as cache:
+        async with GeocodingClient(rate=50, concurrency=60, attempts=5, cache=cache) as client:
+            # Every result is appended to 'AMr.jsonl' as soon as it completes. If the job stops, running it again
+            # resumes from the checkpoint. Results of former runs saved in 'AMr_{start}-{end}.json' slices are imported
+            # first, so they are not queried again
+            with ResultsSink('../Data/AzureMaps results/AMr.jsonl') as sink:
+                import_slices('../Data/AzureMaps results/', sink, len(urls))
+                await fetch_to_sink(client, urls, sink)
+            return client.stats()
 
-print(f'({elapsed_time(time() - t0)})')
-print('Done!')
 
+print(f'Getting results. Started at {strftime("%d/%m/%Y-%H:%M:%S")} ...')
+t0 = time()
 
-# Save results
-with open('../Data/AzureMaps results/AMr_{}-{}.json'.format(start, end), 'w', encoding='utf-8') as f:
-    json_dump(results, f)
+if __name__ == '__main__':
+    stats = run(search(queries))
+    print(f'({elapsed_time(time() - t0)})')
+    print('Done!')
+    print(stats)
+    # Save the latency histogram of the queries
+    save_report('../Data/reports/AzureMaps_SearchQueries.json')
@@ -1,67 +1,79 @@
-from pandas import read_csv, DataFrame
-from zipfile import ZipFile
-from addressner.sources.cleaning import cleaning
+from itertools import islice
+from addressner.sources.cleaning import Cleaner
+from addressner.sources.ingest import read_batches, prefetch, clean_batches, join_fields
 from tqdm import tqdm
-from json import load as json_load
 from json import dump as json_dump
 from pickle import dump as pickle_dump
-from addressner.sources.address_labelling import address_labelling
+from addressner.sources.address_labelling import labelling_stage
+from addressner.sources.sink import ResultsSink, ResultsReader, import_slices
+from addressner.sources.instrumentation import save_report
 
 
-# Load the data. The csv separator is "μ" (\u03bc)
-header = ['CLIENT_ID', 'ADDRESS', 'POSTALCODE', 'CITY', 'STATE', 'COUNTRY']
+# Number of records that were labelled with Azure Maps
 n_rows = 88000
-zf = ZipFile('../Data/20210311_GBOGL_Addresses.zip')
-df = read_csv(zf.open('20210311_GBOGL_Addresses.csv'),
-              sep='\u03bc', header=None, names=header, engine='python', nrows=n_rows*1.25)
-zf.close()
-
-# Drop 'NaN's in 'ADDRESS' column and preserve only the records that were labelled with Azure Maps
-df.dropna(subset=['ADDRESS'], inplace=True)
-df.reset_index(drop=True, inplace=True)
-df = df[:n_rows]
-
-# Create new column 'all' joining all information of each row: the full address
-df['all'] = df['ADDRESS'].str.cat(df[df.columns[2:]], sep=' ', na_rep='')
-
-# Clean the addresses
-df['all_clean'] = [cleaning(row, additional_info=False) for row in tqdm(df['all'].to_list(), desc='Cleaning addresses')]
-
-# Read the results of the queries to Azure Maps
-dt = 2000
-tmax = n_rows
-results = []
-for t in tqdm(range(0, tmax, dt), desc='Reading Azure Maps results'):
-    with open(f'../Data/AzureMaps results/AMr_{t}-{t+dt}.json', 'r', encoding='utf-8') as f:
-        results += json_load(f)
 
 # Features of the results that are kept for future NER and their abbreviations
 features = ['streetNumber', 'streetName', 'municipality', 'countrySubdivision',
             'countrySubdivisionName', 'postalCode', 'extendedPostalCode', 'country']
 entities = ['N', 'S', 'M', 'SP', 'SP', 'PC', 'PC', 'C']
 
-# Get the features from the Azure Maps results
-f = []
-exception = '-'
-for res in results:
-    r = []
-    for feat in features:
-        try:
-            r.append(res['results'][0]['address'][feat].lower())
-        except:
-            r.append(exception)
-    f.append(r)
+# The pool workers of the labelling stage import this script, so everything runs only in the main process
+if __name__ == '__main__':
+    # Import the results saved in 'AMr_{start}-{end}.json' slices by former runs (if any), then read the results of the
+    # queries to Azure Maps in row order
+    with ResultsSink('../Data/AzureMaps results/AMr.jsonl') as sink:
+        import_slices('../Data/AzureMaps results/', sink, n_rows)
+    results = ResultsReader('../Data/AzureMaps results/AMr.jsonl')
+
+    # Get the features from the Azure Maps results. Every row must have a result: a missing one would be labelled as if
+    # Azure Maps had found nothing. Results that are errors or lack a feature get '-' for it
+    f = []
+    exception = '-'
+    missing = []
+    errors = 0
+    for i in tqdm(range(n_rows), desc='Reading Azure Maps results'):
+        res = results[i]
+        if res is None:
+            missing.append(i)
+            continue
+        if isinstance(res, dict) and 'error' in res:
+            errors += 1
+        r = []
+        for feat in features:
+            try:
+                r.append(res['results'][0]['address'][feat].lower())
+            except (KeyError, IndexError, TypeError, AttributeError):
+                r.append(exception)
+        f.append(r)
+    results.close()
+    if missing:
+        raise ValueError(f'{len(missing)} of the {n_rows} rows have no Azure Maps result (first rows: {missing[:10]}). '
+                         f'Run "AzureMaps_SearchQueries" to query them')
+    if errors:
+        print(f'{errors} of the {n_rows} Azure Maps results are errors, so their features are \'{exception}\'')
+
+    # Stream the data in batches. The csv separator is "μ" (\u03bc) and the columns are
+    # 'CLIENT_ID', 'ADDRESS', 'POSTALCODE', 'CITY', 'STATE', 'COUNTRY'
+    batches = prefetch(read_batches('../Data/20210311_GBOGL_Addresses.zip', '20210311_GBOGL_Addresses.csv',
+                                    nrows=int(n_rows*1.25)))
+
+    # Drop records without 'ADDRESS', join all information of each record (the full address) and clean it. Only the
+    # records that were labelled with Azure Maps are preserved
+    clean = (address_clean for batch in clean_batches(batches, Cleaner(additional_info=False),
+                                                      text=lambda record: join_fields(record[1:]))
+             for _, address_clean in batch)
+    records = ((address_clean,) + tuple(r) for address_clean, r in zip(islice(clean, n_rows), f))
 
-# Assign the features to the corresponding address in a dataframe
-data = df['all_clean'].to_frame().merge(DataFrame(f, columns=features), left_index=True, right_index=True)
+    # Label addresses in a format that spaCy will understand, in parallel, as they are cleaned. Records are plain
+    # tuples (clean address, feature values) and labelled chunks are written incrementally to a JSON lines file
+    labelled_data = labelling_stage(entities, records, path='../Data/NER/ner_train.jsonl')
 
-# Label addresses in a format that spaCy will understand
-labelled_data = [address_labelling(entities, data['all_clean'].iloc[i], data[features].iloc[i])
-                 for i in tqdm(range(data.shape[0]), desc='Building NER training')]
+    # Save addresses labelled
+    with open('../Data/NER/ner_train.txt', 'wb') as ftxt:
+        pickle_dump(labelled_data, ftxt)
 
-# Save addresses labelled
-with open('../Data/NER/ner_train.txt', 'wb') as ftxt:
-    pickle_dump(labelled_data, ftxt)
+    with open('../Data/NER/ner_train.json', 'w') as fjson:
+        json_dump(labelled_data, fjson)
 
-with open('../Data/NER/ner_train.json', 'w') as fjson:
-    json_dump(labelled_data, fjson)
+    # Save timing and throughput of the stages (cleaning, labelling)
+    save_report('../Data/reports/NER_1_Configuration.json')
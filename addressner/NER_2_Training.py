@@ -1,13 +1,12 @@
-from pickle import load as pickle_load
-from addressner.sources.ner import train_test_split, address_ner
+from os.path import exists
+from addressner.sources.ner import train_grid
+from addressner.sources.corpus import convert
+from addressner.sources.splits import Splits
+from addressner.sources.instrumentation import save_report
 from warnings import filterwarnings
 filterwarnings('ignore', category=UserWarning)
 
 
-# Load data
-with open('../Data/NER/labelled_data.txt', 'rb') as f:
-    data = pickle_load(f)
-
 # Entities for NER
 entities = ['N', 'S', 'M', 'SP', 'PC', 'C']
 # LEGEND
@@ -18,13 +17,27 @@ entities = ['N', 'S', 'M', 'SP', 'PC', 'C']
 #    PC = postalCode / extendedPostalCode
 #     C = country
 
-# Train-test split
-n_batches = 5
-tt = [train_test_split(data, path='../Data/NER/train_test_pred/', suffix=f'batch{batch}') for batch in range(n_batches)]
-train_batches, test_batches = list(zip(*tt))
+# Training configuration: epochs, compounding batch sizes (start, stop, compound), dropout, shuffling and base seed
+# (every model gets its own seed, see "train_grid")
+training = {'n_iter': 10, 'batch_size': (4, 32, 1.001), 'drop': 0.2, 'shuffle': True, 'seed': 0}
+# Number of models trained at the same time
+n_jobs = 4
+
+# The pool workers import this script, so everything runs only in the main process
+if __name__ == '__main__':
+    # Labelled data as a corpus file
+    if not exists('../Data/NER/labelled_data.ner'):
+        convert('../Data/NER/labelled_data.txt')
+
+    # Train-test splits (seeded), saved as indices of the records of the corpus
+    n_batches = 5
+    splits = Splits('../Data/NER/labelled_data.ner', n_splits=n_batches, train_ratio=0.7, seed=0)
+    splits.save('../Data/NER/train_test_pred/splits.json')
+
+    # Train NER models, one per batch and language (english, spanish). Each worker opens its training split lazily
+    jobs = [(lang + '_' + str(b), lang, ('../Data/NER/train_test_pred/splits.json', b))
+            for lang in ['en', 'es'] for b in range(n_batches)]
+    train_grid(jobs, n_jobs=n_jobs, entities=entities, path='../Data/NER/models/', **training)
 
-# Train NER models, one per batch and language (english, spanish)
-nlp_en = [address_ner(train_batches[b], entities=entities, lang='en', name='en_'+str(b), path='../Data/NER/models/')
-          for b in range(n_batches)]
-nlp_es = [address_ner(train_batches[b], entities=entities, lang='es', name='es_'+str(b), path='../Data/NER/models/')
-          for b in range(n_batches)]
+    # Save timing of the stages (training stages only if "n_jobs=1", the pool workers keep their own)
+    save_report('../Data/reports/NER_2_Training.json')
@@ -1,47 +1,33 @@
-from pickle import load as pickle_load
-from spacy import load as spacy_load
-from tqdm import tqdm
-from addressner.sources.ner import predict, evaluate, accuracy
-from numpy import mod
+from addressner.sources.ensemble import evaluate_splits
+from addressner.sources.registry import ModelRegistry
+from addressner.sources.instrumentation import save_report
+from addressner.sources.splits import Splits
 from json import dump as json_dump
 from warnings import filterwarnings
 filterwarnings('ignore', category=UserWarning)
 
 
-# Load train and test addresses
-n_batches = 5
-trains = []
-tests = []
-for b in range(n_batches):
-    with open('../Data/NER/train_test_pred/train_batch' + str(b) + '.txt', 'rb') as f:
-        trains.append(pickle_load(f))
-    with open('../Data/NER/train_test_pred/test_batch' + str(b) + '.txt', 'rb') as f:
-        tests.append(pickle_load(f))
+# Train and test addresses of every split (read lazily from the labelled corpus)
+splits = Splits.load('../Data/NER/train_test_pred/splits.json')
+n_batches = len(splits)
 
-# Load NER models
-model_names = ['en_' + str(b) for b in range(n_batches)] + ['es_' + str(b) for b in range(n_batches)]
-ner_models = [spacy_load('../Data/NER/models/' + mn) for mn in tqdm(model_names)]
+# NER models, loaded when first used (the models of one language at a time, sharing the vocab)
+registry = ModelRegistry('../Data/NER/models/', max_models=n_batches, verbose=True)
 
-# Make predictions for the train and the test data
-preds_train = [predict(ner_models[i], trains[mod(i, n_batches)], des='train_'+mn,
-                       path='../Data/NER/train_test_pred/pred/', suffix='train_'+mn)
-               for i, mn in enumerate(model_names)]
-preds_test = [predict(ner_models[i], tests[mod(i, n_batches)], des='test_'+mn,
-                      path='../Data/NER/train_test_pred/pred/', suffix='test_'+mn)
-              for i, mn in enumerate(model_names)]
-
-# Evaluate models
-train_scores = {mn: evaluate(ner_models[i], trains[mod(i, n_batches)], des='train_' + mn)
-                for i, mn in enumerate(model_names)}
-test_scores = {mn: evaluate(ner_models[i], tests[mod(i, n_batches)], des='test_' + mn)
-               for i, mn in enumerate(model_names)}
-
-# Compute accuracy of the models
-for i, mn in enumerate(model_names):
-    train_scores[mn]['acc'] = accuracy(trains[mod(i, n_batches)], preds_train[mod(i, n_batches)])
-    test_scores[mn]['acc'] = accuracy(tests[mod(i, n_batches)], preds_test[mod(i, n_batches)])
+# Make predictions for the train and the test data and evaluate models (accuracy included): every text is tokenised
+# once per language and parsed by the models of all the splits at a time
+train_scores = {}
+test_scores = {}
+for lang in ['en', 'es']:
+    lang_train_scores, lang_test_scores = evaluate_splits(registry, splits, lang,
+                                                          path='../Data/NER/train_test_pred/pred/')
+    train_scores.update(lang_train_scores)
+    test_scores.update(lang_test_scores)
 
 # Save scores
 scores = {'train': train_scores, 'test': test_scores}
 with open('../Data/NER/models_scores.json', 'w') as f:
     json_dump(scores, f)
+
+# Save timing and throughput of the predictions
+save_report('../Data/reports/NER_3_Evaluation.json')
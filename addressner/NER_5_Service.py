@@ -0,0 +1,28 @@
+from addressner.sources.parser import AddressParser, serve
+from addressner.sources.parsecache import ParseCache
+from addressner.sources.registry import ModelRegistry
+from addressner.sources.ensemble import Ensemble
+from warnings import filterwarnings
+filterwarnings('ignore', category=UserWarning)
+
+
+# Model to serve (saved in '../Data/NER/models/')
+model = 'en_0'
+# Models to serve by majority vote instead (e.g. ['en_0', 'en_1', 'en_2', 'en_3', 'en_4']), if any
+ensemble = None
+# Micro-batching: maximum addresses per batch and maximum wait for a batch to fill up (seconds)
+max_batch_size = 64
+max_wait = 0.005
+# Parse cache: maximum parses in memory and SQLite database where the least recently used are spilled
+cache_size = 100000
+cache_path = '../Data/NER/parse_cache.sqlite'
+
+if __name__ == '__main__':
+    cache = ParseCache(max_size=cache_size, path=cache_path)
+    if ensemble:
+        registry = ModelRegistry('../Data/NER/models/', max_models=len(ensemble))
+        model = Ensemble({name: registry[name] for name in ensemble})
+    parser = AddressParser(model, max_batch_size=max_batch_size, max_wait=max_wait, cache=cache)
+    # e.g. curl 'http://127.0.0.1:8080/parse?address=calle mayor 5, 28013 madrid, spain'
+    serve(parser, host='127.0.0.1', port=8080)
+    cache.close()
@@ -0,0 +1,27 @@
+from addressner.sources.ner import fine_tune
+from addressner.sources.corpus import load_data
+from addressner.sources.splits import Splits
+from addressner.sources.instrumentation import save_report
+from warnings import filterwarnings
+filterwarnings('ignore', category=UserWarning)
+
+
+# New labelled addresses (e.g. the last slice of geocoded addresses, labelled with "NER_1_Configuration")
+new_data_path = '../Data/NER/labelled_data_new.json'
+
+# Fine-tuning configuration: old records replayed per new record, epochs, compounding batch sizes, dropout
+replay_ratio = 1.0
+training = {'n_iter': 3, 'batch_size': (4, 32, 1.001), 'drop': 0.2, 'shuffle': True, 'seed': 0}
+
+if __name__ == '__main__':
+    new_data = load_data(new_data_path)
+
+    # Every model replays records of the split it was trained on
+    splits = Splits.load('../Data/NER/train_test_pred/splits.json')
+    for lang in ['en', 'es']:
+        for b in range(len(splits)):
+            fine_tune(new_data, lang + '_' + str(b), path='../Data/NER/models/', replay=splits.train(b),
+                      replay_ratio=replay_ratio, progress=False, **training)
+
+    # Save timing of the fine-tuning
+    save_report('../Data/reports/NER_6_FineTuning.json')
@@ -0,0 +1,62 @@
+from spacy import load as spacy_load
+from addressner.sources.cleaning import cleaning, Cleaner
+from addressner.sources.address_labelling import levenshtein, identify_features, address_labelling
+from addressner.sources.ner import predict, evaluate
+from addressner.sources.synthetic import synthetic_addresses, ENTITIES
+from addressner.sources.benchmark import Suite
+from warnings import filterwarnings
+filterwarnings('ignore', category=UserWarning)
+
+
+# Synthetic addresses (generated offline, seeded): number per case, languages, lengths in words and noise
+n_addresses = 200
+langs = ['en', 'es']
+lengths = [None, 16, 32, 64]
+noise = 0.1
+batch_sizes = [1, 32, 256, 1000]
+
+# Model of the inference benchmarks, and where results and baseline are saved
+model_path = '../Data/NER/models/en_0'
+results_path = '../Data/benchmarks/results.json'
+baseline_path = '../Data/benchmarks/baseline.json'
+# Relative slowdown of a case over the baseline that counts as a regression
+threshold = 0.1
+
+if __name__ == '__main__':
+    suite = Suite(repeat=5, min_time=0.2)
+
+    # Hot paths of cleaning and labelling, per call, by language and address length
+    for lang in langs:
+        for n_words in lengths:
+            addresses = synthetic_addresses(n_addresses, lang, n_words, noise, seed=0)
+            length = 'min' if n_words is None else n_words
+            suite.add(f'cleaning/{lang}/words={length}', cleaning,
+                      [(raw,) for raw, _, _ in addresses])
+            suite.add(f'levenshtein/{lang}/words={length}', levenshtein,
+                      [(tags[1], clean) for _, tags, (clean, _) in addresses])
+            suite.add(f'identify_features/{lang}/words={length}', identify_features,
+                      [(clean, tags) for _, tags, (clean, _) in addresses])
+            suite.add(f'address_labelling/{lang}/words={length}', address_labelling,
+                      [(ENTITIES, clean, tags) for _, tags, (clean, _) in addresses])
+
+    # Cleaning by batch size (latency per batch)
+    cleaner = Cleaner()
+    raws = [raw for raw, _, _ in synthetic_addresses(max(batch_sizes), 'en', None, noise, seed=1)]
+    for batch_size in batch_sizes:
+        suite.add(f'Cleaner.clean_many/batch={batch_size}', lambda batch: list(cleaner.clean_many(batch)),
+                  [(raws[:batch_size],)], batch_size=batch_size)
+
+    # Inference with the shipped model by batch size (latency per batch)
+    model = spacy_load(model_path)
+    records = [record for _, _, record in synthetic_addresses(max(batch_sizes), 'en', None, noise, seed=2)]
+    for batch_size in batch_sizes:
+        suite.add(f'predict/batch={batch_size}',
+                  lambda data: predict(model, data, progress=False, save=False, batch_size=len(data)),
+                  [(records[:batch_size],)], batch_size=batch_size)
+    for batch_size in batch_sizes[:3]:
+        suite.add(f'evaluate/batch={batch_size}', lambda data: evaluate(model, data, progress=False),
+                  [(records[:batch_size],)], batch_size=batch_size)
+
+    suite.run()
+    suite.save(results_path)
+    suite.compare(baseline_path, threshold=threshold)
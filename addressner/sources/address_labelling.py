@@ -1,3 +1,15 @@
+from itertools import islice
+from json import dumps as json_dumps
+from multiprocessing import Pool, cpu_count
+from os import getpid
+from time import perf_counter
+from tqdm import tqdm
+from addressner.sources.fuzzy import match_masks, edit_distance, levenshtein_ratios, best_span
+from addressner.sources.instrumentation import stage, observe
+from addressner.sources.gazetteer import Gazetteer
+from addressner.sources.spans import resolve_spans
+
+
 def generate_ngrams(s, n):
     # Break sentence in the token, remove empty tokens
     tokens = [token for token in s.split()]
@@ -11,66 +23,63 @@ def levenshtein(s, t, ratio_calc=True):
     '''
     Calculates Levenshtein distance between two strings.
     If ratio_calc=True, the function computes the Levenshtein distance ratio of similarity between two strings.
-    For all i and j, distance[i,j] will contain the Levenshtein distance between the first i characters of s
-    and the first j characters of t. (https://www.datacamp.com/community/tutorials/fuzzy-string-python)
+    In order to align the results with those of the Python Levenshtein package, if we choose to calculate the ratio
+    the cost of a substitution is 2, which makes the distance depend only on the longest common subsequence.
+    Both cases are computed with bit-parallel algorithms (see "fuzzy"), one text character at a time.
     '''
-    from numpy import zeros
-
-    # Initialize matrix of zeros
-    rows = len(s) + 1
-    cols = len(t) + 1
-    distance = zeros((rows, cols), dtype=int)
-
-    # Populate matrix of zeros with the indeces of each character of both strings
-    for i in range(1, rows):
-        for k in range(1, cols):
-            distance[i][0] = i
-            distance[0][k] = k
-
-    # Iterate over the matrix to compute the cost of deletions,insertions and/or substitutions
-    for col in range(1, cols):
-        for row in range(1, rows):
-            if s[row - 1] == t[col - 1]:
-                cost = 0  # If the characters are the same in the two strings in a given position [i,j] then the cost is 0
-            else:
-                # In order to align the results with those of the Python Levenshtein package,
-                # if we choose to calculate the ratio the cost of a substitution is 2.
-                # If we calculate just distance, then the cost of a substitution is 1.
-                if ratio_calc == True:
-                    cost = 2
-                else:
-                    cost = 1
-            distance[row][col] = min(distance[row - 1][col] + 1,  # Cost of deletions
-                                     distance[row][col - 1] + 1,  # Cost of insertions
-                                     distance[row - 1][col - 1] + cost)  # Cost of substitutions
     if ratio_calc == True:
         # Computation of the Levenshtein Distance Ratio
-        try:
-            Ratio = ((len(s) + len(t)) - distance[row][col]) / (len(s) + len(t))
-        except UnboundLocalError:
-            Ratio = 0.0
-        return Ratio
+        return levenshtein_ratios(t, [s])[0]
     else:
-        # print(distance) # Uncomment if you want to see the matrix showing how the algorithm computes
-        # the cost of deletions, insertions and/or substitutions.
         # This is the minimum number of edits needed to convert string s to string t
-        return 'The strings are {} edits away'.format(distance[row][col])
+        return 'The strings are {} edits away'.format(edit_distance(match_masks(t), len(t), s))
+
 
+def identify_features(sentence, tags, tol=0.6, method='align', gazetteer=None):
+    '''
+    Finds, for every tag, the n-gram (span of consecutive tokens) of the sentence with the highest Levenshtein distance
+    ratio, or 'NONE' if no n-gram scores above "tol".
+    Tags that appear verbatim at token boundaries score a ratio of 1, the highest possible, so they are found first
+    with a single scan of an Aho-Corasick automaton (see "gazetteer.Gazetteer") built over the tags of the sentence, or
+    the one given in "gazetteer" (e.g. built once over known values). Only the rest of tags are fuzzy matched.
+    With method='align' each tag is searched with a single fuzzy substring alignment pass over the tokens, pruning
+    spans by length (see "fuzzy.best_span"). With method='ngrams' every n-gram is materialised and scored.
+    Both methods return the same n-grams.
+    '''
+    if isinstance(tags, str):
+        tags = [tags]
+    tokens = sentence.split()
+
+    # Exact matches (a ratio of 1 is only accepted if "tol" is below 1)
+    exact = {}
+    if tol < 1:
+        exact = (Gazetteer(tags) if gazetteer is None else gazetteer).find(tokens)
+    leftovers = [tag for tag in tags if tag not in exact]
+    if not leftovers:
+        return list(tags)
+
+    if method == 'align':
+        lev = []
+        for tag in tags:
+            if tag in exact:
+                lev.append(tag)
+                continue
+            span = best_span(tag, tokens, tol)
+            lev.append(' '.join(tokens[span[1]:span[2]]) if span is not None else 'NONE')
+        return lev
 
-def identify_features(sentence, tags, tol=0.6):
     # Find all possible n-grams in sentence
     ngrams = []
-    for i in range(len(sentence)):
+    for i in range(1, len(tokens) + 1):
         ngrams += generate_ngrams(sentence, i)
 
     # Calculate levenshtein distance of 'tag' and every gram
-    if isinstance(tags, str):
-        tags = [tags]
     lev = []
     for tag in tags:
-        l = []
-        for gram in ngrams:
-            l.append(levenshtein(gram, tag))
+        if tag in exact:
+            lev.append(tag)
+            continue
+        l = levenshtein_ratios(tag, ngrams)
         if max(l) > tol:
             r = ngrams[l.index(max(l))]
         else:
@@ -90,35 +99,92 @@ def overlap(a, b):
     return max(0, min(a[1], b[1]) - max(a[0], b[0]))
 
 
-def address_labelling(entities, sentence, tags, tol=0.6):
-    from re import finditer
-
-    matches = identify_features(sentence, tags, tol)
-    entity_info = []
-    for ei, element in enumerate(matches):
-        for emi, element_mod in enumerate([' ' + element + ' ', ' ' + element, element + ' ', element]):
-            break_loop = False
-            start_end_iters = [(m.start(0), m.end(0)) for m in finditer(element_mod, sentence)]
-            for (start_raw, end_raw) in start_end_iters:
-                start = start_raw + 1 if emi in [0, 1] else start_raw
-                end = end_raw - 1 if emi in [0, 2] else end_raw
-
-                overs = []
-                for i in range(len(entity_info)):
-                    overs.append(overlap((start, end), entity_info[i][:2]))
-
-                unique = element == sentence
-                scorr = 1 if start == 0 else 0
-                ecorr = -1 if end == len(sentence) else 0
-                first = element.split()[0] == sentence.split()[0] and sentence[end + ecorr] == ' '
-                last = element.split()[-1] == sentence.split()[-1] and sentence[start + scorr - 1] == ' '
-                between = sentence[start + scorr - 1] == ' ' and sentence[end + ecorr] == ' '
-
-                if not any(overs) and (unique or first or last or between):
-                    entity_info.append((start, end, entities[ei]))
-                    break_loop = True
-                    break
-            if break_loop:
-                break
-
+def address_labelling(entities, sentence, tags, tol=0.6, method='align', gazetteer=None):
+    '''
+    Labels a sentence: finds the n-gram of every tag (see "identify_features") and places them as non-overlapping,
+    token-aligned entities of the sentence (see "spans.resolve_spans").
+    Returns the sentence and its entities in the format that spaCy understands.
+    '''
+    matches = identify_features(sentence, tags, tol, method, gazetteer)
+    entity_info = resolve_spans(entities, sentence, matches)
     return (sentence, {'entities': list(dict.fromkeys(entity_info))})
+
+
+def chunks(records, chunk_size):
+    # Split an iterable in ordered lists of "chunk_size" elements, without materialising it
+    records = iter(records)
+    chunk = list(islice(records, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(records, chunk_size))
+
+
+def label_chunk(args):
+    '''
+    Labels a chunk of records (tuples of clean address plus feature values) in a worker.
+    Returns the worker pid, the number of records, the time spent and the labelled records.
+    '''
+    entities, chunk, tol, method, gazetteer = args
+    t0 = perf_counter()
+    labelled = [address_labelling(entities, record[0], record[1:], tol, method, gazetteer) for record in chunk]
+    return getpid(), len(chunk), perf_counter() - t0, labelled
+
+
+def labelling_stage(entities: list,
+                    records,
+                    tol: float = 0.6,
+                    method: str = 'align',
+                    n_jobs: (int, None) = None,
+                    chunk_size: int = 500,
+                    path: (str, None) = None,
+                    progress: bool = True,
+                    gazetteer: (Gazetteer, None) = None) -> list:
+    '''
+    Function that labels many addresses with "address_labelling" across a process pool. Records are sharded in ordered
+    chunks, so the output keeps the order of "records", and every chunk is written to "path" as soon as it is done.
+
+    :param entities: entity of every feature value
+    :param records: iterable of plain tuples (clean address, feature value 1, feature value 2, ...)
+    :param tol: tolerance of "identify_features"
+    :param method: method of "identify_features"
+    :param n_jobs: number of worker processes (all CPUs if None). If 1, records are labelled in this process
+    :param chunk_size: number of records per chunk
+    :param path: JSON lines file where labelled records are appended incrementally (nothing is written if None)
+    :param progress: whether to show progress with "tqdm" or not
+    :param gazetteer: automaton of known values for the exact matches of "identify_features" (one per record if None)
+    :return: labelled records in the format that spaCy understands
+    '''
+    n_jobs = cpu_count() if n_jobs is None else n_jobs
+    tasks = ((entities, chunk, tol, method, gazetteer) for chunk in chunks(records, chunk_size))
+
+    pool = Pool(n_jobs) if n_jobs > 1 else None
+    results = pool.imap(label_chunk, tasks) if pool is not None else map(label_chunk, tasks)
+    if progress:
+        results = tqdm(results, desc='Labelling chunks')
+
+    labelled_data = []
+    workers = {}
+    f = open(path, 'w') if path is not None else None
+    try:
+        with stage('labelling') as s:
+            for pid, n, t, labelled in results:
+                labelled_data += labelled
+                records_time = workers.get(pid, (0, 0.0))
+                workers[pid] = (records_time[0] + n, records_time[1] + t)
+                s.count(records=n)
+                observe('labelling', t)
+                if f is not None:
+                    f.writelines(json_dumps(record) + '\n' for record in labelled)
+                    f.flush()
+    finally:
+        if f is not None:
+            f.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    # Throughput per worker
+    for pid, (n, t) in workers.items():
+        print(f'Worker {pid}: {n} records in {t:.2f} s ({n / t if t > 0 else float("inf"):.1f} records/s)')
+
+    return labelled_data
@@ -0,0 +1,139 @@
+from json import dump as json_dump
+from json import load as json_load
+from os import makedirs
+from os.path import dirname, exists
+from platform import platform, python_version
+from statistics import median
+from time import perf_counter
+
+
+def measure(function,
+            calls: list,
+            repeat: int = 5,
+            min_time: float = 0.2) -> dict:
+    """
+    Function that measures the latency of a function over a list of calls. The whole list is run "repeat" times (and
+    more, up to "min_time" seconds, if it is fast), and the per-call latency of every run is its time over the number of
+    calls. As in "timeit", the best run is the least disturbed one, so it is the reference of the comparisons.
+
+    :param function: function to measure
+    :param calls: list of tuples with the positional arguments of every call
+    :param repeat: minimum number of runs over the list
+    :param min_time: minimum total time of the runs, in seconds
+    :return: dictionary with the number of calls per run, the number of runs and the best, median and worst per-call
+    latencies, in microseconds
+    """
+    if not calls:
+        raise ValueError('There must be at least one call to measure')
+    runs = []
+    total = 0.0
+    while len(runs) < repeat or total < min_time:
+        t0 = perf_counter()
+        for args in calls:
+            function(*args)
+        t = perf_counter() - t0
+        total += t
+        runs.append(t / len(calls) * 1e6)
+    return {'calls': len(calls), 'runs': len(runs), 'best_us': min(runs), 'median_us': median(runs),
+            'worst_us': max(runs)}
+
+
+class Suite:
+    """
+    Collection of benchmark cases. Every case is a function measured over a list of calls (see "measure"), named by
+    what it measures and its parameters (e.g. 'cleaning/words=16'), so results can be compared against a baseline of a
+    previous run.
+
+    Usage:
+        suite = Suite()
+        suite.add('cleaning/words=16', cleaning, [(address,) for address in addresses])
+        suite.run()
+        suite.compare('../Data/benchmarks/baseline.json')
+    """
+
+    def __init__(self,
+                 repeat: int = 5,
+                 min_time: float = 0.2):
+        """
+        :param repeat: minimum number of runs of every case
+        :param min_time: minimum total time of every case, in seconds
+        """
+        self.repeat = repeat
+        self.min_time = min_time
+        self.cases = []
+        self.results = {}
+
+    def add(self, name: str, function, calls: list, **info):
+        """
+        Method that adds a case.
+
+        :param name: name of the case
+        :param function: function to measure
+        :param calls: list of tuples with the positional arguments of every call
+        :param info: information of the case added to its results (e.g. the batch size)
+        """
+        self.cases.append((name, function, calls, info))
+
+    def run(self, verbose: bool = True) -> dict:
+        """
+        Method that measures all the cases.
+
+        :param verbose: whether to print the results as they are measured or not
+        :return: dictionary with the results of every case, by name
+        """
+        for name, function, calls, info in self.cases:
+            self.results[name] = {**measure(function, calls, self.repeat, self.min_time), **info}
+            if verbose:
+                result = self.results[name]
+                print(f'{name:<45} {result["best_us"]:>12.1f} us/call (median {result["median_us"]:.1f})')
+        return self.results
+
+    def save(self, path: str):
+        """
+        Method that saves the results in .json format.
+
+        :param path: path of the results
+        """
+        if dirname(path):
+            makedirs(dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json_dump({'python': python_version(), 'platform': platform(), 'results': self.results}, f, indent=2)
+
+    def compare(self,
+                path: str,
+                threshold: float = 0.1,
+                verbose: bool = True) -> dict:
+        """
+        Method that compares the results with those of a baseline (saved with "save"), on the best per-call latency. If
+        there is no baseline yet, the results are saved as the baseline. Cases that are new or missing from the results
+        are listed, so a renamed case cannot hide a regression.
+
+        :param path: path of the baseline
+        :param threshold: relative slowdown above which a case is a regression (and speedup above which it improves)
+        :param verbose: whether to print the comparison or not
+        :return: dictionary with the ratio of latencies (current / baseline) of every case in both, by name
+        """
+        if not exists(path):
+            self.save(path)
+            if verbose:
+                print(f'No baseline found: results saved as baseline in {path}')
+            return {}
+
+        with open(path, 'r') as f:
+            baseline = json_load(f)['results']
+        ratios = {name: self.results[name]['best_us'] / baseline[name]['best_us']
+                  for name in self.results if name in baseline and baseline[name]['best_us'] > 0}
+        if verbose:
+            for name, ratio in ratios.items():
+                flag = 'REGRESSION' if ratio > 1 + threshold else 'faster' if ratio < 1 - threshold else ''
+                print(f'{name:<45} {baseline[name]["best_us"]:>12.1f} -> {self.results[name]["best_us"]:>12.1f} us '
+                      f'(x{ratio:.2f}) {flag}')
+            new = [name for name in self.results if name not in baseline]
+            removed = [name for name in baseline if name not in self.results]
+            for name in new:
+                print(f'{name:<45} {"":>12} -> {self.results[name]["best_us"]:>12.1f} us (new)')
+            for name in removed:
+                print(f'{name:<45} {baseline[name]["best_us"]:>12.1f} -> {"":>12} us (removed)')
+            regressions = sum(1 for ratio in ratios.values() if ratio > 1 + threshold)
+            print(f'{regressions} regressions of {len(ratios)} cases compared ({len(new)} new, {len(removed)} removed)')
+        return ratios
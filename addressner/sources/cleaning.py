@@ -1,4 +1,65 @@
-from re import sub
+from re import compile as re_compile
+from re import escape
+
+
+def trie_pattern(words: (list, tuple, set)) -> str:
+    """
+    This function builds a regular expression matching any of "words", factorised as a trie so that the regex engine
+    never backtracks over a shared prefix. At every position the longest word wins.
+
+    :param words: words to match
+    :return: regular expression (non-capturing group)
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def to_pattern(node: dict) -> str:
+        end = '' in node
+        branches = [escape(char) + to_pattern(child) for char, child in sorted(node.items()) if char != '']
+        if not branches:
+            return ''
+        group = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if end:
+            group = ('(?:' + group + ')' if len(branches) == 1 and len(group) > 1 else group) + '?'
+        return group
+
+    return '(?:' + to_pattern(trie) + ')'
+
+
+# Accented letters and their respective replacement, as a single translation table
+ACCENTS = {'a': 'áàâäã', 'e': 'éèêë', 'i': 'íìîï', 'o': 'óòôöõ', 'u': 'úùûü', 'c': 'ç', 'n': 'ñ', 'y': 'ýÿ'}
+ACCENTS_TABLE = str.maketrans({**{accent: letter for letter, accents in ACCENTS.items() for accent in accents},
+                               **{accent.upper(): letter.upper() for letter, accents in ACCENTS.items()
+                                  for accent in accents}})
+
+# Patterns and stopwords of the address additional information (all lowercase)
+INFO_PATTERN = r'\d{1,3}\W{0,2}[a-z]{0,2}'
+STOPWORDS_AP = ['floor', 'derecha', 'izquierda', 'dcha', 'izda', 'izqda', 'departamento', 'apto', 'dpto', 'depto',
+                'apartment', 'department', 'apt', 'dpt', 'door', 'first', 'second', 'third', 'fourth', 'fifth',
+                'sixth', 'seventh', 'eighth', 'nineth', 'tenth']
+STOPWORDS_BP = ['piso', 'derecha', 'izquierda', 'dcha', 'izda', 'izqda', 'apartamento', 'departamento', 'apto', 'dpto',
+                'depto', 'dp', 'apartment', 'department', 'apt', 'dpt', 'puerta', 'pta', 'door', 'bajo', 'entresuelo',
+                'sotano', 'bloque', 'portal', 'salon', 'primero', 'segundo', 'tercero', 'cuarto', 'quinto', 'sexto',
+                'septimo', 'octavo', 'noveno', 'decimo', 'suite']
+
+# Default regular expressions to substitute, in order: stopwords joined with "INFO_PATTERN" (applied twice), stopwords
+# alone and trailing "INFO_PATTERN". At any position at most one stopword can be followed by "INFO_PATTERN", so those
+# are factorised as a trie. "INFO_PATTERN" followed by stopwords keeps the order of "STOPWORDS_AP", because its
+# trailing letters may start another stopword (e.g. '123dpthird' removes '123dpt', not '123dpthird'); only its leading
+# digits and symbols, which always match as many characters as possible, are factorised
+INFO_STOPWORDS = re_compile(trie_pattern(STOPWORDS_BP) + r'\W{0,1}' + INFO_PATTERN + '|' +
+                            r'\d{1,3}\W{0,2}' +
+                            '(?:' + '|'.join([r'[a-z]{0,2}\s{0,1}' + sw_ap for sw_ap in STOPWORDS_AP]) + ')')
+INFO_DEFAULT = [INFO_STOPWORDS,
+                INFO_STOPWORDS,
+                re_compile(trie_pattern(set(STOPWORDS_AP + STOPWORDS_BP))),
+                re_compile(r'\s\d{1,2}\W{0,2}[a-z]{1,2}$')]
+
+SYMBOLS = re_compile(r'[^a-zA-Z0-9\s]')
 
 
 def sub_accents(sentence: str,
@@ -13,22 +74,8 @@ def sub_accents(sentence: str,
     if lower:
         sentence = sentence.lower()
 
-    # List of possible accents per letter and their respective replacement
-    a = r'á|à|â|ä|ã'
-    e = r'é|è|ê|ë'
-    i = r'í|ì|î|ï'
-    o = r'ó|ò|ô|ö|õ'
-    u = r'ú|ù|û|ü'
-    c = r'ç'
-    n = r'ñ'
-    y = r'ý|ÿ'
-    regexps = [a, e, i, o, u, c, n, y]
-    letters = ['a', 'e', 'i', 'o', 'u', 'c', 'n', 'y']
-
     # Convert accented letters into normal letters
-    for i in range(len(regexps)):
-        sentence = sub(regexps[i], letters[i], sentence)
-        sentence = sub(regexps[i].upper(), letters[i].upper(), sentence)
+    sentence = sentence.translate(ACCENTS_TABLE)
 
     return sentence
 
@@ -51,36 +98,15 @@ def clean_additional_info(sentence: str,
 
     # If no "info_to_remove" is given, default "info_to_substitute" aims to clean up address additional information...
     if info_to_substitute is None:
-        # Patterns and stopwords to remove (all lowercase)
-        pattern = r'\d{1,3}\W{0,2}[a-z]{0,2}'
-        stopwords_ap = ['floor', 'derecha', 'izquierda', 'dcha', 'izda', 'izqda', 'departamento', 'apto', 'dpto',
-                        'depto', 'apartment', 'department', 'apt', 'dpt', 'door', 'first', 'second', 'third', 'fourth',
-                        'fifth', 'sixth', 'seventh', 'eighth', 'nineth', 'tenth']
-        stopwords_bp = ['piso', 'derecha', 'izquierda', 'dcha', 'izda', 'izqda', 'apartamento', 'departamento', 'apto',
-                        'dpto', 'depto', 'dp', 'apartment', 'department', 'apt', 'dpt', 'puerta', 'pta', 'door', 'bajo',
-                        'entresuelo', 'sotano', 'bloque', 'portal', 'salon', 'primero', 'segundo', 'tercero', 'cuarto',
-                        'quinto', 'sexto', 'septimo', 'octavo', 'noveno', 'decimo', 'suite']
-
-        # Join "pattern" and stopwords in corresponding order
-        stopwords_pattern = [r'{}'.format(sw_bp) + r'\W{0,1}' + pattern for sw_bp in stopwords_bp]
-        pattern_stopwords = [pattern + r'\s{0,1}' + r'{}'.format(sw_ap) for sw_ap in stopwords_ap]
-
-        # Regular expressions to substitute
-        p1 = r'|'.join(stopwords_pattern + pattern_stopwords)
-        p2 = r'|'.join(stopwords_pattern + pattern_stopwords)
-        p3 = r'|'.join(list(set(stopwords_ap + stopwords_bp)))
-        p4 = r'\s\d{1,2}\W{0,2}[a-z]{1,2}$'
-
-        # Default "info_to_substitute"
-        info_to_substitute = [p1, p2, p3, p4]
+        info_to_substitute = INFO_DEFAULT
 
     # ... else convert "info_to_remove"
     else:
-        info_to_substitute = [info_to_substitute]
+        info_to_substitute = [re_compile(info_to_substitute)]
 
     # Substitute info_to_remove with replacement
     for element in info_to_substitute:
-        sentence = sub(element, info_replacement, sentence)
+        sentence = element.sub(info_replacement, sentence)
 
     # Remove additional blank spaces among words
     return ' '.join(sentence.split())
@@ -100,12 +126,78 @@ def clean_symbols(sentence: str,
     if lower:
         sentence = sentence.lower()
 
-    sentence = sub(r'[^a-zA-Z0-9\s]', symbol_replacement, sentence)
+    sentence = SYMBOLS.sub(symbol_replacement, sentence)
 
     # Remove additional blank spaces among words
     return ' '.join(sentence.split())
 
 
+class Cleaner:
+    """
+    Cleaner that performs the same full cleaning as "cleaning" with a fixed configuration. All regular expressions and
+    the accents translation table are compiled once, so it is meant to clean many sentences with "clean_many".
+    """
+
+    def __init__(self,
+                 accents: bool = True,
+                 additional_info: bool = True,
+                 symbols: bool = True,
+                 lower: bool = True,
+                 info_to_substitute: (str, None) = None,
+                 info_replacement: str = ' ',
+                 symbol_replacement: str = ' '):
+        """
+        :param accents: whether applying "sub_accents" or not
+        :param additional_info: whether applying "clean_additional_info" or not
+        :param symbols: whether applying "clean_symbols" or not
+        :param lower: whether converting sentences to lowercase or not
+        :param info_to_substitute: regular expression with the information to remove (see "clean_additional_info")
+        :param info_replacement: replacement of the information to remove
+        :param symbol_replacement: replacement of all symbols
+        """
+        self.accents = accents
+        self.additional_info = additional_info
+        self.symbols = symbols
+        self.lower = lower
+        self.info_patterns = INFO_DEFAULT if info_to_substitute is None else [re_compile(info_to_substitute)]
+        self.info_replacement = info_replacement
+        self.symbol_replacement = symbol_replacement
+
+    def clean(self, sentence: str) -> str:
+        """
+        Method that cleans a sentence.
+
+        :param sentence: string to clean
+        :return: sentence clean
+        """
+        if self.accents:
+            if self.lower:
+                sentence = sentence.lower()
+            sentence = sentence.translate(ACCENTS_TABLE)
+        if self.additional_info:
+            if self.lower:
+                sentence = sentence.lower()
+            for pattern in self.info_patterns:
+                sentence = pattern.sub(self.info_replacement, sentence)
+            sentence = ' '.join(sentence.split())
+        if self.symbols:
+            if self.lower:
+                sentence = sentence.lower()
+            sentence = ' '.join(SYMBOLS.sub(self.symbol_replacement, sentence).split())
+        return sentence
+
+    def clean_many(self, sentences):
+        """
+        Method that cleans every sentence of an iterable, yielding the results one at a time.
+
+        :param sentences: iterable of strings to clean
+        :return: generator of sentences clean
+        """
+        clean = self.clean
+        for sentence in sentences:
+            yield clean(sentence)
+
+
 def cleaning(sentence: str,
              accents: bool = True,
              additional_info: bool = True,
@@ -113,23 +205,15 @@ def cleaning(sentence: str,
              **kwargs) -> str:
     """
     Function that performs full cleaning according to functions
-    "sub_accents", "clean_additional_info" and "clean_accents".
+    "sub_accents", "clean_additional_info" and "clean_accents". To clean many sentences, use "Cleaner.clean_many".
 
     :param sentence: string to clean
     :param accents: whether applying "sub_accents" or not
     :param additional_info: whether applying "clean_additional_info" or not
     :param symbols: whether applying "clean_accents" or not
-    :param kwargs: arguments of functions "sub_accents", "clean_additional_info" and "clean_accents".
+    :param kwargs: arguments of functions "sub_accents", "clean_additional_info" and "clean_accents" (see "Cleaner").
+    Any other arguments are ignored
     :return: sentence clean
     """
-    if accents:
-        sentence = sub_accents(sentence, **{key: value for key, value in kwargs.items() if
-                                            key in sub_accents.__code__.co_varnames})
-    if additional_info:
-        sentence = clean_additional_info(sentence, **{key: value for key, value in kwargs.items() if
-                                                      key in clean_additional_info.__code__.co_varnames})
-    if symbols:
-        sentence = clean_symbols(sentence, **{key: value for key, value in kwargs.items() if
-                                              key in clean_symbols.__code__.co_varnames})
-
-    return sentence
+    kwargs = {key: value for key, value in kwargs.items() if key in Cleaner.__init__.__code__.co_varnames}
+    return Cleaner(accents, additional_info, symbols, **kwargs).clean(sentence)
@@ -0,0 +1,193 @@
+from array import array
+from json import load as json_load
+from mmap import mmap, ACCESS_READ
+from os.path import splitext
+from pickle import load as pickle_load
+from struct import Struct
+from sys import byteorder
+
+
+# Layout of a corpus file (.ner), all integers little-endian:
+#     magic (8 bytes) | n_records, n_entities, n_labels (3 x uint64) | labels (uint16 length + utf-8, each)
+#     | padding to 8 bytes | text offsets ((n_records + 1) x uint64) | entity offsets ((n_records + 1) x uint64)
+#     | entities (n_entities x (start, end, label id) uint32) | padding to 8 bytes | texts (utf-8, concatenated)
+MAGIC = b'ADDRNER1'
+HEADER = Struct('<QQQ')
+LENGTH = Struct('<H')
+
+
+def padding(offset: int) -> int:
+    return -offset % 8
+
+
+def native(view: memoryview, typecode: str):
+    """
+    Function that reads little-endian integers of a corpus file in the byte order of the machine.
+
+    :param view: bytes of the integers
+    :param typecode: type of the integers ('Q' or 'I')
+    :return: the view cast to the integers on little-endian machines, or a byteswapped copy of them otherwise
+    """
+    if byteorder == 'little':
+        return view.cast(typecode)
+    values = array(typecode, view.tobytes())
+    values.byteswap()
+    return values
+
+
+def write_corpus(data,
+                 path: str):
+    """
+    Function that writes (text, {'entities': [(start, end, label), ...]}) records as a compact binary corpus file.
+
+    :param data: iterable of records
+    :param path: path of the corpus file (.ner)
+    """
+    text_offsets = array('Q', [0])
+    entity_offsets = array('Q', [0])
+    entities = array('I')
+    texts = bytearray()
+    labels = {}
+    for text, annotations in data:
+        texts += text.encode('utf-8')
+        text_offsets.append(len(texts))
+        for start, end, label in annotations['entities']:
+            entities.extend((start, end, labels.setdefault(label, len(labels))))
+        entity_offsets.append(len(entities) // 3)
+
+    if byteorder != 'little':
+        for values in (text_offsets, entity_offsets, entities):
+            values.byteswap()
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(len(text_offsets) - 1, len(entities) // 3, len(labels)))
+        for label in labels:
+            encoded = label.encode('utf-8')
+            f.write(LENGTH.pack(len(encoded)) + encoded)
+        f.write(b'\0' * padding(f.tell()))
+        f.write(text_offsets.tobytes())
+        f.write(entity_offsets.tobytes())
+        f.write(entities.tobytes())
+        f.write(b'\0' * padding(f.tell()))
+        f.write(texts)
+
+
+class Corpus:
+    """
+    Lazy reader of a corpus file (see "write_corpus"). The file is memory-mapped and records are decoded on access, so
+    it can be iterated or randomly accessed (corpus[i], corpus[i:j]) without loading the whole file. On big-endian
+    machines the offsets and entities are byteswapped into memory when the file is opened (see "native").
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path of the corpus file (.ner)
+        """
+        self.path = path
+        self.file = open(path, 'rb')
+        self.mm = mmap(self.file.fileno(), 0, access=ACCESS_READ)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a corpus file')
+
+        offset = len(MAGIC)
+        self.n_records, n_entities, n_labels = HEADER.unpack_from(self.mm, offset)
+        offset += HEADER.size
+        self.labels = []
+        for _ in range(n_labels):
+            (length,) = LENGTH.unpack_from(self.mm, offset)
+            offset += LENGTH.size
+            self.labels.append(self.mm[offset:offset + length].decode('utf-8'))
+            offset += length
+        offset += padding(offset)
+
+        view = memoryview(self.mm)
+        n_offsets = (self.n_records + 1) * 8
+        self.text_offsets = native(view[offset:offset + n_offsets], 'Q')
+        offset += n_offsets
+        self.entity_offsets = native(view[offset:offset + n_offsets], 'Q')
+        offset += n_offsets
+        self.entities = native(view[offset:offset + n_entities * 12], 'I')
+        offset += n_entities * 12
+        self.texts_offset = offset + padding(offset)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.n_records
+
+    def text(self, i: int) -> str:
+        """
+        :param i: index of the record
+        :return: text of the record
+        """
+        start = self.texts_offset + self.text_offsets[i]
+        return self.mm[start:self.texts_offset + self.text_offsets[i + 1]].decode('utf-8')
+
+    def __getitem__(self, i: (int, slice)):
+        """
+        :param i: index (or slice) of the record(s)
+        :return: record (text, {'entities': [(start, end, label), ...]}), or list of records if "i" is a slice
+        """
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.n_records))]
+        if i < 0:
+            i += self.n_records
+        if not 0 <= i < self.n_records:
+            raise IndexError('Corpus index out of range')
+        e = self.entities
+        entities = [(e[k], e[k + 1], self.labels[e[k + 2]])
+                    for k in range(3 * self.entity_offsets[i], 3 * self.entity_offsets[i + 1], 3)]
+        return self.text(i), {'entities': entities}
+
+    def __iter__(self):
+        for i in range(self.n_records):
+            yield self[i]
+
+    def texts(self):
+        """
+        :return: generator with the texts of all the records
+        """
+        for i in range(self.n_records):
+            yield self.text(i)
+
+    def close(self):
+        for view in (self.text_offsets, self.entity_offsets, self.entities):
+            if isinstance(view, memoryview):
+                view.release()
+        self.mm.close()
+        self.file.close()
+
+
+def load_data(path: str):
+    """
+    Function that loads a dataset of (text, annotations) records saved as pickled .txt, .json or corpus (.ner) file.
+
+    :param path: path of the file
+    :return: list of records, or lazy "Corpus" for .ner files
+    """
+    extension = splitext(path)[1]
+    if extension == '.ner':
+        return Corpus(path)
+    if extension == '.json':
+        with open(path, 'r') as f:
+            return [(text, {'entities': [tuple(entity) for entity in annotations['entities']]})
+                    for text, annotations in json_load(f)]
+    with open(path, 'rb') as f:
+        return pickle_load(f)
+
+
+def convert(path: str) -> str:
+    """
+    Function that converts a pickled .txt or .json dataset into a corpus file next to it.
+
+    :param path: path of the .txt or .json file
+    :return: path of the corpus file
+    """
+    path_corpus = splitext(path)[0] + '.ner'
+    write_corpus(load_data(path), path_corpus)
+    return path_corpus
@@ -0,0 +1,265 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from numpy import zeros
+from spacy.tokens import Doc
+from spacy.scorer import Scorer
+from spacy.gold import GoldParse
+from tqdm import tqdm
+from addressner.sources.ner import save_data, collect_scores
+from addressner.sources.metrics import EntityMetrics
+from addressner.sources.registry import ModelRegistry
+from addressner.sources.splits import Splits
+from addressner.sources.spans import SpanIndex
+from addressner.sources.parsecache import model_key
+from addressner.sources.instrumentation import stage
+
+
+def copy_doc(doc: Doc) -> Doc:
+    """
+    :param doc: tokenised Doc
+    :return: new Doc with the same tokens (and vocab) but no annotations, so it can be parsed without tokenising again
+    """
+    return Doc(doc.vocab, words=[token.text for token in doc], spaces=[bool(token.whitespace_) for token in doc])
+
+
+def vote(predictions: list,
+         min_votes: int) -> list:
+    """
+    Function that merges the entities predicted by several models for the same text: an entity is kept if at least
+    "min_votes" models predict it (same start, end and label). Entities are placed by decreasing number of votes (and
+    then from left to right), dropping those that overlap an entity already placed. With a strict majority no kept
+    entities can overlap.
+
+    :param predictions: list with the entities (start, end, label) predicted by every model
+    :param min_votes: minimum number of models that must predict an entity
+    :return: list of entities (start, end, label)
+    """
+    votes = Counter(entity for entities in predictions for entity in set(entities))
+    placed = SpanIndex()
+    entities = []
+    for (start, end, label), n_votes in sorted(votes.items(), key=lambda item: (-item[1], item[0])):
+        if n_votes < min_votes:
+            break
+        if not placed.overlaps(start, end):
+            placed.add(start, end)
+            entities.append((start, end, label))
+    return sorted(entities)
+
+
+class MultiModel:
+    """
+    Several NER models of the same language (e.g. the models of the splits, see "ner.train_job") run over the same
+    texts. Texts are tokenised once, with the tokenizer of the first model, and every model only runs its NER component
+    on its own copies of the Docs. Models run in parallel threads: spaCy releases the GIL while parsing, and threads
+    share the Docs and the vocab, which processes would have to serialise.
+
+    Models must share the vocab (as the models of a "registry.ModelRegistry" do), since the copies of the Docs are
+    made in the vocab of the first model.
+
+    Usage:
+        models = MultiModel({name: registry[name] for name in ['en_0', 'en_1', 'en_2']})
+        entities = models.parse_many(texts)['en_1']
+    """
+
+    def __init__(self,
+                 models: dict,
+                 n_threads: (int, None) = None):
+        """
+        :param models: dictionary with the NER model of every name
+        :param n_threads: number of threads to run the models with (one per model if None)
+        """
+        if not models:
+            raise ValueError('There must be at least one model')
+        langs = {nlp.lang for nlp in models.values()}
+        if len(langs) > 1:
+            raise ValueError(f'All the models must have the same language, not {sorted(langs)}')
+        self.models = models
+        self.lang = langs.pop()
+        self.first = next(iter(models.values()))
+        self.n_threads = len(models) if n_threads is None else n_threads
+
+    def __len__(self):
+        return len(self.models)
+
+    def tokenise(self, texts: list) -> list:
+        """
+        :param texts: list of texts
+        :return: list of tokenised Docs (without annotations)
+        """
+        with stage('tokenisation', docs=len(texts)):
+            return [self.first.make_doc(text) for text in texts]
+
+    def apply(self,
+              docs: list,
+              batch_size: int = 1000) -> dict:
+        """
+        Method that runs the NER component of every model on copies of tokenised Docs.
+
+        :param docs: list of tokenised Docs
+        :param batch_size: number of Docs per batch
+        :return: dictionary with the list of parsed Docs of every model
+        """
+        # Copies are made before parsing, so the threads do not add strings to the shared vocab at the same time
+        copies = [[copy_doc(doc) for doc in docs] for _ in self.models]
+
+        def parse(job):
+            nlp, model_docs = job
+            return list(nlp.get_pipe('ner').pipe(model_docs, batch_size=batch_size))
+
+        with stage('ner', docs=len(docs) * len(self.models)):
+            if self.n_threads > 1:
+                with ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+                    parsed = list(executor.map(parse, zip(self.models.values(), copies)))
+            else:
+                parsed = [parse(job) for job in zip(self.models.values(), copies)]
+        return dict(zip(self.models, parsed))
+
+    def parse_many(self,
+                   texts: list,
+                   batch_size: int = 1000) -> dict:
+        """
+        :param texts: list of texts
+        :param batch_size: number of texts per batch
+        :return: dictionary with the entities (start, end, label) of every text for every model
+        """
+        return {name: [[(entity.start_char, entity.end_char, entity.label_) for entity in doc.ents] for doc in docs]
+                for name, docs in self.apply(self.tokenise(texts), batch_size).items()}
+
+
+class Ensemble(MultiModel):
+    """
+    Majority vote of several NER models of the same language (see "vote"), e.g. the models of the splits 'en_0' to
+    'en_4'. It behaves as a NER model with only a NER component ("pipe", "make_doc", calls, "meta" and "vocab"), so it
+    can be used by "ner.predict", "ner.predict_evaluate" or "parser.AddressParser".
+
+    Usage:
+        registry = ModelRegistry(max_models=5)
+        ensemble = Ensemble({name: registry[name] for name in ['en_' + str(b) for b in range(5)]})
+        parser = AddressParser(ensemble)
+    """
+
+    def __init__(self,
+                 models: dict,
+                 min_votes: (int, None) = None,
+                 n_threads: (int, None) = None):
+        """
+        :param models: dictionary with the NER model of every name
+        :param min_votes: minimum number of models that must predict an entity (strict majority if None)
+        :param n_threads: number of threads to run the models with (one per model if None)
+        """
+        super().__init__(models, n_threads)
+        self.min_votes = len(models) // 2 + 1 if min_votes is None else min_votes
+        self.pipe_names = ['ner']
+        self.vocab = self.first.vocab
+        # The version names every model and the training id keys every model (see "parsecache.model_key"), so the parses
+        # of an ensemble are never mixed with those of a single model or of an ensemble of other weights
+        self.meta = {'lang': self.lang, 'name': 'ensemble',
+                     'version': '+'.join(f'{name}@{nlp.meta.get("version", "")}' for name, nlp in models.items()),
+                     'training_id': '+'.join(model_key(nlp) for nlp in models.values()),
+                     'min_votes': self.min_votes}
+
+    def make_doc(self, text: str) -> Doc:
+        return self.first.make_doc(text)
+
+    def __call__(self, text: str) -> Doc:
+        return next(self.pipe([text]))
+
+    def pipe(self,
+             texts,
+             batch_size: int = 1000,
+             n_process: int = 1,
+             disable: list = ()):
+        """
+        Method that parses texts with every model and sets the entities voted (see "vote") on their Docs.
+
+        :param texts: iterable of texts
+        :param batch_size: number of texts per batch
+        :param n_process: ignored (models run in threads, see "MultiModel")
+        :param disable: ignored (only the NER components are run)
+        :return: generator of Docs
+        """
+        texts = iter(texts)
+        batch = [text for _, text in zip(range(batch_size), texts)]
+        while batch:
+            docs = self.tokenise(batch)
+            parsed = list(self.apply(docs, batch_size).values())
+            for i, doc in enumerate(docs):
+                entities = vote([[(entity.start_char, entity.end_char, entity.label_) for entity in model_docs[i].ents]
+                                 for model_docs in parsed], self.min_votes)
+                doc.ents = [doc.char_span(start, end, label=label) for start, end, label in entities]
+                yield doc
+            batch = [text for _, text in zip(range(batch_size), texts)]
+
+
+def evaluate_splits(registry: ModelRegistry,
+                    splits: Splits,
+                    lang: str,
+                    progress: bool = True,
+                    save: bool = True,
+                    path: str = '',
+                    file_format: (str, list) = 'ner',
+                    batch_size: int = 1000,
+                    n_threads: (int, None) = None,
+                    percentage: bool = True) -> tuple:
+    """
+    Function that makes the predictions of the models of every split of a language ('<lang>_<split>', see
+    "ner.train_job") for their training and test records and evaluates them, as "ner.predict_evaluate" does for each
+    model and set, but in a single pass over the corpus: every text is tokenised once and parsed by all the models at a
+    time (see "MultiModel"). All the models of the language are loaded at once, so the registry must allow them.
+
+    :param registry: registry of the models
+    :param splits: splits the models were trained on
+    :param lang: language of the models
+    :param progress: whether to show progress with "tqdm" or not
+    :param save: whether to save the predictions or not
+    :param path: where to save the predictions if "save=True" (with suffixes 'train_<model>' and 'test_<model>')
+    :param file_format: format of the saved files if "save=True"
+    :param batch_size: number of texts per batch
+    :param n_threads: number of threads to run the models with (one per model if None)
+    :param percentage: whether returning the accuracy over 100% or not
+    :return: dictionaries with the scores of every model for its training and test records (see "ner.collect_scores")
+    """
+    names = [lang + '_' + str(b) for b in range(len(splits))]
+    models = MultiModel({name: registry[name] for name in names}, n_threads)
+    corpus = splits.corpus
+    n_records = len(corpus)
+
+    # Whether every record is a test record of every split
+    is_test = zeros((len(splits), n_records), dtype=bool)
+    for b in range(len(splits)):
+        is_test[b, splits.indices(b)[1]] = True
+
+    parts = ['train', 'test']
+    scorers = {(name, part): Scorer() for name in names for part in parts}
+    metrics = {(name, part): EntityMetrics() for name in names for part in parts}
+    preds = {name: [None] * n_records for name in names}
+
+    batches = range(0, n_records, batch_size)
+    if progress:
+        batches = tqdm(batches, desc=lang)
+    for start in batches:
+        data = corpus[start:start + batch_size]
+        parsed = models.apply(models.tokenise([text for text, _ in data]), batch_size)
+        for b, name in enumerate(names):
+            gold = {part: [] for part in parts}
+            pred = {part: [] for part in parts}
+            for i, ((text, annot), doc) in enumerate(zip(data, parsed[name])):
+                part = parts[int(is_test[b, start + i])]
+                entities = [(entity.start_char, entity.end_char, entity.label_) for entity in doc.ents]
+                preds[name][start + i] = entities
+                scorers[name, part].score(doc, GoldParse(doc, entities=annot['entities']))
+                gold[part].append((text, annot))
+                pred[part].append((text, {'entities': entities}))
+            for part in parts:
+                if pred[part]:
+                    metrics[name, part].update(gold[part], pred[part])
+
+    scores = {part: {} for part in parts}
+    for b, name in enumerate(names):
+        for part, indices in zip(parts, splits.indices(b)):
+            scores[part][name] = collect_scores(scorers[name, part], metrics[name, part], percentage)
+            if save:
+                # In the order of the split, as "ner.predict_evaluate" over "splits.train(b)" or "splits.test(b)"
+                pred = [(corpus.text(int(i)), {'entities': preds[name][int(i)]}) for i in indices]
+                save_data(pred, 'pred', path, suffix=part + '_' + name, file_format=file_format)
+    return scores['train'], scores['test']
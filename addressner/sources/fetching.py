@@ -1,60 +1,270 @@
 import asyncio
-from aiohttp import ClientSession, TCPConnector
-from ssl import SSLContext
-from nest_asyncio import apply
-apply()
+from email.utils import parsedate_to_datetime
+from math import ceil
+from random import uniform
+from time import monotonic, time
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, ClientError
+from addressner.sources.geocache import query_key
+from addressner.sources.instrumentation import observe
 
 
-async def fetch(url: str,
-                session: ClientSession) -> dict:
+def percentile(values: list,
+               q: float) -> float:
     """
-    Function that makes a URL query in an asynchronous way with a given session.
+    Function that computes the "q" percentile of a list of values (nearest rank).
 
-    :param url: URL to query
-    :param session: session
-    :return: the result of the query in .json (dict) format
+    :param values: values
+    :param q: percentile, between 0 and 100
+    :return: percentile (0.0 if there are no values)
     """
-    async with session.get(url, ssl=SSLContext()) as response:
-        return await response.json()
+    if len(values) == 0:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, ceil(q / 100 * len(values)) - 1))]
 
 
-async def fetch_sem(semaphore: asyncio.locks.Semaphore,
-                    attempts: int,
-                    url: str,
-                    session: ClientSession):
+def retry_after(value: (str, None)) -> (float, None):
+    """
+    Function that parses the "Retry-After" header of a response, given either in seconds or as an HTTP date.
+
+    :param value: value of the header
+    :return: seconds to wait, or None if the header is missing or invalid
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket that limits the rate of requests: tokens are refilled at "rate" per second up to "capacity", and every
+    request takes one.
     """
-    Function that runs "fetch" function with an asyncio Semaphore and checks if the result of the query is a dict
 
-    :param semaphore: asyncio semaphore with the limitation of simultaneous queries
-    :param attempts: attempts per query if the result is not dict type
-    :param url: URL to query
-    :param session: session
-    :return: the result of the query in a dict
+    def __init__(self,
+                 rate: float,
+                 capacity: (float, None) = None):
+        """
+        :param rate: requests per second
+        :param capacity: maximum burst of requests (by default, one second of requests)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = monotonic()
+        self.lock = None
+
+    async def acquire(self):
+        """
+        Method that waits until a token is available and takes it.
+        """
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            while True:
+                now = monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class GeocodingClient:
     """
-    async with semaphore:
-        for _ in range(attempts):
-            result = await fetch(url, session)
-            if isinstance(result, dict):
-                break
-        return result
+    Asynchronous client for URL queries (Azure Maps search) with a requests per second limit (token bucket), a limit of
+    simultaneous queries over a reusable, connection-pooled session, retries with exponential backoff and jitter on
+    429, 5xx and connection errors (honouring "Retry-After"), and per-request latency stats. Identical queries are only
+    sent once, and with a "geocache.GeocodingCache" only queries not cached yet are sent at all.
+
+    Usage:
+        async with GeocodingClient(rate=50) as client:
+            results = await client.fetch_all(urls)
+            print(client.stats())
+    """
+
+    def __init__(self,
+                 rate: float = 50.0,
+                 burst: (float, None) = None,
+                 concurrency: int = 60,
+                 attempts: int = 5,
+                 backoff: float = 0.5,
+                 max_backoff: float = 30.0,
+                 timeout: float = 30.0,
+                 ssl=None,
+                 cache=None):
+        """
+        :param rate: requests per second
+        :param burst: maximum burst of requests (by default, one second of requests)
+        :param concurrency: limitation of simultaneous queries (and of connections of the session)
+        :param attempts: attempts per query
+        :param backoff: base of the exponential backoff between attempts, in seconds
+        :param max_backoff: maximum backoff between attempts, in seconds
+        :param timeout: timeout of every request, in seconds
+        :param ssl: SSL validation mode of aiohttp (None for default validation, False to skip it)
+        :param cache: "geocache.GeocodingCache" to look results up in and to store them (no cache if None)
+        """
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.ssl = ssl
+        self.session = None
+        self.semaphore = None
+        self.latencies = []
+        self.retries = 0
+        self.failures = 0
+        self.statuses = {}
+        self.duplicates = 0
+        self.cache = cache
+        self.queried = {}
+
+    async def __aenter__(self):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = ClientSession(connector=TCPConnector(limit=self.concurrency, ssl=self.ssl))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        self.session = None
+
+    def delay(self, attempt: int) -> float:
+        """
+        Method that computes the backoff before a retry: exponential, capped, with full jitter.
+
+        :param attempt: number of the failed attempt (starting at 0)
+        :return: seconds to wait
+        """
+        return uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def fetch(self, url: str):
+        """
+        Method that makes a URL query, retrying on 429, 5xx and connection errors.
+
+        :param url: URL to query
+        :return: the result of the query in .json (dict) format, or the last exception if all attempts fail
+        """
+        error = None
+        for attempt in range(self.attempts):
+            wait = None
+            # The slot is only held while the request is in flight, not during the backoff
+            async with self.semaphore:
+                await self.bucket.acquire()
+                t0 = monotonic()
+                try:
+                    async with self.session.get(url, timeout=ClientTimeout(total=self.timeout)) as response:
+                        self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+                        if response.status == 429 or response.status >= 500:
+                            error = ClientError(f'HTTP {response.status}')
+                            wait = retry_after(response.headers.get('Retry-After'))
+                        else:
+                            result = await response.json(content_type=None)
+                            if isinstance(result, dict):
+                                self.latencies.append(monotonic() - t0)
+                                observe('fetching', self.latencies[-1])
+                                return result
+                            error = ValueError(f'Unexpected result: {result!r}')
+                except (ClientError, asyncio.TimeoutError, ValueError) as e:
+                    error = e
+                self.latencies.append(monotonic() - t0)
+                observe('fetching', self.latencies[-1])
+            if attempt < self.attempts - 1:
+                self.retries += 1
+                await asyncio.sleep(wait if wait is not None else self.delay(attempt))
+        self.failures += 1
+        return error
+
+    async def fetch_cached(self, url: str):
+        """
+        Method that makes a URL query unless it is already cached or in flight: queries with the same key (see
+        "geocache.query_key") made while it is in flight wait for its result instead of being sent again. Only the
+        queries in flight are kept in memory. Successful results are stored in the cache.
+
+        :param url: URL to query
+        :return: the result of the query in .json (dict) format, or the last exception if all attempts fail (or the
+        exception of an unexpected error of the request or the cache, which is not retried)
+        """
+        key = query_key(url)
+        try:
+            if key in self.queried:
+                self.duplicates += 1
+                return await asyncio.shield(self.queried[key])
+            if self.cache is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+
+            task = asyncio.ensure_future(self.fetch(url))
+            self.queried[key] = task
+            try:
+                result = await task
+            finally:
+                del self.queried[key]
+            if self.cache is not None and isinstance(result, dict) and 'error' not in result:
+                self.cache.put(key, result)
+            return result
+        except Exception as error:
+            # The error is the result of this query only, so it does not cancel the queries made along with it
+            self.failures += 1
+            return error
+
+    async def fetch_all(self, urls: list) -> list:
+        """
+        Method that makes a set of URLs queries concurrently (see "fetch_cached").
+
+        :param urls: list of URLs to query
+        :return: the results of the queries in a list of dicts (or exceptions), in the order of "urls"
+        """
+        results = await asyncio.gather(*[self.fetch_cached(url) for url in urls], return_exceptions=True)
+        if self.cache is not None:
+            self.cache.commit()
+        return results
+
+    def stats(self) -> dict:
+        """
+        Method that summarises the requests made so far.
+
+        :return: dictionary with the number of requests, retries and failures, the count of every HTTP status, the
+        mean, p50, p95 and p99 latencies in seconds, the number of duplicated queries and the cache hits and misses
+        """
+        stats = {'requests': len(self.latencies),
+                 'retries': self.retries,
+                 'failures': self.failures,
+                 'statuses': dict(self.statuses),
+                 'latency_mean': sum(self.latencies) / len(self.latencies) if self.latencies else 0.0,
+                 'latency_p50': percentile(self.latencies, 50),
+                 'latency_p95': percentile(self.latencies, 95),
+                 'latency_p99': percentile(self.latencies, 99),
+                 'duplicates': self.duplicates}
+        if self.cache is not None:
+            stats.update(self.cache.stats())
+        return stats
 
 
-# Function to search for all queries
 async def fetch_all(limit: int,
                     attempts: int,
                     urls: list,
-                    loop: asyncio.windows_events._WindowsSelectorEventLoop) -> list:
+                    rate: float = 50.0,
+                    cache=None) -> list:
     """
-    Function that makes a set of URLs queries in an asynchronous way.
+    Function that makes a set of URLs queries in an asynchronous way (see "GeocodingClient").
 
     :param limit: limitation of simultaneous queries
-    :param attempts: attempts per query if the result is not dict type
+    :param attempts: attempts per query
     :param urls: list of URLs to query
-    :param loop: loop of asyncio routine
-    :return: the results of the queries in a list of dicts
+    :param rate: requests per second
+    :param cache: "geocache.GeocodingCache" to look results up in and to store them (no cache if None)
+    :return: the results of the queries in a list of dicts (or exceptions)
     """
-
-    sem = asyncio.Semaphore(value=limit, loop=loop)
-    connector = TCPConnector(limit=60)
-    async with ClientSession(loop=loop, connector=connector) as session:
-        return await asyncio.gather(*[fetch_sem(sem, attempts, url, session) for url in urls], return_exceptions=True)
+    async with GeocodingClient(rate=rate, concurrency=limit, attempts=attempts, cache=cache) as client:
+        return await client.fetch_all(urls)
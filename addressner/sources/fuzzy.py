@@ -0,0 +1,146 @@
+def match_masks(pattern: str) -> dict:
+    """
+    Function that builds the bit-parallel match masks of a pattern: for every character of "pattern", an integer with
+    bit i set if pattern[i] is that character.
+
+    :param pattern: string to build the masks for
+    :return: dictionary {character: mask}
+    """
+    masks = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+def lcs_length(masks: dict,
+               m: int,
+               text: str) -> int:
+    """
+    Function that computes the length of the longest common subsequence between a pattern (given by its match masks)
+    and a text, with the bit-vector algorithm of Allison-Dix / Hyyrö. The text is processed one character at a time,
+    updating the whole DP column at once.
+
+    :param masks: match masks of the pattern (see "match_masks")
+    :param m: length of the pattern
+    :param text: string to compare the pattern with
+    :return: length of the longest common subsequence
+    """
+    full = (1 << m) - 1
+    v = full
+    for char in text:
+        u = v & masks.get(char, 0)
+        v = ((v + u) | (v - u)) & full
+    return m - bin(v).count('1')
+
+
+def edit_distance(masks: dict,
+                  m: int,
+                  text: str) -> int:
+    """
+    Function that computes the Levenshtein distance (unit costs) between a pattern (given by its match masks) and a
+    text, with Myers' bit-parallel algorithm in Hyyrö's formulation.
+
+    :param masks: match masks of the pattern (see "match_masks")
+    :param m: length of the pattern
+    :param text: string to compare the pattern with
+    :return: Levenshtein distance
+    """
+    if m == 0:
+        return len(text)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    for char in text:
+        eq = masks.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return score
+
+
+def ratio(total: int,
+          lcs: int) -> float:
+    """
+    Function that computes the Levenshtein distance ratio (substitutions cost 2) from the total length of both strings
+    and the length of their longest common subsequence. With substitutions costing 2, the distance is exactly
+    "total - 2 * lcs", so the ratio "(total - distance) / total" reduces to "2 * lcs / total".
+
+    :param total: sum of the lengths of both strings
+    :param lcs: length of the longest common subsequence
+    :return: Levenshtein distance ratio (0.0 if any of the strings is empty)
+    """
+    if total == 0:
+        return 0.0
+    return 2 * lcs / total
+
+
+def levenshtein_ratios(tag: str,
+                       candidates: list) -> list:
+    """
+    Function that computes the Levenshtein distance ratio between "tag" and every string in "candidates" in a single
+    call. The match masks of "tag" are built once and reused for all candidates.
+
+    :param tag: string to score
+    :param candidates: strings to compare "tag" with
+    :return: list with the ratio of every candidate, in the same order
+    """
+    masks = match_masks(tag)
+    m = len(tag)
+    ratios = []
+    for candidate in candidates:
+        # An empty string always scores 0.0, as in "address_labelling.levenshtein"
+        if m == 0 or len(candidate) == 0:
+            ratios.append(0.0)
+        else:
+            ratios.append(ratio(m + len(candidate), lcs_length(masks, m, candidate)))
+    return ratios
+
+
+def best_span(tag: str,
+              tokens: list,
+              tol: float = 0.6) -> tuple:
+    """
+    Function that finds the span of consecutive tokens that best matches "tag" (highest Levenshtein distance ratio),
+    as a semi-global alignment: for every start token, the bit-parallel LCS state is streamed through the following
+    tokens once, reading the ratio of every span at each token end. Spans whose length makes it impossible to score
+    above "tol" (or above the best span so far) are pruned, so every start only looks at a window of about
+    len(tag) * (2 / tol - 1) characters.
+    Ties are resolved as in the exhaustive n-gram scan: fewer tokens first, then leftmost start.
+
+    :param tag: string to search for
+    :param tokens: tokens of the sentence to search in
+    :param tol: minimum ratio (exclusive) for a span to be accepted
+    :return: tuple (ratio, start token, end token) of the best span, or None if no span scores above "tol"
+    """
+    masks = match_masks(tag)
+    m = len(tag)
+    full = (1 << m) - 1
+    best = None
+    for i in range(len(tokens)):
+        v = full
+        length = -1
+        for j in range(i, len(tokens)):
+            length += len(tokens[j]) + 1
+            # Upper bound of the ratio of this span and (once longer than "tag") of every longer span
+            bound = ratio(m + length, min(m, length))
+            if length > m and (bound <= tol or (best is not None and bound < best[0])):
+                break
+            for char in (tokens[j] if j == i else ' ' + tokens[j]):
+                u = v & masks.get(char, 0)
+                v = ((v + u) | (v - u)) & full
+            if bound <= tol or (best is not None and bound < best[0]):
+                continue
+            r = ratio(m + length, m - bin(v).count('1'))
+            if r > tol and (best is None or r > best[0] or
+                            (r == best[0] and (j - i, i) < (best[2] - best[1] - 1, best[1]))):
+                best = (r, i, j + 1)
+    return best
@@ -0,0 +1,98 @@
+class Gazetteer:
+    """
+    Aho-Corasick automaton over token sequences: it finds every occurrence of a set of values in the tokens of a sentence
+    with a single linear scan, and only at token boundaries (a value 'san juan' matches the tokens 'san', 'juan', never
+    the inside of 'pasan juanes'). Values are matched verbatim, so only values whose tokens are separated by single
+    spaces can be added.
+
+    It can be built once over a list of known values (countries, municipalities, ...) and reused for every sentence, or
+    built for every record over its own feature values (see "address_labelling.identify_features").
+
+    Usage:
+        gazetteer = Gazetteer(['spain', 'madrid', 'comunidad de madrid'])
+        gazetteer.find('calle mayor 5 madrid comunidad de madrid spain'.split())
+    """
+
+    def __init__(self, values=()):
+        """
+        :param values: iterable of values to match
+        """
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.values = set()
+        self.built = True
+        for value in values:
+            self.add(value)
+        self.build()
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, value: str):
+        return value in self.values
+
+    def add(self, value: str) -> bool:
+        """
+        Method that adds a value ("build" must be called before matching).
+
+        :param value: value to match
+        :return: whether the value could be added or not (empty values or with irregular spacing can not)
+        """
+        tokens = value.split()
+        if not tokens or ' '.join(tokens) != value:
+            return False
+        if value in self.values:
+            return True
+        node = 0
+        for token in tokens:
+            if token not in self.goto[node]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][token] = len(self.goto) - 1
+            node = self.goto[node][token]
+        self.output[node].append((value, len(tokens)))
+        self.values.add(value)
+        self.built = False
+        return True
+
+    def build(self):
+        """
+        Method that computes the failure links of the automaton (breadth first) and merges the outputs along them.
+        """
+        queue = list(self.goto[0].values())
+        for node in queue:
+            self.fail[node] = 0
+        for node in queue:
+            for token, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and token not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(token, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+        self.built = True
+
+    def find(self, tokens: list) -> dict:
+        """
+        Method that finds the leftmost occurrence of every value in a list of tokens.
+
+        :param tokens: tokens of the sentence
+        :return: dictionary with the span (start token, end token) of the leftmost occurrence of every value found
+        """
+        if not self.built:
+            self.build()
+        goto, fail, output = self.goto, self.fail, self.output
+        found = {}
+        node = 0
+        for j, token in enumerate(tokens):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for value, n_tokens in output[node]:
+                # Values have a fixed number of tokens, so the first occurrence to end is the leftmost one
+                if value not in found:
+                    found[value] = (j + 1 - n_tokens, j + 1)
+        return found
+
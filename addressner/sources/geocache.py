@@ -0,0 +1,98 @@
+import sqlite3
+from json import dumps as json_dumps
+from json import loads as json_loads
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+
+def query_key(url: str,
+              ignore: (list, tuple) = ('subscription-key',)) -> str:
+    """
+    Function that builds the cache key of a URL query: its parameters (but those in "ignore") sorted, with the 'query'
+    parameter normalised (lowercase, single blank spaces). Queries of the same address with the same options share it.
+
+    :param url: URL to query
+    :param ignore: parameters left out of the key
+    :return: cache key
+    """
+    params = []
+    for name, value in parse_qsl(urlsplit(url).query, keep_blank_values=True):
+        if name in ignore:
+            continue
+        if name == 'query':
+            value = ' '.join(value.lower().split())
+        params.append((name, value))
+    return urlencode(sorted(params))
+
+
+class GeocodingCache:
+    """
+    On-disk (SQLite) cache of geocoding results keyed by "query_key", that counts its hits and misses.
+    """
+
+    def __init__(self,
+                 path: str = '../Data/AzureMaps results/geocoding_cache.sqlite',
+                 commit_every: int = 100):
+        """
+        :param path: path of the SQLite database (created if it does not exist)
+        :param commit_every: number of new results after which they are committed to disk
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL)')
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def get(self, key: str) -> (dict, None):
+        """
+        Method that looks a result up.
+
+        :param key: cache key (see "query_key")
+        :return: the cached result, or None if it is not cached
+        """
+        row = self.connection.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json_loads(row[0])
+
+    def put(self, key: str, result: dict):
+        """
+        Method that stores a result.
+
+        :param key: cache key (see "query_key")
+        :param result: result of the query
+        """
+        self.connection.execute('INSERT OR REPLACE INTO results (key, result) VALUES (?, ?)', (key, json_dumps(result)))
+        self.uncommitted += 1
+        if self.uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.connection.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def stats(self) -> dict:
+        """
+        Method that summarises the lookups made so far.
+
+        :return: dictionary with the number of hits and misses and the hit rate
+        """
+        lookups = self.hits + self.misses
+        return {'cache_hits': self.hits,
+                'cache_misses': self.misses,
+                'cache_hit_rate': self.hits / lookups if lookups > 0 else 0.0}
@@ -0,0 +1,134 @@
+from csv import reader as csv_reader
+from io import TextIOWrapper
+from itertools import islice
+from queue import Queue, Full
+from threading import Event, Thread
+from zipfile import ZipFile
+from addressner.sources.instrumentation import stage
+
+
+# Separator and columns of the addresses export
+SEPARATOR = '\u03bc'
+HEADER = ['CLIENT_ID', 'ADDRESS', 'POSTALCODE', 'CITY', 'STATE', 'COUNTRY']
+
+# Fields read as missing values (None), as pandas "read_csv" does by default
+NA_VALUES = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A',
+             'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+
+
+def read_batches(path: str,
+                 member: str,
+                 n_columns: int = len(HEADER),
+                 sep: str = SEPARATOR,
+                 chunk_size: int = 10000,
+                 nrows: (int, None) = None,
+                 encoding: str = 'utf-8'):
+    """
+    Function that reads a separated file inside a zip file in batches, decoding the zip member as a stream. Lines are
+    split with the C "csv" reader (quoted fields allowed, blank lines skipped), so the whole file is never in memory.
+
+    :param path: path of the zip file
+    :param member: name of the file inside the zip file
+    :param n_columns: number of columns of every record (missing columns are None, extra columns are dropped)
+    :param sep: separator of the columns (a single character)
+    :param chunk_size: number of records per batch
+    :param nrows: number of records to read (all of them if None)
+    :param encoding: encoding of the file
+    :return: generator of lists of tuples, with None for missing values
+    """
+    with ZipFile(path) as zf, zf.open(member) as raw:
+        lines = csv_reader(TextIOWrapper(raw, encoding=encoding, newline=''), delimiter=sep)
+        records = (tuple(None if field in NA_VALUES else field for field in (row + [''] * n_columns)[:n_columns])
+                   for row in lines if row)
+        records = islice(records, nrows)
+        batch = list(islice(records, chunk_size))
+        while batch:
+            yield batch
+            batch = list(islice(records, chunk_size))
+
+
+def prefetch(iterable,
+             size: int = 2):
+    """
+    Function that iterates over "iterable" in a background thread, keeping up to "size" elements ready. Reading and
+    decompressing the next batches then overlaps with the processing of the current one. If the generator is closed
+    before the end (e.g. by "islice"), the thread stops and closes "iterable" (and so the file of "read_batches").
+
+    :param iterable: iterable to prefetch (e.g. "read_batches")
+    :param size: maximum number of elements ready
+    :return: generator with the elements of "iterable"
+    """
+    queue = Queue(maxsize=size)
+    stop = Event()
+    end = object()
+
+    def put(item) -> bool:
+        # Wait for room in the queue unless the consumer stops
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for element in iterable:
+                if not put((element, None)):
+                    break
+            else:
+                put((end, None))
+        except Exception as e:
+            put((end, e))
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    thread = Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            element, error = queue.get()
+            if element is end:
+                if error is not None:
+                    raise error
+                return
+            yield element
+    finally:
+        stop.set()
+        thread.join()
+
+
+def join_fields(fields) -> str:
+    """
+    Function that joins fields with blank spaces, with missing values as empty strings (as "str.cat(sep=' ',
+    na_rep='')" does).
+
+    :param fields: fields to join
+    :return: joined string
+    """
+    return ' '.join('' if field is None else field for field in fields)
+
+
+def clean_batches(batches,
+                  cleaner,
+                  text,
+                  required: (list, tuple) = (HEADER.index('ADDRESS'),)):
+    """
+    Function that cleans records batch by batch, dropping the records with missing values in the "required" columns.
+
+    :param batches: iterable of lists of records (see "read_batches")
+    :param cleaner: "cleaning.Cleaner" to clean the records with
+    :param text: function that builds the string to clean from a record
+    :param required: indices of the columns that can not be missing
+    :return: generator of lists of tuples (record, clean string)
+    """
+    for batch in batches:
+        with stage('cleaning') as s:
+            records = [record for record in batch if all(record[i] is not None for i in required)]
+            texts = [text(record) for record in records]
+            clean = list(zip(records, cleaner.clean_many(texts)))
+            # Only the records cleaned count for the throughput, the ones dropped are counted apart
+            s.count(records=len(records), dropped=len(batch) - len(records), bytes=sum(len(t) for t in texts))
+        yield clean
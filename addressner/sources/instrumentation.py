@@ -0,0 +1,273 @@
+from contextlib import contextmanager
+from cProfile import Profile
+from functools import wraps
+from json import dump as json_dump
+from math import frexp
+from os import getpid, makedirs
+from os.path import dirname
+from platform import platform, python_version
+from pstats import Stats
+from sys import argv
+from threading import Lock
+from time import perf_counter, time
+
+
+# Latency histograms have one bucket per power of two of microseconds: bucket b holds latencies in [2^(b-1), 2^b) us
+N_BUCKETS = 40
+
+
+def bucket(seconds: float) -> int:
+    return min(max(frexp(seconds * 1e6)[1], 0), N_BUCKETS - 1)
+
+
+class Stage:
+    """
+    Measures of a stage of a job: number of calls and wall time of its timed sections, counters of what it processed
+    (records, docs, bytes, ...) and a histogram of the latencies observed in it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.time = 0.0
+        self.counts = {}
+        self.histogram = [0] * N_BUCKETS
+        self.n_latencies = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.profile = None
+
+    def count(self, **counts):
+        """
+        Method that adds to the counters of the stage, e.g. "stage.count(records=500, bytes=35000)".
+        """
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def observe(self, seconds: float):
+        """
+        Method that adds a latency to the histogram of the stage.
+
+        :param seconds: latency in seconds
+        """
+        self.histogram[bucket(seconds)] += 1
+        self.n_latencies += 1
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """
+        :param q: quantile, between 0 and 1
+        :return: upper bound of the histogram bucket of the quantile, in seconds
+        """
+        target = q * self.n_latencies
+        seen = 0
+        for b, n in enumerate(self.histogram):
+            seen += n
+            if n and seen >= target:
+                return min(2 ** b / 1e6, self.latency_max)
+        return self.latency_max
+
+    def report(self) -> dict:
+        report = {'calls': self.calls,
+                  'time': self.time,
+                  'counts': dict(self.counts),
+                  'throughput': {key + '/s': value / self.time for key, value in self.counts.items() if self.time > 0}}
+        if self.n_latencies:
+            report['latency'] = {'n': self.n_latencies,
+                                 'mean': self.latency_sum / self.n_latencies,
+                                 'p50': self.quantile(0.5),
+                                 'p95': self.quantile(0.95),
+                                 'p99': self.quantile(0.99),
+                                 'max': self.latency_max,
+                                 'histogram_us': {f'<{2 ** b}': n for b, n in enumerate(self.histogram) if n}}
+        if self.profile is not None:
+            report['profile'] = self.profile
+        return report
+
+
+class Instrumentation:
+    """
+    Collector of the measures of the stages of a job (see "Stage"). Sections of code are timed with the "stage" context
+    manager or the "timed" decorator, and the counters and latencies of a stage are added with "count" and "observe".
+    Stages named in "profile" (or all of them if True) are also run under cProfile, and their top functions by
+    cumulative time are added to the report. The report is a .json (dict) with the run information and every stage.
+
+    The modules of the project report to the instance "INSTRUMENTATION" of this module, through the functions "stage",
+    "timed", "count" and "observe". In process pools every worker has its own instance, so the main process only
+    reports the wall time of the pooled stages.
+
+    Usage:
+        with stage('cleaning') as s:
+            ...
+            s.count(records=len(batch))
+        save_report('../Data/reports/run.json')
+    """
+
+    def __init__(self,
+                 profile: (bool, set, list) = False,
+                 profile_top: int = 25):
+        """
+        :param profile: names of the stages to profile with cProfile (all if True, none if False)
+        :param profile_top: number of functions of the profile of every stage to report
+        """
+        self.profile = profile
+        self.profile_top = profile_top
+        self.stages = {}
+        self.profiles = {}
+        self.profiling = False
+        self.lock = Lock()
+        self.started = time()
+
+    def get(self, name: str) -> Stage:
+        """
+        :param name: name of the stage
+        :return: measures of the stage (created if needed)
+        """
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = Stage(name)
+            return self.stages[name]
+
+    def profiled(self, name: str) -> bool:
+        return self.profile is True or (bool(self.profile) and name in self.profile)
+
+    @contextmanager
+    def stage(self, name: str, **counts):
+        """
+        Context manager that times a section of code as a call of a stage.
+
+        :param name: name of the stage
+        :param counts: counters to add to the stage
+        :return: measures of the stage, to count what the section processes
+        """
+        s = self.get(name)
+        profile = None
+        if self.profiled(name) and not self.profiling:
+            # cProfile does not nest, so only the outermost profiled stage is profiled
+            profile = self.profiles.setdefault(name, Profile())
+            self.profiling = True
+            profile.enable()
+        t0 = perf_counter()
+        try:
+            yield s
+        finally:
+            t = perf_counter() - t0
+            if profile is not None:
+                profile.disable()
+                self.profiling = False
+                s.profile = self.profile_stats(profile)
+            with self.lock:
+                s.calls += 1
+                s.time += t
+                s.count(**counts)
+
+    def timed(self, name: str):
+        """
+        Decorator that times every call of a function as a call of a stage.
+
+        :param name: name of the stage
+        """
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name: str, **counts):
+        """
+        Method that adds to the counters of a stage.
+
+        :param name: name of the stage
+        :param counts: counters to add, e.g. records=500
+        """
+        s = self.get(name)
+        with self.lock:
+            s.count(**counts)
+
+    def observe(self, name: str, seconds: float):
+        """
+        Method that adds a latency to the histogram of a stage.
+
+        :param name: name of the stage
+        :param seconds: latency in seconds
+        """
+        s = self.get(name)
+        with self.lock:
+            s.observe(seconds)
+
+    def profile_stats(self, profile: Profile) -> list:
+        stats = Stats(profile)
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.profile_top]
+        return [{'function': f'{file}:{line}({function})', 'calls': calls, 'tottime': tottime, 'cumtime': cumtime}
+                for (file, line, function), (_, calls, tottime, cumtime, _) in functions]
+
+    def report(self) -> dict:
+        """
+        :return: dictionary with the information of the run and the measures of every stage
+        """
+        with self.lock:
+            return {'run': {'script': argv[0] if argv else '', 'pid': getpid(), 'started': self.started,
+                            'wall_time': time() - self.started, 'python': python_version(), 'platform': platform()},
+                    'stages': {name: s.report() for name, s in self.stages.items()}}
+
+    def save(self, path: str):
+        """
+        Method that saves the report in .json format.
+
+        :param path: path of the report
+        """
+        if dirname(path):
+            makedirs(dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json_dump(self.report(), f, indent=2)
+
+    def reset(self):
+        """
+        Method that discards all the measures and starts a new run.
+        """
+        with self.lock:
+            self.stages = {}
+            self.profiles = {}
+            self.started = time()
+
+
+# Instance the modules of the project report to
+INSTRUMENTATION = Instrumentation()
+
+
+def stage(name: str, **counts):
+    """
+    See "Instrumentation.stage".
+    """
+    return INSTRUMENTATION.stage(name, **counts)
+
+
+def timed(name: str):
+    """
+    See "Instrumentation.timed".
+    """
+    return INSTRUMENTATION.timed(name)
+
+
+def count(name: str, **counts):
+    """
+    See "Instrumentation.count".
+    """
+    INSTRUMENTATION.count(name, **counts)
+
+
+def observe(name: str, seconds: float):
+    """
+    See "Instrumentation.observe".
+    """
+    INSTRUMENTATION.observe(name, seconds)
+
+
+def save_report(path: str):
+    """
+    See "Instrumentation.save".
+    """
+    INSTRUMENTATION.save(path)
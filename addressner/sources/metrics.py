@@ -0,0 +1,173 @@
+from numpy import array, bincount, concatenate, divide, isin, int64, searchsorted, unique, where, zeros
+
+
+def spans_array(records: list,
+                labels: dict) -> tuple:
+    """
+    Function that turns the entities of a list of records (text, {'entities': [(start, end, label), ...]}) into an
+    integer array with one row (doc, start, end, label id) per entity, where doc is the position of the record in the
+    list. Labels not in "labels" are added to it.
+
+    :param records: list of records
+    :param labels: dictionary with the id of every label
+    :return: array of spans (n x 4) and number of records
+    """
+    rows = []
+    n_docs = 0
+    for doc, (_, annotations) in enumerate(records):
+        for start, end, label in annotations['entities']:
+            rows.append((doc, start, end, labels.setdefault(label, len(labels))))
+        n_docs += 1
+    spans = array(rows, dtype=int64).reshape(-1, 4)
+    return spans, n_docs
+
+
+def span_keys(spans, width: int, n_labels: int) -> tuple:
+    """
+    Function that encodes spans as integers, with and without their label, so that set operations on spans are set
+    operations on integer arrays.
+
+    :param spans: array of spans (see "spans_array")
+    :param width: number greater than every start and end
+    :param n_labels: number greater than every label id
+    :return: keys of the spans (doc, start, end, label) and of their positions (doc, start, end)
+    """
+    positions = (spans[:, 0] * width + spans[:, 1]) * width + spans[:, 2]
+    return positions * n_labels + spans[:, 3], positions
+
+
+def prf(tp_pred, tp_gold, n_pred, n_gold) -> tuple:
+    """
+    :param tp_pred: number of predicted entities that are right
+    :param tp_gold: number of gold entities that are predicted
+    :param n_pred: number of predicted entities
+    :param n_gold: number of gold entities
+    :return: precision, recall and F1-score (0 where undefined)
+    """
+    p = divide(tp_pred, n_pred, out=zeros(len(n_pred)), where=n_pred > 0)
+    r = divide(tp_gold, n_gold, out=zeros(len(n_gold)), where=n_gold > 0)
+    f = divide(2 * p * r, p + r, out=zeros(len(p)), where=p + r > 0)
+    return p, r, f
+
+
+class EntityMetrics:
+    """
+    Streaming evaluation of predicted entities against gold ones, on character spans: an entity is right if its start,
+    end and label are those of a gold entity of the same record. Every batch of (gold, predicted) records is turned
+    into integer arrays (see "spans_array") and scored with vectorised set operations; only per-label counts are kept,
+    so any number of records can be evaluated batch by batch.
+
+    Scores:
+        - acc: mean, over records, of the ratio of predicted entities that are right (0 if nothing is predicted), as
+          "ner.accuracy"
+        - ents_p, ents_r, ents_f: micro precision, recall and F1-score
+        - ents_macro_p, ents_macro_r, ents_macro_f: mean of the per-label scores
+        - ents_per_type: precision, recall and F1-score of every label
+        - confusion: counts of gold label (rows) vs predicted label (columns) of the entities with the same span, plus
+          the gold entities with no predicted entity on their span (column '') and vice versa (row '')
+
+    Usage:
+        metrics = EntityMetrics()
+        for gold, pred in batches:
+            metrics.update(gold, pred)
+        scores = metrics.scores()
+    """
+
+    def __init__(self, labels: (list, None) = None):
+        """
+        :param labels: labels to report even if they are never seen (in this order, before the new ones)
+        """
+        self.labels = {label: i for i, label in enumerate(labels or [])}
+        self.tp_pred = zeros(0, dtype=int64)
+        self.tp_gold = zeros(0, dtype=int64)
+        self.n_pred = zeros(0, dtype=int64)
+        self.n_gold = zeros(0, dtype=int64)
+        self.confusion = {}
+        self.acc_sum = 0.0
+        self.n_docs = 0
+
+    @staticmethod
+    def add(total, counts):
+        if len(counts) > len(total):
+            total = concatenate([total, zeros(len(counts) - len(total), dtype=int64)])
+        total[:len(counts)] += counts
+        return total
+
+    def update(self, gold: list, pred: list):
+        """
+        Method that adds a batch of records to the evaluation.
+
+        :param gold: list of records with the gold entities
+        :param pred: list of records with the predicted entities (same texts, same order)
+        """
+        gold_spans, n_docs = spans_array(gold, self.labels)
+        pred_spans, n_docs_pred = spans_array(pred, self.labels)
+        if n_docs != n_docs_pred:
+            raise ValueError(f'There are {n_docs} gold records and {n_docs_pred} predicted records')
+        n_labels = len(self.labels)
+        width = int(max(gold_spans[:, 1:3].max(initial=0), pred_spans[:, 1:3].max(initial=0))) + 1
+        gold_keys, gold_positions = span_keys(gold_spans, width, n_labels)
+        pred_keys, pred_positions = span_keys(pred_spans, width, n_labels)
+
+        # Right entities, from both sides (as lists, entities could be repeated)
+        pred_right = isin(pred_keys, gold_keys)
+        gold_found = isin(gold_keys, pred_keys)
+        self.tp_pred = self.add(self.tp_pred, bincount(pred_spans[:, 3], weights=pred_right, minlength=n_labels)
+                                .astype(int64))
+        self.tp_gold = self.add(self.tp_gold, bincount(gold_spans[:, 3], weights=gold_found, minlength=n_labels)
+                                .astype(int64))
+        self.n_pred = self.add(self.n_pred, bincount(pred_spans[:, 3], minlength=n_labels))
+        self.n_gold = self.add(self.n_gold, bincount(gold_spans[:, 3], minlength=n_labels))
+
+        # Accuracy of every record
+        right = bincount(pred_spans[:, 0], weights=pred_right, minlength=n_docs)
+        predicted = bincount(pred_spans[:, 0], minlength=n_docs)
+        self.acc_sum += divide(right, predicted, out=zeros(n_docs), where=predicted > 0).sum()
+        self.n_docs += n_docs
+
+        # Confusion of labels on the same spans (-1 means no entity on the span)
+        order = gold_positions.argsort(kind='stable')
+        sorted_positions = gold_positions[order]
+        k = searchsorted(sorted_positions, pred_positions).clip(max=max(len(order) - 1, 0))
+        if len(order) > 0:
+            same = sorted_positions[k] == pred_positions
+            gold_of_pred = where(same, gold_spans[order[k], 3], -1)
+        else:
+            gold_of_pred = zeros(len(pred_positions), dtype=int64) - 1
+        unmatched = gold_spans[~isin(gold_positions, pred_positions), 3]
+        pairs = concatenate([array([gold_of_pred, pred_spans[:, 3]]).T,
+                             array([unmatched, zeros(len(unmatched), dtype=int64) - 1]).T])
+        if len(pairs) > 0:
+            values, counts = unique(pairs, axis=0, return_counts=True)
+            for (g, p), count in zip(values.tolist(), counts.tolist()):
+                self.confusion[g, p] = self.confusion.get((g, p), 0) + count
+
+    def scores(self, percentage: bool = True) -> dict:
+        """
+        :param percentage: whether returning the scores over 100% or not
+        :return: dictionary with the scores (see the class documentation)
+        """
+        factor = 100 if percentage else 1
+        names = list(self.labels)
+        n_labels = len(names)
+        tp_pred, tp_gold, n_pred, n_gold = [self.add(zeros(n_labels, dtype=int64), counts)
+                                            for counts in (self.tp_pred, self.tp_gold, self.n_pred, self.n_gold)]
+        p, r, f = prf(tp_pred, tp_gold, n_pred, n_gold)
+        (micro_p,), (micro_r,), (micro_f,) = prf(tp_pred.sum(keepdims=True), tp_gold.sum(keepdims=True),
+                                                 n_pred.sum(keepdims=True), n_gold.sum(keepdims=True))
+
+        confusion = {}
+        for (g, k), count in sorted(self.confusion.items()):
+            row = confusion.setdefault(names[g] if g >= 0 else '', {})
+            row[names[k] if k >= 0 else ''] = count
+
+        return {'acc': (self.acc_sum / self.n_docs if self.n_docs else 0.0) * factor,
+                'ents_p': micro_p * factor,
+                'ents_r': micro_r * factor,
+                'ents_f': micro_f * factor,
+                'ents_macro_p': p.mean() * factor if n_labels else 0.0,
+                'ents_macro_r': r.mean() * factor if n_labels else 0.0,
+                'ents_macro_f': f.mean() * factor if n_labels else 0.0,
+                'ents_per_type': {label: {'p': p[i] * factor, 'r': r[i] * factor, 'f': f[i] * factor}
+                                  for i, label in enumerate(names)},
+                'confusion': confusion}
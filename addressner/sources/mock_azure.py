@@ -0,0 +1,155 @@
+import asyncio
+from collections import deque
+from random import Random
+from time import monotonic
+from zlib import crc32
+from aiohttp import web
+from addressner.sources.synthetic import VOCABULARY
+
+
+# Places of the synthetic addresses (see "synthetic.VOCABULARY") of every field of the vocabulary, as tuples of tokens
+PLACES = {field: {tuple(value.split()) for vocabulary in VOCABULARY.values() for value in vocabulary[field]}
+          for field in ['municipalities', 'subdivisions', 'countries']}
+
+
+def take_place(tokens: list,
+               field: str,
+               fallback: bool = True) -> tuple:
+    """
+    Function that takes a place from the end of the tokens of a query: the longest place of the field (see "PLACES")
+    the tokens end with or, if there is none, their last token (unless it is a number).
+
+    :param tokens: tokens of the query
+    :param field: field of the vocabulary ('municipalities', 'subdivisions' or 'countries')
+    :param fallback: whether to take the last token if the tokens do not end with a place of the field or not
+    :return: tuple (place, tokens before it)
+    """
+    for n in range(len(tokens), 0, -1):
+        if tuple(tokens[-n:]) in PLACES[field]:
+            return ' '.join(tokens[-n:]), tokens[:-n]
+    if fallback and tokens and not tokens[-1].isdigit():
+        return tokens[-1], tokens[:-1]
+    return '', tokens
+
+
+def place_code(place: str) -> str:
+    """
+    :param place: name of a place
+    :return: code of the place, as Azure Maps gives for subdivisions and countries (initials, or first two letters)
+    """
+    words = place.split()
+    return ''.join(word[0] for word in words).upper() if len(words) > 1 else place[:2].upper()
+
+
+class MockAzureMaps:
+    """
+    Local stand-in of the Azure Maps 'search/address/json' endpoint, to benchmark "fetching" without API quota. It
+    answers with a payload shaped like the real one (built from the query) after a configurable latency, and it can
+    fail with 5xx errors at a given rate and throttle with 429 (and "Retry-After") above a given requests per second.
+
+    Usage:
+        server = MockAzureMaps(latency=0.05, error_rate=0.01, throttle_rps=200)
+        url = await server.start()  # e.g. 'http://127.0.0.1:54321/search/address/json'
+        ...
+        await server.stop()
+    """
+
+    def __init__(self,
+                 latency: float = 0.05,
+                 jitter: float = 0.02,
+                 error_rate: float = 0.0,
+                 throttle_rps: (float, None) = None,
+                 retry_after: float = 1.0,
+                 seed: (int, None) = None):
+        """
+        :param latency: mean latency of the answers, in seconds
+        :param jitter: maximum deviation of the latency from its mean, in seconds
+        :param error_rate: ratio of requests answered with HTTP 500
+        :param throttle_rps: requests per second above which requests are answered with HTTP 429 (no limit if None)
+        :param retry_after: value of the "Retry-After" header of the 429 answers, in seconds
+        :param seed: seed of the latencies and errors
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rps = throttle_rps
+        self.retry_after = retry_after
+        self.random = Random(seed)
+        self.window = deque()
+        self.runner = None
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+
+    @staticmethod
+    def payload(query: str) -> dict:
+        """
+        Method that builds a result for a query, with the fields of the real 'address'. The first number of the query is
+        the street number and the words before it the street name. The words after it end with the municipality, the
+        subdivision and the country, taken from the end in reverse order (see "take_place"), so every field gets its
+        own words of the query, as in the real results.
+
+        :param query: address query
+        :return: result in .json (dict) format
+        """
+        tokens = query.split()
+        numbers = [i for i, token in enumerate(tokens) if token.isdigit()]
+        n = numbers[0] if numbers else len(tokens)
+        postal_code = next((tokens[i] for i in numbers[1:] if len(tokens[i]) >= 4), '')
+        country, rest = take_place(tokens[n + 1:], 'countries')
+        # An unknown subdivision is only taken if a word is left for the municipality
+        subdivision, rest = take_place(rest, 'subdivisions', fallback=len(rest) > 1)
+        municipality, _ = take_place(rest, 'municipalities')
+        address = {'streetNumber': tokens[n] if numbers else '',
+                   'streetName': ' '.join(tokens[:n]),
+                   'municipality': municipality,
+                   'countrySubdivision': place_code(subdivision),
+                   'countrySubdivisionName': subdivision,
+                   'postalCode': postal_code,
+                   'extendedPostalCode': postal_code,
+                   'country': country,
+                   'countryCode': place_code(country),
+                   'freeformAddress': query}
+        return {'summary': {'query': query, 'queryType': 'NON_NEAR', 'numResults': 1, 'offset': 0, 'totalResults': 1},
+                'results': [{'type': 'Point Address', 'id': str(crc32(query.encode('utf-8'))), 'score': 10.0,
+                             'address': address, 'position': {'lat': 0.0, 'lon': 0.0}}]}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.throttle_rps is not None:
+            now = monotonic()
+            while self.window and now - self.window[0] > 1:
+                self.window.popleft()
+            if len(self.window) >= self.throttle_rps:
+                self.throttled += 1
+                return web.json_response({'error': {'code': '429 Too Many Requests'}}, status=429,
+                                         headers={'Retry-After': str(self.retry_after)})
+            self.window.append(now)
+
+        await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({'error': {'code': '500 Internal Server Error'}}, status=500)
+        return web.json_response(self.payload(request.query.get('query', '')))
+
+    async def start(self,
+                    host: str = '127.0.0.1',
+                    port: int = 0) -> str:
+        """
+        Method that starts the server.
+
+        :param host: host to listen on
+        :param port: port to listen on (a free one if 0)
+        :return: URL of the endpoint
+        """
+        app = web.Application()
+        app.router.add_get('/search/address/json', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        host, port = self.runner.addresses[0][:2]
+        return f'http://{host}:{port}/search/address/json'
+
+    async def stop(self):
+        await self.runner.cleanup()
+        self.runner = None
@@ -1,12 +1,57 @@
-from random import sample
+from random import Random
+from time import perf_counter, strftime
 from pickle import dump as pickle_dump
+from multiprocessing import Pool, cpu_count
 from json import dump as json_dump
+from uuid import uuid4
 from spacy import blank
+from spacy import load as spacy_load
 import spacy
 from tqdm import tqdm
-from numpy import mean
 from spacy.scorer import Scorer
 from spacy.gold import GoldParse
+from spacy.util import minibatch, compounding, fix_random_seed
+from addressner.sources.elapsed_time import elapsed_time
+from addressner.sources.corpus import write_corpus, load_data
+from addressner.sources.splits import Splits
+from addressner.sources.metrics import EntityMetrics
+from addressner.sources.instrumentation import stage, observe
+from addressner.sources.parsecache import ParseCache, cached_parse, model_key
+
+
+def save_data(data: list,
+              word: str,
+              path: str = '',
+              prefix: str = '',
+              suffix: str = '',
+              file_format: (str, list) = 'ner'):
+    """
+    This function saves a dataset of (text, annotations) records as a corpus file (.ner, see "corpus.write_corpus"),
+    pickled .txt and/or .json files.
+
+    :param data: data to save
+    :param word: word in the name of the files ('pred', 'train', 'test', ...)
+    :param path: where to save the files
+    :param prefix: prefix to "word" in the name of the files
+    :param suffix: suffix to "word" in the name of the files
+    :param file_format: format(s) of the saved files: 'ner', 'txt' and/or 'json'
+    """
+    file_format = file_format if isinstance(file_format, (list, tuple)) else [file_format]
+    path = path if (path == '' or path[-1] == '/') else path + '/'
+    suffix = '_' + str(suffix) if len(str(suffix)) > 0 else suffix
+    prefix = str(prefix) + '_' if len(str(prefix)) > 0 else prefix
+    name = path + prefix + word + suffix
+
+    if 'ner' in file_format:
+        write_corpus(data, name + '.ner')
+
+    if 'txt' in file_format:
+        with open(name + '.txt', 'wb') as f:
+            pickle_dump(data, f)
+
+    if 'json' in file_format:
+        with open(name + '.json', 'w') as f:
+            json_dump(data, f)
 
 
 def train_test_split(data: list,
@@ -15,9 +60,11 @@ def train_test_split(data: list,
                      path: str = '',
                      prefix: str = '',
                      suffix: str = '',
-                     file_format: (str, list) = ('txt', 'json')) -> tuple:
+                     file_format: (str, list) = 'ner',
+                     seed: (int, None) = None) -> tuple:
     """
-    This function performs a train-test split.
+    This function performs a train-test split. To make several splits of the same data without copying it, see
+    "splits.Splits".
 
     :param data: data
     :param train_ratio: ratio of data records to make up the training set
@@ -26,36 +73,75 @@ def train_test_split(data: list,
     :param prefix: prefix to 'train' or 'test' words in the name of the files if "save=True"
     :param suffix: suffix to 'train' or 'test' words in the name of the files if "save=True"
     :param file_format: format of the saved files if "save=True"
+    :param seed: seed of the shuffling (not reproducible if None)
     :return: train and test sets
     """
-    data_random = sample(data, len(data))
+    data_random = Random(seed).sample(data, len(data))
     split = round(train_ratio * len(data))
     train = data_random[:split]
     test = data_random[split:]
 
     if save:
-        file_format = file_format if isinstance(file_format, (list, tuple)) else [file_format]
-        path = path if (path == '' or path[-1] == '/') else path + '/'
-        suffix = '_' + str(suffix) if len(str(suffix)) > 0 else suffix
-        prefix = str(prefix) + '_' if len(str(prefix)) > 0 else prefix
-        name_train = path + prefix + 'train' + suffix
-        name_test = path + prefix + 'test' + suffix
-
-        if 'txt' in file_format:
-            with open(name_train + '.txt', 'wb') as f:
-                pickle_dump(train, f)
-            with open(name_test + '.txt', 'wb') as f:
-                pickle_dump(test, f)
-
-        if 'json' in file_format:
-            with open(name_train + '.json', 'w') as f:
-                json_dump(train, f)
-            with open(name_test + '.json', 'w') as f:
-                json_dump(test, f)
+        save_data(train, 'train', path, prefix, suffix, file_format)
+        save_data(test, 'test', path, prefix, suffix, file_format)
 
     return train, test
 
 
+def train_epochs(nlp: spacy.lang,
+                 train_data: list,
+                 optimizer,
+                 n_iter: int = 1,
+                 batch_size: (int, tuple) = 1,
+                 drop: float = 0.0,
+                 shuffle: bool = False,
+                 seed: (int, None) = None,
+                 progress: bool = True,
+                 name: str = 'address_ner') -> list:
+    """
+    Function that updates a NER model with the training data in minibatches over several epochs, logging the loss and
+    the examples per second of every epoch.
+
+    :param nlp: spaCy model to update
+    :param train_data: training data
+    :param optimizer: optimizer
+    :param n_iter: number of epochs
+    :param batch_size: number of examples per minibatch, or tuple (start, stop, compound) of compounding batch sizes
+    :param drop: dropout rate
+    :param shuffle: whether to shuffle the training data before every epoch or not
+    :param seed: seed of the shuffling
+    :param progress: whether to show progress with "tqdm" or not
+    :param name: name of the NER model (description for the "tqdm" Wrapper and the log)
+    :return: list with the losses of every epoch
+    """
+    data = list(train_data)
+    rand = Random(seed)
+    epoch_losses = []
+    for epoch in range(n_iter):
+        if shuffle:
+            rand.shuffle(data)
+        size = compounding(*batch_size) if isinstance(batch_size, (list, tuple)) else batch_size
+        batches = minibatch(data, size=size)
+        if progress:
+            batches = tqdm(batches, desc=name if n_iter == 1 else f'{name} ({epoch + 1}/{n_iter})')
+
+        losses = {}
+        t0 = perf_counter()
+        with stage('training', examples=len(data)):
+            for batch in batches:
+                t_batch = perf_counter()
+                texts, annotations = zip(*batch)
+                nlp.update(texts, annotations, sgd=optimizer, drop=drop, losses=losses)
+                observe('training', perf_counter() - t_batch)
+        t = perf_counter() - t0
+
+        epoch_losses.append(losses.get('ner', 0.0))
+        print(f'{name} epoch {epoch + 1}/{n_iter}: loss {epoch_losses[-1]:.3f}, '
+              f'{len(data) / t if t > 0 else float("inf"):.1f} examples/s')
+
+    return epoch_losses
+
+
 def address_ner(train_data: list,
                 entities: list = (),
                 lang: str = 'en',
@@ -63,9 +149,15 @@ def address_ner(train_data: list,
                 name: str = 'address_ner',
                 progress: bool = True,
                 save: bool = True,
-                path: str = '') -> spacy.lang:
+                path: str = '',
+                n_iter: int = 1,
+                batch_size: (int, tuple) = 1,
+                drop: float = 0.0,
+                shuffle: bool = False,
+                seed: (int, None) = None) -> spacy.lang:
     """
-    Function to train a NER model from scratch.
+    Function to train a NER model from scratch. By default it makes a single pass over the data one example at a time;
+    see "train_epochs" for minibatch, multi-epoch training.
 
     :param train_data: training data
     :param entities: entities to identify. If no provide, the NER model automatically detects them
@@ -75,12 +167,21 @@ def address_ner(train_data: list,
     :param progress: whether to show progress with "tqdm" or not
     :param save: whether to save the NER model or not (if True it will be saved with name "name")
     :param path: path where to save the NER model if "save=True"
+    :param n_iter: number of epochs
+    :param batch_size: number of examples per minibatch, or tuple (start, stop, compound) of compounding batch sizes
+    :param drop: dropout rate
+    :param shuffle: whether to shuffle the training data before every epoch or not
+    :param seed: seed of the shuffling and of the initialisation and dropout of the model (not seeded if None)
     :return: spaCy NER model
     """
+    if seed is not None:
+        fix_random_seed(seed)
+
     # New, empty model
     nlp = blank(lang)
 
-    # Give a name to the list of vectors
+    # Give a name to the model and to the list of vectors
+    nlp.meta['name'] = name
     nlp.vocab.vectors.name = name
 
     # Add NER pipeline (the pipeline would just do NER)
@@ -96,10 +197,12 @@ def address_ner(train_data: list,
         optimizer = nlp.begin_training()
 
     # Update the model with the training data
-    if progress:
-        train_data = tqdm(train_data, desc=name)
-    for text, annotations in train_data:
-        nlp.update([text], [annotations], sgd=optimizer)
+    train_epochs(nlp, train_data, optimizer, n_iter, batch_size, drop, shuffle, seed, progress, name)
+
+    # Keep the training configuration with the model, so it can be reproduced, and identify the weights trained (see
+    # "parsecache.model_key")
+    nlp.meta['training'] = {'n_iter': n_iter, 'batch_size': batch_size, 'drop': drop, 'shuffle': shuffle, 'seed': seed}
+    nlp.meta['training_id'] = uuid4().hex
 
     # Save model
     if save:
@@ -109,6 +212,174 @@ def address_ner(train_data: list,
     return nlp
 
 
+# Hyperparameters of the optimizer kept in the meta of fine-tuned models, so that the next fine-tuning resumes them
+OPTIMIZER_SETTINGS = ['alpha', 'b1', 'b2', 'eps', 'L2', 'max_grad_norm']
+
+
+def next_version(version: str) -> str:
+    """
+    :param version: version of a model ('major.minor.patch')
+    :return: next patch version
+    """
+    parts = (version or '0.0.0').split('.')
+    parts += ['0'] * (3 - len(parts))
+    return '.'.join(parts[:2] + [str(int(parts[2]) + 1)])
+
+
+def fine_tune(new_data,
+              name: str,
+              path: str = '../Data/NER/models/',
+              replay=None,
+              replay_ratio: float = 0.0,
+              entities: list = (),
+              optimizer=None,
+              progress: bool = True,
+              save: bool = True,
+              update: bool = True,
+              n_iter: int = 1,
+              batch_size: (int, tuple) = 1,
+              drop: float = 0.0,
+              shuffle: bool = True,
+              seed: (int, None) = None) -> spacy.lang:
+    """
+    Function that fine-tunes a saved NER model with new records only, instead of training it again from scratch (see
+    "address_ner"). The model keeps its weights and the optimizer resumes the hyperparameters of its last fine-tuning.
+    To avoid forgetting what was learnt from the old records, a random sample of them ("replay_ratio" times the number
+    of new records) can be replayed along with the new ones.
+
+    Every fine-tuning bumps the patch version of the model and records it in its meta (date, number of new and replayed
+    records, losses). If "save=True", a snapshot of the new version is saved in "path" + 'snapshots/' + name + '/' +
+    version, and if "update=True" the model in "path" + name is replaced by it.
+
+    :param new_data: new training records
+    :param name: name of the NER model saved in "path"
+    :param path: directory of the saved models
+    :param replay: old training records to replay (e.g. "splits.Splits.train" of the model)
+    :param replay_ratio: number of old records replayed per new record
+    :param entities: new entities to identify, besides those of the model
+    :param optimizer: optimizer. If no optimizer is provided, the one of the model is resumed
+    :param progress: whether to show progress with "tqdm" or not
+    :param save: whether to save a snapshot of the fine-tuned model or not
+    :param update: whether to replace the saved model with the fine-tuned one or not (if "save=True")
+    :param n_iter: number of epochs
+    :param batch_size: number of examples per minibatch, or tuple (start, stop, compound) of compounding batch sizes
+    :param drop: dropout rate
+    :param shuffle: whether to shuffle the training data before every epoch or not
+    :param seed: seed of the replayed records, of the shuffling and of the dropout of the model (not seeded if None)
+    :return: spaCy NER model fine-tuned
+    """
+    if seed is not None:
+        fix_random_seed(seed)
+
+    path = path if (path == '' or path[-1] == '/') else path + '/'
+    nlp = spacy_load(path + name)
+    ner = nlp.get_pipe('ner')
+
+    # New entity labels, given or found in the new records
+    data = list(new_data)
+    for ent in list(entities) + [label for _, annotations in data for _, _, label in annotations['entities']]:
+        if ent not in ner.labels:
+            ner.add_label(ent)
+
+    # Old records replayed along with the new ones
+    n_replayed = 0
+    if replay is not None and replay_ratio > 0:
+        n_replayed = min(round(replay_ratio * len(data)), len(replay))
+        data += [replay[i] for i in Random(seed).sample(range(len(replay)), n_replayed)]
+
+    # Resume training without initialising the weights again
+    if optimizer is None:
+        optimizer = nlp.resume_training()
+        for setting, value in nlp.meta.get('optimizer', {}).items():
+            setattr(optimizer, setting, value)
+
+    with nlp.disable_pipes(*[pipe for pipe in nlp.pipe_names if pipe != 'ner']):
+        losses = train_epochs(nlp, data, optimizer, n_iter, batch_size, drop, shuffle, seed, progress, name)
+
+    nlp.meta['version'] = next_version(nlp.meta.get('version'))
+    nlp.meta['training_id'] = uuid4().hex
+    nlp.meta['optimizer'] = {setting: getattr(optimizer, setting) for setting in OPTIMIZER_SETTINGS
+                             if hasattr(optimizer, setting)}
+    nlp.meta.setdefault('fine_tuning', []).append({'version': nlp.meta['version'],
+                                                   'date': strftime('%Y-%m-%d %H:%M:%S'),
+                                                   'records': len(data) - n_replayed,
+                                                   'replayed': n_replayed,
+                                                   'seed': seed,
+                                                   'losses': losses})
+
+    if save:
+        nlp.to_disk(path + 'snapshots/' + name + '/' + nlp.meta['version'])
+        if update:
+            nlp.to_disk(path + name)
+
+    return nlp
+
+
+# Training splits already loaded by the current process of "train_grid", by path (or splits and number)
+TRAIN_SPLITS = {}
+
+
+def train_job(job: tuple) -> tuple:
+    """
+    Function that trains (and saves) one NER model of "train_grid". The training split is loaded from disk the first
+    time a process needs it and kept in "TRAIN_SPLITS" for its next jobs.
+
+    :param job: tuple (name, lang, training split, keyword arguments of "address_ner"). The training split is either
+    the path of a dataset file (see "corpus.load_data") or a tuple (path of saved "splits.Splits", number of the split)
+    :return: name of the model and wall time of the job
+    """
+    name, lang, split, kwargs = job
+    t0 = perf_counter()
+    if split not in TRAIN_SPLITS:
+        if isinstance(split, str):
+            TRAIN_SPLITS[split] = load_data(split)
+        else:
+            TRAIN_SPLITS[split] = Splits.load(split[0]).train(split[1])
+    address_ner(TRAIN_SPLITS[split], lang=lang, name=name, **kwargs)
+    return name, perf_counter() - t0
+
+
+def train_grid(jobs: list,
+               n_jobs: (int, None) = None,
+               seed: (int, None) = None,
+               **kwargs) -> dict:
+    """
+    Function that trains a grid of independent NER models across a process pool. Every model is saved (see
+    "address_ner") as soon as it finishes, and a summary of the wall time of every job is printed at the end.
+
+    :param jobs: list of tuples (name, lang, training split (see "train_job")) of the models to train
+    :param n_jobs: number of concurrent jobs (all CPUs if None). If 1, models are trained in this process
+    :param seed: base seed of the jobs: job i is trained with seed "seed + i" (see "address_ner"), whatever the order in
+    which the jobs run (not seeded if None)
+    :param kwargs: keyword arguments of "address_ner" shared by all jobs ("progress" defaults to False)
+    :return: dictionary with the wall time of every job, by name
+    """
+    kwargs.setdefault('progress', False)
+    tasks = [(name, lang, split, {**kwargs, 'seed': None if seed is None else seed + i})
+             for i, (name, lang, split) in enumerate(jobs)]
+    n_jobs = min(cpu_count() if n_jobs is None else n_jobs, len(tasks))
+
+    t0 = perf_counter()
+    times = {}
+    if n_jobs > 1:
+        # One task per process at a time, so that jobs are not queued behind a long one
+        with Pool(n_jobs) as pool:
+            for name, t in pool.imap_unordered(train_job, tasks, chunksize=1):
+                times[name] = t
+                print(f'{name} done ({elapsed_time(t)})')
+    else:
+        for task in tasks:
+            name, t = train_job(task)
+            times[name] = t
+            print(f'{name} done ({elapsed_time(t)})')
+
+    print(f'Trained {len(times)} models with {n_jobs} concurrent jobs in {elapsed_time(perf_counter() - t0)}:')
+    for name, _, _ in jobs:
+        print(f'    {name}: {elapsed_time(times[name])}')
+
+    return times
+
+
 def predict(model: spacy.lang,
             data: list,
             progress: bool = True,
@@ -117,9 +388,14 @@ def predict(model: spacy.lang,
             path: str = '',
             prefix: str = '',
             suffix: str = '',
-            file_format: (str, list) = ('txt', 'json')) -> list:
+            file_format: (str, list) = 'ner',
+            batch_size: int = 1000,
+            n_process: int = 1,
+            cache: (ParseCache, None) = None) -> list:
     """
-    This function makes a prediction for the data using a NER model.
+    This function makes a prediction for the data using a NER model. Texts are streamed through the model in batches
+    with "nlp.pipe", with every pipeline component but the NER disabled. With a cache, texts repeated within a batch
+    are run through the model once and texts already cached are not run at all (see "parsecache.cached_parse").
 
     :param model: NER model
     :param data: input data for the model in order to make a prediction
@@ -130,29 +406,39 @@ def predict(model: spacy.lang,
     :param prefix: prefix to 'pred' word in the name of the files if "save=True"
     :param suffix: suffix to 'pred' word in the name of the files if "save=True"
     :param file_format: format of the saved files if "save=True"
+    :param batch_size: number of texts per batch
+    :param n_process: number of processes to run the model with
+    :param cache: cache of parses (no cache if None). It is switched to the model (see "parsecache.model_key")
     :return: prediction
     """
-    if progress:
-        data = tqdm(data, desc=des)
+    texts = [address[0] for address in data]
+    disable = [pipe for pipe in model.pipe_names if pipe != 'ner']
 
-    pred = [(address[0], {'entities': [(entity.start_char, entity.end_char, entity.label_)
-                                       for entity in model(address[0]).ents]})
-            for address in data]
+    def parse(batch):
+        return [[(entity.start_char, entity.end_char, entity.label_) for entity in doc.ents]
+                for doc in model.pipe(batch, batch_size=batch_size, n_process=n_process, disable=disable)]
 
-    if save:
-        file_format = file_format if isinstance(file_format, (list, tuple)) else [file_format]
-        path = path if (path == '' or path[-1] == '/') else path + '/'
-        suffix = '_' + str(suffix) if len(str(suffix)) > 0 else suffix
-        prefix = str(prefix) + '_' if len(str(prefix)) > 0 else prefix
-        name = path + prefix + 'pred' + suffix
-
-        if 'txt' in file_format:
-            with open(name + '.txt', 'wb') as f:
-                pickle_dump(pred, f)
+    if cache is None:
+        docs = model.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disable)
+        if progress:
+            docs = tqdm(docs, desc=des, total=len(texts))
+        with stage('prediction', docs=len(texts)):
+            pred = [(text, {'entities': [(entity.start_char, entity.end_char, entity.label_) for entity in doc.ents]})
+                    for text, doc in zip(texts, docs)]
+    else:
+        cache.set_model(model_key(model))
+        batches = range(0, len(texts), batch_size)
+        if progress:
+            batches = tqdm(batches, desc=des)
+        pred = []
+        with stage('prediction', docs=len(texts)):
+            for b in batches:
+                batch = texts[b:b + batch_size]
+                pred += [(text, {'entities': entities})
+                         for text, entities in zip(batch, cached_parse(batch, parse, cache))]
 
-        if 'json' in file_format:
-            with open(name + '.json', 'w') as f:
-                json_dump(pred, f)
+    if save:
+        save_data(pred, 'pred', path, prefix, suffix, file_format)
 
     return pred
 
@@ -168,18 +454,9 @@ def accuracy(data: list,
     :param percentage: whether returning the accuracy over 100% or not
     :return: accuracy
     """
-    acc = []
-    for i in range(len(preds)):
-        good = 0
-        for ent in preds[i][1]['entities']:
-            good += 1 if ent in data[i][1]['entities'] else 0
-        try:
-            good_ratio = good / len(preds[i][1]['entities'])
-        except ZeroDivisionError:
-            good_ratio = 0
-        acc.append(good_ratio)
-    factor = 100 if percentage else 1
-    return mean(acc) * factor
+    metrics = EntityMetrics()
+    metrics.update([data[i] for i in range(len(preds))], preds)
+    return metrics.scores(percentage)['acc']
 
 
 def evaluate(ner_model: spacy.lang,
@@ -204,3 +481,82 @@ def evaluate(ner_model: spacy.lang,
         pred_value = ner_model(address)
         scorer.score(pred_value, gold)
     return {key: scorer.scores.get(key) for key in ['ents_p', 'ents_r', 'ents_f', 'ents_per_type']}
+
+
+def predict_evaluate(ner_model: spacy.lang,
+                     data: list,
+                     progress: bool = True,
+                     des: str = '',
+                     save: bool = True,
+                     path: str = '',
+                     prefix: str = '',
+                     suffix: str = '',
+                     file_format: (str, list) = 'ner',
+                     batch_size: int = 1000,
+                     n_process: int = 1,
+                     percentage: bool = True) -> tuple:
+    """
+    Function that makes the predictions of a NER model and evaluates them in a single pass: every text is parsed once
+    (see "predict") and the resulting Doc is both scored against its gold annotations and used to compute accuracy.
+
+    :param ner_model: NER model
+    :param data: data with which to evaluate the model
+    :param progress: whether to show progress with "tqdm" or not
+    :param des: description for the "tqdm" Wrapper if "progress=True"
+    :param save: whether to save the predictions or not
+    :param path: where to save the predictions if "save=True"
+    :param prefix: prefix to 'pred' word in the name of the files if "save=True"
+    :param suffix: suffix to 'pred' word in the name of the files if "save=True"
+    :param file_format: format of the saved files if "save=True"
+    :param batch_size: number of texts per batch
+    :param n_process: number of processes to run the model with
+    :param percentage: whether returning the accuracy over 100% or not
+    :return: predictions and dictionary with detailed performance scores ("evaluate" scores plus 'acc', macro scores
+    and confusion of labels, see "metrics.EntityMetrics")
+    """
+    texts = [address[0] for address in data]
+    docs = ner_model.pipe(texts, batch_size=batch_size, n_process=n_process,
+                          disable=[pipe for pipe in ner_model.pipe_names if pipe != 'ner'])
+    if progress:
+        docs = tqdm(docs, desc=des, total=len(texts))
+
+    scorer = Scorer()
+    metrics = EntityMetrics()
+    pred = []
+    with stage('prediction', docs=len(texts)):
+        for i, ((text, annot), doc) in enumerate(zip(data, docs)):
+            entities = [(entity.start_char, entity.end_char, entity.label_) for entity in doc.ents]
+            pred.append((text, {'entities': entities}))
+
+            # The predicted Doc has the same tokens as "make_doc(text)", so it is also the reference of the gold parse
+            scorer.score(doc, GoldParse(doc, entities=annot['entities']))
+
+            # Accuracy and the rest of character span metrics, a batch at a time
+            if (i + 1) % batch_size == 0:
+                metrics.update(data[i + 1 - batch_size:i + 1], pred[i + 1 - batch_size:i + 1])
+        n_scored = len(pred) - len(pred) % batch_size
+        metrics.update(data[n_scored:len(pred)], pred[n_scored:])
+
+    if save:
+        save_data(pred, 'pred', path, prefix, suffix, file_format)
+
+    return pred, collect_scores(scorer, metrics, percentage)
+
+
+def collect_scores(scorer: Scorer,
+                   metrics: EntityMetrics,
+                   percentage: bool = True) -> dict:
+    """
+    Function that gathers the scores of a prediction, from a spaCy scorer and the character span metrics.
+
+    :param scorer: spaCy scorer of the prediction
+    :param metrics: character span metrics of the prediction
+    :param percentage: whether returning the accuracy over 100% or not
+    :return: dictionary with the "evaluate" scores plus 'acc', macro scores and confusion of labels (see
+    "metrics.EntityMetrics")
+    """
+    scores = {key: scorer.scores.get(key) for key in ['ents_p', 'ents_r', 'ents_f', 'ents_per_type']}
+    span_scores = metrics.scores(percentage)
+    scores['acc'] = span_scores['acc']
+    scores.update({key: span_scores[key] for key in ['ents_macro_p', 'ents_macro_r', 'ents_macro_f', 'confusion']})
+    return scores
@@ -0,0 +1,197 @@
+import sqlite3
+from collections import OrderedDict
+from json import dumps as json_dumps
+from json import loads as json_loads
+from os import stat
+from os.path import exists, join
+from threading import RLock
+
+
+def model_key(nlp) -> str:
+    """
+    Function that builds the key of a NER model for "ParseCache": its language, name, version and the id of the
+    training that produced its weights (see "ner.address_ner" and "ner.fine_tune"), plus, if it was loaded from disk,
+    its directory and the modification time and size of its NER weights. So a model trained again (even into the same
+    directory, or without a training id, as models saved before ids were recorded) never reads the parses of the
+    previous one. The name of the vectors is not used, since models loaded by a "registry.ModelRegistry" share the
+    vocab (and so the vectors) of their language.
+
+    :param nlp: NER model
+    :return: key of the model
+    """
+    key = f'{nlp.meta.get("lang", "")}/{nlp.meta.get("name", "")}@{nlp.meta.get("version", "")}'
+    key += f'#{nlp.meta.get("training_id", "")}'
+    path = getattr(nlp, 'path', None)
+    if path is not None:
+        key += f':{path}'
+        weights = join(str(path), 'ner', 'model')
+        if exists(weights):
+            info = stat(weights)
+            key += f':{info.st_mtime_ns}-{info.st_size}'
+    return key
+
+
+class ParseCache:
+    """
+    Bounded cache of the entities of clean addresses, for one model (see "model_key"). The most recently used parses are
+    kept in memory, up to "max_size"; the least recently used are evicted and, if "path" is given, spilled to an SQLite
+    database, where they are looked up on memory misses. Parses of other models (or other versions) in the database are
+    ignored, and changing the model empties the memory.
+
+    Usage:
+        cache = ParseCache(max_size=100000, path='../Data/NER/parse_cache.sqlite', model=model_key(nlp))
+        entities = cached_parse(texts, parse, cache)
+    """
+
+    def __init__(self,
+                 max_size: int = 100000,
+                 path: (str, None) = None,
+                 model: str = '',
+                 commit_every: int = 1000):
+        """
+        :param max_size: maximum number of parses in memory
+        :param path: path of the SQLite database where evicted parses are spilled (no spill if None)
+        :param model: key of the model the parses are from (see "model_key")
+        :param commit_every: number of spilled parses after which they are committed to disk
+        """
+        self.max_size = max_size
+        self.model = model
+        self.memory = OrderedDict()
+        self.lock = RLock()
+        self.connection = None
+        if path is not None:
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute('CREATE TABLE IF NOT EXISTS parses '
+                                    '(model TEXT, text TEXT, entities TEXT NOT NULL, PRIMARY KEY (model, text))')
+        self.commit_every = commit_every
+        self.uncommitted = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.duplicates = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.memory)
+
+    def set_model(self, model: str, purge: bool = False):
+        """
+        Method that switches the cache to another model (or version). The parses in memory are dropped.
+
+        :param model: key of the model (see "model_key")
+        :param purge: whether to delete the spilled parses of the other models or not
+        """
+        with self.lock:
+            if model != self.model:
+                self.memory.clear()
+                self.model = model
+            if purge and self.connection is not None:
+                self.connection.execute('DELETE FROM parses WHERE model != ?', (model,))
+                self.connection.commit()
+
+    def get(self, text: str) -> (list, None):
+        """
+        Method that looks the parse of a clean address up, in memory and then on disk.
+
+        :param text: clean address
+        :return: list of entities (start, end, label), or None if it is not cached
+        """
+        with self.lock:
+            if text in self.memory:
+                self.memory.move_to_end(text)
+                self.hits += 1
+                return self.memory[text]
+            if self.connection is not None:
+                row = self.connection.execute('SELECT entities FROM parses WHERE model = ? AND text = ?',
+                                              (self.model, text)).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    entities = [tuple(entity) for entity in json_loads(row[0])]
+                    self.put(text, entities)
+                    return entities
+            self.misses += 1
+            return None
+
+    def put(self, text: str, entities: list):
+        """
+        Method that stores the parse of a clean address, evicting (and spilling) the least recently used ones if the
+        memory is full.
+
+        :param text: clean address
+        :param entities: list of entities (start, end, label)
+        """
+        with self.lock:
+            self.memory[text] = entities
+            self.memory.move_to_end(text)
+            while len(self.memory) > self.max_size:
+                evicted, evicted_entities = self.memory.popitem(last=False)
+                self.evictions += 1
+                if self.connection is not None:
+                    self.connection.execute('INSERT OR REPLACE INTO parses (model, text, entities) VALUES (?, ?, ?)',
+                                            (self.model, evicted, json_dumps(evicted_entities)))
+                    self.uncommitted += 1
+                    if self.uncommitted >= self.commit_every:
+                        self.commit()
+
+    def commit(self):
+        if self.connection is not None:
+            self.connection.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        """
+        Method that spills the parses in memory to disk (if there is a database) and closes it.
+        """
+        with self.lock:
+            if self.connection is not None:
+                self.connection.executemany('INSERT OR REPLACE INTO parses (model, text, entities) VALUES (?, ?, ?)',
+                                            [(self.model, text, json_dumps(entities))
+                                             for text, entities in self.memory.items()])
+                self.commit()
+                self.connection.close()
+                self.connection = None
+
+    def stats(self) -> dict:
+        """
+        :return: dictionary with the hits (in memory and on disk), misses, hit rate, evictions, duplicates within
+        batches (see "cached_parse") and number of parses in memory
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions, 'duplicates': self.duplicates, 'size': len(self.memory)}
+
+
+def cached_parse(texts: list,
+                 parse,
+                 cache: ParseCache) -> list:
+    """
+    Function that parses a batch of clean addresses through a cache: duplicates in the batch are parsed once, cached
+    addresses are not parsed, and the parses are fanned back out to the positions of the batch.
+
+    :param texts: list of clean addresses
+    :param parse: function that parses a list of clean addresses into a list of lists of entities
+    :param cache: cache of parses
+    :return: list with the entities (start, end, label) of every address
+    """
+    unique = list(dict.fromkeys(texts))
+    cache.duplicates += len(texts) - len(unique)
+    parses = {}
+    missing = []
+    for text in unique:
+        entities = cache.get(text)
+        if entities is None:
+            missing.append(text)
+        else:
+            parses[text] = entities
+    if missing:
+        for text, entities in zip(missing, parse(missing)):
+            cache.put(text, entities)
+            parses[text] = entities
+    return [list(parses[text]) for text in texts]
@@ -0,0 +1,265 @@
+import asyncio
+from threading import Lock
+from time import perf_counter
+from spacy import load as spacy_load
+import spacy
+from aiohttp import web
+from addressner.sources.cleaning import Cleaner
+from addressner.sources.instrumentation import stage, observe
+from addressner.sources.parsecache import ParseCache, cached_parse, model_key
+
+
+class AddressParser:
+    """
+    Long-lived address parser: it loads a NER model once and parses raw addresses (full cleaning, see
+    "cleaning.Cleaner", plus NER). Parses are records (clean address, {'entities': [(start, end, label), ...]}), as the
+    predictions of "ner.predict".
+
+    The synchronous API ("parse", "parse_many") runs the model straight away. The asynchronous one ("aparse") puts every
+    address in a queue, and a background task coalesces concurrent calls into micro-batches of at most "max_batch_size"
+    addresses, waiting at most "max_wait" seconds for a batch to fill up. Batches run in a thread, so the event loop
+    keeps accepting requests meanwhile. With a "parsecache.ParseCache", repeated addresses (after cleaning) are only
+    run through the model once.
+
+    Usage:
+        parser = AddressParser('en_0')
+        parser.parse('calle mayor 5 madrid spain')
+        async with parser:
+            await parser.aparse('calle mayor 5 madrid spain')
+    """
+
+    def __init__(self,
+                 model: (str, spacy.lang) = 'en_0',
+                 path: str = '../Data/NER/models/',
+                 cleaner: (Cleaner, None) = None,
+                 max_batch_size: int = 64,
+                 max_wait: float = 0.005,
+                 cache: (ParseCache, None) = None):
+        """
+        :param model: name of a model saved in "path", or NER model already loaded
+        :param path: directory of the saved models
+        :param cleaner: cleaner of the addresses (full default cleaning if None)
+        :param max_batch_size: maximum number of addresses of a micro-batch
+        :param max_wait: maximum time to wait for a micro-batch to fill up, in seconds
+        :param cache: cache of parses (no cache if None). It is switched to the model (see "parsecache.model_key")
+        """
+        self.nlp = spacy_load(path + model) if isinstance(model, str) else model
+        self.disable = [pipe for pipe in self.nlp.pipe_names if pipe != 'ner']
+        self.cleaner = Cleaner() if cleaner is None else cleaner
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.cache = cache
+        if cache is not None:
+            cache.set_model(model_key(self.nlp))
+        self.lock = Lock()
+        self.queue = None
+        self.worker = None
+        self.batches = 0
+        self.parsed = 0
+
+    def parse_many(self, addresses: list) -> list:
+        """
+        Method that parses a list of addresses in one batch.
+
+        :param addresses: list of raw addresses
+        :return: list of parses
+        """
+        with stage('cleaning', records=len(addresses)):
+            texts = list(self.cleaner.clean_many(addresses))
+        if self.cache is None:
+            entities = self.parse_clean(texts)
+        else:
+            entities = cached_parse(texts, self.parse_clean, self.cache)
+        return [(text, {'entities': text_entities}) for text, text_entities in zip(texts, entities)]
+
+    def parse_clean(self, texts: list) -> list:
+        """
+        Method that runs the model on a list of clean addresses.
+
+        :param texts: list of clean addresses
+        :return: list with the entities (start, end, label) of every address
+        """
+        with self.lock, stage('parsing', docs=len(texts)):
+            t0 = perf_counter()
+            docs = list(self.nlp.pipe(texts, batch_size=max(len(texts), 1), disable=self.disable))
+            observe('parsing', perf_counter() - t0)
+            self.batches += 1
+            self.parsed += len(texts)
+        return [[(entity.start_char, entity.end_char, entity.label_) for entity in doc.ents] for doc in docs]
+
+    def parse(self, address: str) -> tuple:
+        """
+        Method that parses an address.
+
+        :param address: raw address
+        :return: parse
+        """
+        return self.parse_many([address])[0]
+
+    async def start(self):
+        """
+        Method that starts the micro-batching task (called by "aparse" if needed).
+        """
+        if self.worker is None:
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.ensure_future(self.batcher())
+
+    async def stop(self):
+        """
+        Method that stops the micro-batching task. Addresses still queued are cancelled.
+        """
+        if self.worker is None:
+            return
+        self.worker.cancel()
+        try:
+            await self.worker
+        except asyncio.CancelledError:
+            pass
+        while not self.queue.empty():
+            self.queue.get_nowait()[1].cancel()
+        self.worker = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def aparse(self, address: str) -> tuple:
+        """
+        Method that parses an address within the next micro-batch.
+
+        :param address: raw address
+        :return: parse
+        """
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((address, future))
+        return await future
+
+    async def aparse_many(self, addresses: list) -> list:
+        """
+        :param addresses: list of raw addresses
+        :return: list of parses
+        """
+        return await asyncio.gather(*[self.aparse(address) for address in addresses])
+
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Callers that gave up meanwhile are not parsed
+            batch = [(address, future) for address, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                parses = await loop.run_in_executor(None, self.parse_many, [address for address, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), parse in zip(batch, parses):
+                if not future.done():
+                    future.set_result(parse)
+
+    def stats(self) -> dict:
+        """
+        :return: number of addresses run through the model, number of batches, mean batch size and the stats of the
+        cache (if any)
+        """
+        stats = {'parsed': self.parsed, 'batches': self.batches,
+                 'batch_size_mean': self.parsed / self.batches if self.batches else 0.0}
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
+
+
+def to_json(address: str, parse: tuple) -> dict:
+    """
+    Function that converts a parse into the .json (dict) format of the HTTP answers.
+
+    :param address: raw address
+    :param parse: parse of the address
+    :return: dictionary with the raw and clean address, the entities and the text of every entity by label
+    """
+    text, annotations = parse
+    return {'address': address,
+            'text': text,
+            'entities': annotations['entities'],
+            'fields': {label: text[start:end] for start, end, label in annotations['entities']}}
+
+
+def make_app(parser: AddressParser) -> web.Application:
+    """
+    Function that builds the HTTP front end of a parser, with the endpoints:
+        GET  /parse?address=...              -> parse of the address
+        POST /parse {"address": ...}         -> parse of the address
+        POST /parse {"addresses": [...]}     -> list of parses, in order
+        GET  /stats                          -> "AddressParser.stats"
+    Every address is parsed through "AddressParser.aparse", so concurrent requests share micro-batches.
+
+    :param parser: address parser
+    :return: aiohttp application
+    """
+    async def parse(request: web.Request) -> web.Response:
+        if request.method == 'GET':
+            body = dict(request.query)
+        else:
+            try:
+                body = await request.json()
+            except ValueError:
+                raise web.HTTPBadRequest(text='The body is not valid JSON')
+            if not isinstance(body, dict):
+                raise web.HTTPBadRequest(text='The body must be a JSON object')
+        if isinstance(body.get('address'), str):
+            return web.json_response(to_json(body['address'], await parser.aparse(body['address'])))
+        addresses = body.get('addresses')
+        if isinstance(addresses, list) and all(isinstance(address, str) for address in addresses):
+            parses = await parser.aparse_many(addresses)
+            return web.json_response([to_json(address, p) for address, p in zip(addresses, parses)])
+        raise web.HTTPBadRequest(text='Expected "address" (string) or "addresses" (list of strings)')
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(parser.stats())
+
+    async def on_startup(app: web.Application):
+        await parser.start()
+
+    async def on_cleanup(app: web.Application):
+        await parser.stop()
+
+    app = web.Application()
+    app.router.add_get('/parse', parse)
+    app.router.add_post('/parse', parse)
+    app.router.add_get('/stats', stats)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def serve(parser: AddressParser,
+          host: str = '127.0.0.1',
+          port: int = 8080):
+    """
+    Function that serves a parser over HTTP (see "make_app") until interrupted.
+
+    :param parser: address parser
+    :param host: host to listen on
+    :param port: port to listen on
+    """
+    web.run_app(make_app(parser), host=host, port=port, access_log=None)
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from json import load as json_load
+from os import listdir, walk
+from os.path import exists, getsize, join, isdir
+from threading import RLock
+from time import perf_counter
+from spacy import load as spacy_load
+import spacy
+from addressner.sources.elapsed_time import elapsed_time
+
+
+def model_size(path: str) -> int:
+    """
+    Function that estimates the memory held by a saved model as the size of its files, leaving out the vocab (which the
+    registry shares between the models of a language).
+
+    :param path: directory of the saved model
+    :return: size in bytes
+    """
+    size = 0
+    for directory, subdirectories, files in walk(path):
+        if 'vocab' in subdirectories:
+            subdirectories.remove('vocab')
+        size += sum(getsize(join(directory, file)) for file in files)
+    return size
+
+
+class ModelRegistry:
+    """
+    Registry of the NER models saved in a directory (see "ner.address_ner"). Models are loaded the first time they are
+    requested and kept in memory while they fit the budget: at most "max_models" models and (if given) "max_memory"
+    bytes, as estimated by "model_size". The least recently used models are evicted first. Models of the same language
+    share a single vocab (and so its StringStore).
+
+    Usage:
+        registry = ModelRegistry(max_models=2)
+        nlp = registry['en_0']
+    """
+
+    def __init__(self,
+                 path: str = '../Data/NER/models/',
+                 max_models: (int, None) = 2,
+                 max_memory: (int, None) = None,
+                 verbose: bool = False):
+        """
+        :param path: directory of the saved models
+        :param max_models: maximum number of models loaded at a time (no limit if None)
+        :param max_memory: maximum estimated memory of the models loaded at a time, in bytes (no limit if None)
+        :param verbose: whether to print every load and eviction or not
+        """
+        self.path = path
+        self.max_models = max_models
+        self.max_memory = max_memory
+        self.verbose = verbose
+        self.models = OrderedDict()
+        self.vocabs = {}
+        self.info = {}
+        self.lock = RLock()
+
+    def names(self) -> list:
+        """
+        :return: names of the models saved in the directory
+        """
+        return sorted(name for name in listdir(self.path) if exists(join(self.path, name, 'meta.json')))
+
+    def __contains__(self, name: str):
+        return name in self.models
+
+    def __len__(self):
+        return len(self.models)
+
+    def __getitem__(self, name: str) -> spacy.lang:
+        return self.get(name)
+
+    def get(self, name: str) -> spacy.lang:
+        """
+        Method that returns a model, loading it (and evicting others if the budget is exceeded) if it is not in memory.
+
+        :param name: name of the model
+        :return: NER model
+        """
+        with self.lock:
+            if name in self.models:
+                self.models.move_to_end(name)
+                self.info[name]['hits'] += 1
+                return self.models[name]
+
+            path = join(self.path, name)
+            if not isdir(path):
+                raise KeyError(f'There is no model {name} in {self.path}')
+            with open(join(path, 'meta.json'), 'r') as f:
+                lang = json_load(f)['lang']
+
+            t0 = perf_counter()
+            if lang in self.vocabs:
+                nlp = spacy_load(path, vocab=self.vocabs[lang])
+            else:
+                nlp = spacy_load(path)
+                self.vocabs[lang] = nlp.vocab
+            t = perf_counter() - t0
+
+            info = self.info.setdefault(name, {'lang': lang, 'loads': 0, 'hits': 0, 'load_time': 0.0})
+            info.update(size=model_size(path), last_load_time=t)
+            info['loads'] += 1
+            info['load_time'] += t
+            self.models[name] = nlp
+            if self.verbose:
+                print(f'Loaded {name} ({info["size"] / 2 ** 20:.1f} MB) in {elapsed_time(t)}')
+            self.evict()
+            return nlp
+
+    def memory(self) -> int:
+        """
+        :return: estimated memory of the models in memory, in bytes
+        """
+        return sum(self.info[name]['size'] for name in self.models)
+
+    def evict(self):
+        """
+        Method that evicts the least recently used models (never the last one) until the budget is met.
+        """
+        with self.lock:
+            while len(self.models) > 1 and (
+                    (self.max_models is not None and len(self.models) > self.max_models)
+                    or (self.max_memory is not None and self.memory() > self.max_memory)):
+                name, _ = self.models.popitem(last=False)
+                if self.verbose:
+                    print(f'Evicted {name}')
+
+    def clear(self):
+        """
+        Method that evicts all the models and releases the shared vocabs.
+        """
+        with self.lock:
+            self.models.clear()
+            self.vocabs.clear()
+
+    def stats(self) -> dict:
+        """
+        :return: dictionary, by model, with its language, whether it is in memory, estimated size (bytes), number of
+        loads and hits, total and last load time (seconds)
+        """
+        with self.lock:
+            return {name: {**info, 'loaded': name in self.models} for name, info in self.info.items()}
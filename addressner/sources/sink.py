@@ -0,0 +1,219 @@
+import asyncio
+from json import dumps as json_dumps
+from json import loads as json_loads
+from json import dump as json_dump
+from json import load as json_load
+from os import fsync, replace
+from os.path import exists, join
+from tqdm import tqdm
+
+
+def is_done(result) -> bool:
+    """
+    :param result: result of a query
+    :return: whether the result is a proper result (a dict that is not an error) or the query must be made again
+    """
+    return isinstance(result, dict) and 'error' not in result
+
+
+class ResultsSink:
+    """
+    Append-only JSON lines file of query results, one line {"index": row, "result": ...} per result, written as soon as
+    the result is available. A checkpoint file ("path" + '.checkpoint') keeps the offset up to which lines are safely
+    on disk, so a restarted job drops any half-written line and resumes exactly with the rows not written yet. Rows
+    whose result was an error (or anything but a dict, see "is_done") are not done: they are queried again and their
+    new line supersedes the old one.
+    """
+
+    def __init__(self,
+                 path: str,
+                 checkpoint_every: int = 100):
+        """
+        :param path: path of the JSON lines file (created if it does not exist, resumed otherwise)
+        :param checkpoint_every: number of results after which the checkpoint is updated
+        """
+        self.path = path
+        self.checkpoint_path = path + '.checkpoint'
+        self.checkpoint_every = checkpoint_every
+        self.done = set()
+
+        # Lines before the checkpoint offset are trusted, lines after it are kept up to the first half-written one
+        offset = 0
+        if exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r') as f:
+                offset = json_load(f)['offset']
+        valid = 0
+        if exists(path):
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError('Half-written line')
+                        record = json_loads(line)
+                        if is_done(record['result']):
+                            self.done.add(record['index'])
+                    except (ValueError, KeyError):
+                        if valid < offset:
+                            raise
+                        break
+                    valid += len(line)
+
+        self.file = open(path, 'r+b' if exists(path) else 'w+b')
+        self.file.truncate(valid)
+        self.file.seek(valid)
+        self.unsaved = 0
+        self.checkpoint()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, index: int, result):
+        """
+        Method that appends a result.
+
+        :param index: row of the query
+        :param result: result of the query (exceptions are stored as {'error': message})
+        """
+        if isinstance(result, Exception):
+            result = {'error': f'{type(result).__name__}: {result}'}
+        self.file.write((json_dumps({'index': index, 'result': result}) + '\n').encode('utf-8'))
+        if is_done(result):
+            self.done.add(index)
+        self.unsaved += 1
+        if self.unsaved >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """
+        Method that flushes the results to disk and updates the checkpoint (atomically).
+        """
+        self.file.flush()
+        fsync(self.file.fileno())
+        with open(self.checkpoint_path + '.tmp', 'w') as f:
+            json_dump({'offset': self.file.tell(), 'done': len(self.done)}, f)
+        replace(self.checkpoint_path + '.tmp', self.checkpoint_path)
+        self.unsaved = 0
+
+    def close(self):
+        self.checkpoint()
+        self.file.close()
+
+
+class ResultsReader:
+    """
+    Reader of a "ResultsSink" file that exposes the results in row order (the last line of a row wins). Only the offset
+    of every line is kept in memory; results are read from disk when accessed.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path of the JSON lines file
+        """
+        self.path = path
+        self.offsets = {}
+        offset = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.endswith(b'\n'):
+                    self.offsets[json_loads(line)['index']] = offset
+                offset += len(line)
+        self.file = open(path, 'rb')
+
+    def __len__(self):
+        return max(self.offsets) + 1 if self.offsets else 0
+
+    def __contains__(self, index: int):
+        return index in self.offsets
+
+    def __getitem__(self, index: int):
+        """
+        :param index: row of the query
+        :return: result of the query, or None if it has not been written
+        """
+        if index not in self.offsets:
+            return None
+        self.file.seek(self.offsets[index])
+        return json_loads(self.file.readline())['result']
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def close(self):
+        self.file.close()
+
+
+def import_slices(directory: str,
+                  sink: ResultsSink,
+                  n_rows: int,
+                  slice_size: int = 2000,
+                  progress: bool = True) -> int:
+    """
+    Function that imports the results saved by the former script in slices of "slice_size" rows (JSON lists in files
+    'AMr_{start}-{end}.json') into a sink, so they are neither queried again nor lost. The result at position p of the
+    slice starting at row s is the result of row s + p. Rows already done in the sink are kept, and missing slice files
+    are skipped (their rows stay pending).
+
+    :param directory: directory of the slice files
+    :param sink: "ResultsSink" to write the results to
+    :param n_rows: number of rows of the dataset
+    :param slice_size: number of rows of every slice
+    :param progress: whether to show progress with "tqdm" or not
+    :return: number of results imported
+    """
+    imported = 0
+    starts = range(0, n_rows, slice_size)
+    if progress:
+        starts = tqdm(starts, desc='Importing result slices')
+    for start in starts:
+        path = join(directory, f'AMr_{start}-{start + slice_size}.json')
+        if not exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            results = json_load(f)
+        if len(results) > slice_size:
+            raise ValueError(f'{path} has {len(results)} results, more than the {slice_size} rows of a slice')
+        for position, result in enumerate(results):
+            index = start + position
+            if index < n_rows and index not in sink.done:
+                sink.write(index, result)
+                imported += 1
+    sink.checkpoint()
+    return imported
+
+
+async def fetch_to_sink(client,
+                        urls: list,
+                        sink: ResultsSink,
+                        window: int = 1000,
+                        progress: bool = True):
+    """
+    Function that makes all the URLs queries not in the sink yet with a "fetching.GeocodingClient", writing every
+    result to the sink as soon as it completes. Queries are scheduled in windows of "window" rows to bound memory.
+
+    :param client: "fetching.GeocodingClient" (already entered)
+    :param urls: list of URLs to query, the whole dataset (rows are their indices)
+    :param sink: "ResultsSink" to write the results to
+    :param window: number of queries scheduled at a time
+    :param progress: whether to show progress with "tqdm" or not
+    """
+    async def indexed(index, url):
+        return index, await client.fetch_cached(url)
+
+    pending = [index for index in range(len(urls)) if index not in sink.done]
+    bar = tqdm(total=len(urls), initial=len(urls) - len(pending), desc='Queries') if progress else None
+    for w in range(0, len(pending), window):
+        tasks = [indexed(index, urls[index]) for index in pending[w:w + window]]
+        for future in asyncio.as_completed(tasks):
+            index, result = await future
+            sink.write(index, result)
+            if bar is not None:
+                bar.update()
+        if client.cache is not None:
+            client.cache.commit()
+        sink.checkpoint()
+    if bar is not None:
+        bar.close()
@@ -0,0 +1,111 @@
+from bisect import bisect_right
+from re import compile as re_compile
+
+
+# Tokens are the runs of non-whitespace characters, as in "str.split"
+TOKEN = re_compile(r'\S+')
+
+# Passes of the padded search of a match (' <match> ', ' <match>', '<match> ', '<match>'): whether an occurrence at
+# token i of a match of "length" tokens, in a sentence of "n" tokens, is found by the pass, and the tokens it takes up
+# after the match (the trailing space taken by ' <match> ' hides an occurrence that starts right after it)
+PASSES = [(lambda i, length, n: 0 < i and i + length < n, 1),
+          (lambda i, length, n: 0 < i, 0),
+          (lambda i, length, n: i + length < n, 0),
+          (lambda i, length, n: True, 0)]
+
+
+def token_offsets(sentence: str) -> list:
+    """
+    :param sentence: sentence
+    :return: list with the (start, end) character offsets of every token of the sentence
+    """
+    return [(m.start(0), m.end(0)) for m in TOKEN.finditer(sentence)]
+
+
+class SpanIndex:
+    """
+    Sorted set of non-overlapping character spans, to check in logarithmic time whether a new span overlaps any of them
+    (spans that only touch do not overlap).
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """
+        :param start: start of the span
+        :param end: end of the span
+        :return: whether the span overlaps any span of the index or not
+        """
+        k = bisect_right(self.starts, start)
+        return (k > 0 and self.ends[k - 1] > start) or (k < len(self.starts) and self.starts[k] < end)
+
+    def add(self, start: int, end: int):
+        """
+        Method that adds a span (that must not overlap the spans of the index).
+
+        :param start: start of the span
+        :param end: end of the span
+        """
+        k = bisect_right(self.starts, start)
+        self.starts.insert(k, start)
+        self.ends.insert(k, end)
+
+
+def resolve_spans(entities: list,
+                  sentence: str,
+                  matches: list) -> list:
+    """
+    Function that places the matches of the features of a sentence (see "address_labelling.identify_features") as
+    non-overlapping, token-aligned entities. Matches are placed in order: each one takes its first occurrence (as a
+    sequence of whole tokens) that does not overlap the entities already placed, preferring occurrences inside the
+    sentence, then at its end, then at its start and last the whole sentence. Matches with no free occurrence are
+    dropped. As with the padded regex search this replaces (see "PASSES"), repeated tokens hide overlapping
+    occurrences: in 'a juan calle calle calle 5', 'calle calle' is only found at 'juan calle calle', so once 'calle'
+    takes the first 'calle' it is dropped rather than moved to the last two.
+
+    The token offsets and an index of the positions of every token are computed once per sentence, and overlaps are
+    checked against a "SpanIndex", so matches are never searched as regular expressions.
+
+    :param entities: entity of every match
+    :param sentence: sentence
+    :param matches: matches of the features of the sentence ('NONE' if a feature was not found)
+    :return: list of entities (start, end, label)
+    """
+    offsets = token_offsets(sentence)
+    tokens = [sentence[start:end] for start, end in offsets]
+    n = len(tokens)
+    positions = {}
+    for i, token in enumerate(tokens):
+        positions.setdefault(token, []).append(i)
+
+    placed = SpanIndex()
+    entity_info = []
+    for label, element in zip(entities, matches):
+        element_tokens = element.split()
+        if not element_tokens:
+            continue
+        length = len(element_tokens)
+        occurrences = [i for i in positions.get(element_tokens[0], []) if tokens[i:i + length] == element_tokens]
+        placed_match = False
+        for found, gap in PASSES:
+            # As a regex search, each pass only sees the occurrences that do not overlap the previous one it found
+            free = 0
+            for i in occurrences:
+                if i < free or not found(i, length, n):
+                    continue
+                free = i + length + gap
+                start, end = offsets[i][0], offsets[i + length - 1][1]
+                if not placed.overlaps(start, end):
+                    placed.add(start, end)
+                    entity_info.append((start, end, label))
+                    placed_match = True
+                    break
+            if placed_match:
+                break
+
+    return entity_info
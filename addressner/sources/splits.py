@@ -0,0 +1,156 @@
+from json import dump as json_dump
+from json import load as json_load
+from os.path import splitext
+from numpy import arange, flatnonzero, stack, load as np_load, save as np_save, uint16, uint32
+from numpy.random import RandomState
+from addressner.sources.corpus import Corpus
+
+
+class Subset:
+    """
+    Lazy view of the records of a "corpus.Corpus" given by a list of indices. Records are read from the corpus when
+    accessed, in the order of the indices.
+    """
+
+    def __init__(self, corpus: Corpus, indices):
+        """
+        :param corpus: corpus with the records
+        :param indices: indices of the records of the subset
+        """
+        self.corpus = corpus
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i: (int, slice)):
+        """
+        :param i: index (or slice) of the record(s) in the subset
+        :return: record (text, {'entities': [(start, end, label), ...]}), or list of records if "i" is a slice
+        """
+        if isinstance(i, slice):
+            return [self.corpus[int(j)] for j in self.indices[i]]
+        return self.corpus[int(self.indices[i])]
+
+    def __iter__(self):
+        for j in self.indices:
+            yield self.corpus[int(j)]
+
+    def texts(self):
+        """
+        :return: generator with the texts of the records of the subset
+        """
+        for j in self.indices:
+            yield self.corpus.text(int(j))
+
+
+class Splits:
+    """
+    Seeded train-test splits of one corpus file (see "corpus.write_corpus"), stored as record indices instead of copies
+    of the records. There are two kinds of splits:
+        - shuffle: every split is an independent random permutation of the records, the first "train_ratio" of which
+          make up the training set (as "ner.train_test_split")
+        - K-fold: records are assigned to "n_splits" folds of (almost) the same size, and split k tests on fold k and
+          trains on the rest
+
+    Usage:
+        splits = Splits('../Data/NER/labelled_data.ner', n_splits=5, seed=0)
+        splits.save('../Data/NER/train_test_pred/splits.json')
+        ...
+        splits = Splits.load('../Data/NER/train_test_pred/splits.json')
+        train, test = splits.train(0), splits.test(0)
+    """
+
+    def __init__(self,
+                 corpus_path: str,
+                 n_splits: int = 5,
+                 train_ratio: float = 0.7,
+                 kfold: bool = False,
+                 seed: int = 0,
+                 assignments=None):
+        """
+        :param corpus_path: path of the corpus file (.ner)
+        :param n_splits: number of splits (folds if "kfold=True")
+        :param train_ratio: ratio of records to make up the training sets (ignored if "kfold=True")
+        :param kfold: whether to make K-fold splits or shuffle splits
+        :param seed: seed of the random permutations
+        :param assignments: permutations (n_splits x n_records) or fold of every record (n_records) already computed.
+        Only used by "load"
+        """
+        self.corpus_path = corpus_path
+        self.corpus = Corpus(corpus_path)
+        self.n_splits = n_splits
+        self.train_ratio = train_ratio
+        self.kfold = kfold
+        self.seed = seed
+
+        n_records = len(self.corpus)
+        if assignments is None:
+            rand = RandomState(seed)
+            if kfold:
+                assignments = (arange(n_records) % n_splits).astype(uint16)[rand.permutation(n_records)]
+            else:
+                assignments = stack([rand.permutation(n_records).astype(uint32) for _ in range(n_splits)])
+        self.assignments = assignments
+        if self.assignments.shape[-1] != n_records:
+            raise ValueError(f'The splits do not match the {n_records} records of {corpus_path}')
+
+    def __len__(self):
+        return self.n_splits
+
+    def indices(self, k: int) -> tuple:
+        """
+        :param k: number of the split
+        :return: indices of the training and test records of the split
+        """
+        if not 0 <= k < self.n_splits:
+            raise IndexError('Split index out of range')
+        if self.kfold:
+            test = self.assignments == k
+            return flatnonzero(~test), flatnonzero(test)
+        permutation = self.assignments[k]
+        split = round(self.train_ratio * len(permutation))
+        return permutation[:split], permutation[split:]
+
+    def train(self, k: int) -> Subset:
+        """
+        :param k: number of the split
+        :return: training set of the split
+        """
+        return Subset(self.corpus, self.indices(k)[0])
+
+    def test(self, k: int) -> Subset:
+        """
+        :param k: number of the split
+        :return: test set of the split
+        """
+        return Subset(self.corpus, self.indices(k)[1])
+
+    def save(self, path: str):
+        """
+        Method that saves the splits: their settings in "path" (.json) and their indices in a .npy file next to it.
+
+        :param path: path of the .json file
+        """
+        path_indices = splitext(path)[0] + '.npy'
+        np_save(path_indices, self.assignments)
+        with open(path, 'w') as f:
+            json_dump({'corpus': self.corpus_path, 'n_records': len(self.corpus), 'n_splits': self.n_splits,
+                       'train_ratio': self.train_ratio, 'kfold': self.kfold, 'seed': self.seed,
+                       'indices': path_indices}, f)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        Method that loads splits saved with "save". The indices are memory-mapped, not read.
+
+        :param path: path of the .json file
+        :return: splits
+        """
+        with open(path, 'r') as f:
+            settings = json_load(f)
+        return cls(settings['corpus'], settings['n_splits'], settings['train_ratio'], settings['kfold'],
+                   settings['seed'], np_load(settings['indices'], mmap_mode='r'))
+
+    def close(self):
+        self.corpus.close()
@@ -0,0 +1,134 @@
+from random import Random
+
+
+# Vocabulary of the synthetic addresses, by language
+VOCABULARY = {
+    'en': {'street_types': ['street', 'road', 'avenue', 'lane', 'drive', 'court', 'place', 'way', 'boulevard'],
+           'street_names': ['high', 'station', 'church', 'victoria', 'green', 'park', 'mill', 'queens', 'kings',
+                            'manor', 'oak', 'elm', 'north', 'south', 'west', 'bridge', 'market', 'london', 'york'],
+           'municipalities': ['london', 'manchester', 'birmingham', 'leeds', 'glasgow', 'bristol', 'new york',
+                              'chicago', 'boston', 'sydney', 'melbourne', 'toronto', 'dublin'],
+           'subdivisions': ['england', 'scotland', 'wales', 'california', 'texas', 'ontario', 'new south wales',
+                            'victoria', 'leinster', 'massachusetts'],
+           'countries': ['united kingdom', 'united states', 'australia', 'canada', 'ireland'],
+           'extra': ['flat', 'apartment', 'unit', 'suite', 'floor', 'building']},
+    'es': {'street_types': ['calle', 'avenida', 'paseo', 'plaza', 'camino', 'carrera', 'ronda', 'travesia'],
+           'street_names': ['mayor', 'real', 'san juan', 'de la paz', 'del sol', 'gran via', 'cervantes', 'castilla',
+                            'andalucia', 'las flores', 'los olivos', 'san martin', 'libertador', 'bolivar'],
+           'municipalities': ['madrid', 'barcelona', 'valencia', 'sevilla', 'zaragoza', 'bilbao', 'santiago',
+                              'buenos aires', 'bogota', 'lima', 'quito', 'montevideo', 'ciudad de mexico'],
+           'subdivisions': ['comunidad de madrid', 'cataluna', 'andalucia', 'region metropolitana', 'cundinamarca',
+                            'buenos aires', 'jalisco', 'pichincha', 'lima'],
+           'countries': ['spain', 'chile', 'argentina', 'colombia', 'peru', 'mexico', 'ecuador', 'uruguay'],
+           'extra': ['piso', 'puerta', 'portal', 'bajo', 'escalera', 'local', 'oficina']}
+}
+
+# Entities of the tags of a synthetic address, in order (see "NER_1_Configuration")
+ENTITIES = ['N', 'S', 'M', 'SP', 'PC', 'C']
+
+# Characters used to add noise: accented letters and symbols
+ACCENTED = {'a': 'á', 'e': 'é', 'i': 'í', 'o': 'ó', 'u': 'ú', 'n': 'ñ'}
+SYMBOLS = ',.;:/#-º'
+
+
+def typo(word: str, rand: Random) -> str:
+    """
+    Function that makes a random typo in a word: a character is dropped, duplicated, swapped with the next one or
+    replaced by another letter.
+
+    :param word: word
+    :param rand: random generator
+    :return: word with a typo
+    """
+    if len(word) < 2:
+        return word
+    i = rand.randrange(len(word) - 1)
+    kind = rand.randrange(4)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i] + word[i:]
+    if kind == 2:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rand.choice('abcdefghijklmnopqrstuvwxyz') + word[i + 1:]
+
+
+def synthetic_address(rand: Random,
+                      lang: str = 'en',
+                      n_words: (int, None) = None,
+                      noise: float = 0.0) -> tuple:
+    """
+    Function that generates a synthetic address, with the values of its features as the geocoding results would give
+    them, and its clean version labelled.
+
+    The clean address is (street name, number, extra information, postal code, municipality, subdivision, country) in
+    lowercase. Street names are padded with more words up to "n_words" words in total. The raw address is the clean one
+    with noise: every word has probability "noise" of getting a typo, of an accent, of a symbol after it and of being
+    capitalised.
+
+    :param rand: random generator
+    :param lang: language of the vocabulary ('en' or 'es')
+    :param n_words: number of words of the address (as short as the vocabulary allows if None)
+    :param noise: probability of every kind of noise of every word
+    :return: tuple (raw address, feature values in the order of "ENTITIES", clean address labelled)
+    """
+    vocabulary = VOCABULARY[lang]
+    street = rand.choice(vocabulary['street_types']) + ' ' + rand.choice(vocabulary['street_names'])
+    if lang == 'en':
+        street = street.split(' ', 1)[1] + ' ' + street.split(' ', 1)[0]
+    number = str(rand.randint(1, 999))
+    extra = rand.choice(vocabulary['extra']) + ' ' + str(rand.randint(1, 20))
+    postal_code = str(rand.randint(10000, 99999))
+    municipality = rand.choice(vocabulary['municipalities'])
+    subdivision = rand.choice(vocabulary['subdivisions'])
+    country = rand.choice(vocabulary['countries'])
+
+    n_fixed = len(' '.join([street, number, extra, postal_code, municipality, subdivision, country]).split())
+    if n_words is not None and n_words > n_fixed:
+        padding = ' '.join(vocabulary['street_names']).split()
+        street += ' ' + ' '.join(rand.choice(padding) for _ in range(n_words - n_fixed))
+
+    parts = [('S', street), ('N', number), (None, extra), ('PC', postal_code), ('M', municipality),
+             ('SP', subdivision), ('C', country)]
+    clean = ''
+    entities = []
+    for label, value in parts:
+        if clean:
+            clean += ' '
+        if label is not None:
+            entities.append((len(clean), len(clean) + len(value), label))
+        clean += value
+    values = dict((label, value) for label, value in parts if label is not None)
+
+    words = []
+    for word in clean.split():
+        if rand.random() < noise:
+            word = typo(word, rand)
+        if rand.random() < noise:
+            word = ''.join(ACCENTED.get(c, c) if rand.random() < 0.5 else c for c in word)
+        if rand.random() < noise:
+            word = word.capitalize()
+        if rand.random() < noise:
+            word += rand.choice(SYMBOLS)
+        words.append(word)
+
+    return ' '.join(words), [values[entity] for entity in ENTITIES], (clean, {'entities': entities})
+
+
+def synthetic_addresses(n: int,
+                        lang: str = 'en',
+                        n_words: (int, None) = None,
+                        noise: float = 0.0,
+                        seed: int = 0) -> list:
+    """
+    Function that generates a reproducible list of synthetic addresses (see "synthetic_address").
+
+    :param n: number of addresses
+    :param lang: language of the vocabulary ('en' or 'es')
+    :param n_words: number of words of every address
+    :param noise: probability of every kind of noise of every word
+    :param seed: seed of the random generator
+    :return: list of tuples (raw address, feature values, clean address labelled)
+    """
+    rand = Random(seed)
+    return [synthetic_address(rand, lang, n_words, noise) for _ in range(n)]
@@ -0,0 +1,277 @@
+"""
+Implementations of the first version of the package (cleaning, labelling and accuracy), kept as the reference of
+the equivalence tests of the faster implementations that replaced them.
+"""
+from re import finditer, sub
+from numpy import mean, zeros
+
+
+def sub_accents(sentence: str,
+                lower: bool = True) -> str:
+    """
+    This function substitutes all accented letters with the corresponding letter without the accent.
+
+    :param sentence: string to remove accents in
+    :param lower: whether converting sentence to lowercase or not
+    :return: sentence with accents removed
+    """
+    if lower:
+        sentence = sentence.lower()
+
+    # List of possible accents per letter and their respective replacement
+    a = r'á|à|â|ä|ã'
+    e = r'é|è|ê|ë'
+    i = r'í|ì|î|ï'
+    o = r'ó|ò|ô|ö|õ'
+    u = r'ú|ù|û|ü'
+    c = r'ç'
+    n = r'ñ'
+    y = r'ý|ÿ'
+    regexps = [a, e, i, o, u, c, n, y]
+    letters = ['a', 'e', 'i', 'o', 'u', 'c', 'n', 'y']
+
+    # Convert accented letters into normal letters
+    for i in range(len(regexps)):
+        sentence = sub(regexps[i], letters[i], sentence)
+        sentence = sub(regexps[i].upper(), letters[i].upper(), sentence)
+
+    return sentence
+
+
+def clean_additional_info(sentence: str,
+                          info_to_substitute: (str, list, None) = None,
+                          info_replacement: str = ' ',
+                          lower: bool = True) -> str:
+    """
+    This function substitutes all regular expressions in "info_to_substitute" with "replacement".
+
+    :param sentence: string to remove information in
+    :param info_to_substitute: regular expression or list containing regular expressions with the information to remove
+    :param info_replacement: replacement of all matches of the regular expressions of "info_to_substitute" in "sentence"
+    :param lower: whether converting sentence to lowercase or not
+    :return: sentence with information substituted
+    """
+    if lower:
+        sentence = sentence.lower()
+
+    # If no "info_to_remove" is given, default "info_to_substitute" aims to clean up address additional information...
+    if info_to_substitute is None:
+        # Patterns and stopwords to remove (all lowercase)
+        pattern = r'\d{1,3}\W{0,2}[a-z]{0,2}'
+        stopwords_ap = ['floor', 'derecha', 'izquierda', 'dcha', 'izda', 'izqda', 'departamento', 'apto', 'dpto',
+                        'depto', 'apartment', 'department', 'apt', 'dpt', 'door', 'first', 'second', 'third', 'fourth',
+                        'fifth', 'sixth', 'seventh', 'eighth', 'nineth', 'tenth']
+        stopwords_bp = ['piso', 'derecha', 'izquierda', 'dcha', 'izda', 'izqda', 'apartamento', 'departamento', 'apto',
+                        'dpto', 'depto', 'dp', 'apartment', 'department', 'apt', 'dpt', 'puerta', 'pta', 'door', 'bajo',
+                        'entresuelo', 'sotano', 'bloque', 'portal', 'salon', 'primero', 'segundo', 'tercero', 'cuarto',
+                        'quinto', 'sexto', 'septimo', 'octavo', 'noveno', 'decimo', 'suite']
+
+        # Join "pattern" and stopwords in corresponding order
+        stopwords_pattern = [r'{}'.format(sw_bp) + r'\W{0,1}' + pattern for sw_bp in stopwords_bp]
+        pattern_stopwords = [pattern + r'\s{0,1}' + r'{}'.format(sw_ap) for sw_ap in stopwords_ap]
+
+        # Regular expressions to substitute
+        p1 = r'|'.join(stopwords_pattern + pattern_stopwords)
+        p2 = r'|'.join(stopwords_pattern + pattern_stopwords)
+        p3 = r'|'.join(list(set(stopwords_ap + stopwords_bp)))
+        p4 = r'\s\d{1,2}\W{0,2}[a-z]{1,2}$'
+
+        # Default "info_to_substitute"
+        info_to_substitute = [p1, p2, p3, p4]
+
+    # ... else convert "info_to_remove"
+    else:
+        info_to_substitute = [info_to_substitute]
+
+    # Substitute info_to_remove with replacement
+    for element in info_to_substitute:
+        sentence = sub(element, info_replacement, sentence)
+
+    # Remove additional blank spaces among words
+    return ' '.join(sentence.split())
+
+
+def clean_symbols(sentence: str,
+                  symbol_replacement: str = ' ',
+                  lower: bool = True) -> str:
+    """
+    This function substitutes all non alphanumeric characters with "replacement".
+
+    :param sentence: string to remove symbols in
+    :param symbol_replacement: replacement of all symbols in "sentence"
+    :param lower: whether converting sentence to lowercase or not
+    :return: sentence with all symbols substituted
+    """
+    if lower:
+        sentence = sentence.lower()
+
+    sentence = sub(r'[^a-zA-Z0-9\s]', symbol_replacement, sentence)
+
+    # Remove additional blank spaces among words
+    return ' '.join(sentence.split())
+
+
+def cleaning(sentence: str,
+             accents: bool = True,
+             additional_info: bool = True,
+             symbols: bool = True,
+             **kwargs) -> str:
+    """
+    Function that performs full cleaning according to functions
+    "sub_accents", "clean_additional_info" and "clean_accents".
+
+    :param sentence: string to clean
+    :param accents: whether applying "sub_accents" or not
+    :param additional_info: whether applying "clean_additional_info" or not
+    :param symbols: whether applying "clean_accents" or not
+    :param kwargs: arguments of functions "sub_accents", "clean_additional_info" and "clean_accents".
+    :return: sentence clean
+    """
+    if accents:
+        sentence = sub_accents(sentence, **{key: value for key, value in kwargs.items() if
+                                            key in sub_accents.__code__.co_varnames})
+    if additional_info:
+        sentence = clean_additional_info(sentence, **{key: value for key, value in kwargs.items() if
+                                                      key in clean_additional_info.__code__.co_varnames})
+    if symbols:
+        sentence = clean_symbols(sentence, **{key: value for key, value in kwargs.items() if
+                                              key in clean_symbols.__code__.co_varnames})
+
+    return sentence
+
+
+def generate_ngrams(s, n):
+    # Break sentence in the token, remove empty tokens
+    tokens = [token for token in s.split()]
+    # Use the zip function to generate n-grams
+    ngrams = zip(*[tokens[i:] for i in range(n)])
+    # Concatentate the tokens into ngrams and return
+    return [' '.join(ngram) for ngram in ngrams]
+
+
+def levenshtein(s, t, ratio_calc=True):
+    '''
+    Calculates Levenshtein distance between two strings.
+    If ratio_calc=True, the function computes the Levenshtein distance ratio of similarity between two strings.
+    For all i and j, distance[i,j] will contain the Levenshtein distance between the first i characters of s
+    and the first j characters of t. (https://www.datacamp.com/community/tutorials/fuzzy-string-python)
+    '''
+    # Initialize matrix of zeros
+    rows = len(s) + 1
+    cols = len(t) + 1
+    distance = zeros((rows, cols), dtype=int)
+
+    # Populate matrix of zeros with the indeces of each character of both strings
+    for i in range(1, rows):
+        for k in range(1, cols):
+            distance[i][0] = i
+            distance[0][k] = k
+
+    # Iterate over the matrix to compute the cost of deletions,insertions and/or substitutions
+    for col in range(1, cols):
+        for row in range(1, rows):
+            if s[row - 1] == t[col - 1]:
+                cost = 0  # If the characters are the same in the two strings in a given position [i,j] then the cost is 0
+            else:
+                # In order to align the results with those of the Python Levenshtein package,
+                # if we choose to calculate the ratio the cost of a substitution is 2.
+                # If we calculate just distance, then the cost of a substitution is 1.
+                if ratio_calc == True:
+                    cost = 2
+                else:
+                    cost = 1
+            distance[row][col] = min(distance[row - 1][col] + 1,  # Cost of deletions
+                                     distance[row][col - 1] + 1,  # Cost of insertions
+                                     distance[row - 1][col - 1] + cost)  # Cost of substitutions
+    if ratio_calc == True:
+        # Computation of the Levenshtein Distance Ratio
+        try:
+            Ratio = ((len(s) + len(t)) - distance[row][col]) / (len(s) + len(t))
+        except UnboundLocalError:
+            Ratio = 0.0
+        return Ratio
+    else:
+        # print(distance) # Uncomment if you want to see the matrix showing how the algorithm computes
+        # the cost of deletions, insertions and/or substitutions.
+        # This is the minimum number of edits needed to convert string s to string t
+        return 'The strings are {} edits away'.format(distance[row][col])
+
+
+def identify_features(sentence, tags, tol=0.6):
+    # Find all possible n-grams in sentence
+    ngrams = []
+    for i in range(len(sentence)):
+        ngrams += generate_ngrams(sentence, i)
+
+    # Calculate levenshtein distance of 'tag' and every gram
+    if isinstance(tags, str):
+        tags = [tags]
+    lev = []
+    for tag in tags:
+        l = []
+        for gram in ngrams:
+            l.append(levenshtein(gram, tag))
+        if max(l) > tol:
+            r = ngrams[l.index(max(l))]
+        else:
+            r = 'NONE'
+        lev.append(r)
+
+    #     # Everything in "sentence" not in "lev" is AI (Additional Information)
+    #     smod = sentence
+    #     for element in reversed(lev):
+    #         smod = smod.replace(element, '')
+    #     lev.append(smod)
+
+    return lev
+
+
+def overlap(a, b):
+    return max(0, min(a[1], b[1]) - max(a[0], b[0]))
+
+
+def address_labelling(entities, sentence, tags, tol=0.6):
+    matches = identify_features(sentence, tags, tol)
+    entity_info = []
+    for ei, element in enumerate(matches):
+        for emi, element_mod in enumerate([' ' + element + ' ', ' ' + element, element + ' ', element]):
+            break_loop = False
+            start_end_iters = [(m.start(0), m.end(0)) for m in finditer(element_mod, sentence)]
+            for (start_raw, end_raw) in start_end_iters:
+                start = start_raw + 1 if emi in [0, 1] else start_raw
+                end = end_raw - 1 if emi in [0, 2] else end_raw
+
+                overs = []
+                for i in range(len(entity_info)):
+                    overs.append(overlap((start, end), entity_info[i][:2]))
+
+                unique = element == sentence
+                scorr = 1 if start == 0 else 0
+                ecorr = -1 if end == len(sentence) else 0
+                first = element.split()[0] == sentence.split()[0] and sentence[end + ecorr] == ' '
+                last = element.split()[-1] == sentence.split()[-1] and sentence[start + scorr - 1] == ' '
+                between = sentence[start + scorr - 1] == ' ' and sentence[end + ecorr] == ' '
+
+                if not any(overs) and (unique or first or last or between):
+                    entity_info.append((start, end, entities[ei]))
+                    break_loop = True
+                    break
+            if break_loop:
+                break
+
+    return (sentence, {'entities': list(dict.fromkeys(entity_info))})
+
+
+def accuracy(data, preds, percentage=True):
+    acc = []
+    for i in range(len(preds)):
+        good = 0
+        for ent in preds[i][1]['entities']:
+            good += 1 if ent in data[i][1]['entities'] else 0
+        try:
+            good_ratio = good / len(preds[i][1]['entities'])
+        except ZeroDivisionError:
+            good_ratio = 0
+        acc.append(good_ratio)
+    factor = 100 if percentage else 1
+    return mean(acc) * factor
@@ -0,0 +1,46 @@
+from os.path import abspath, dirname
+from random import Random
+import sys
+import pytest
+
+# Make "addressner" importable however pytest is run
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from addressner.sources.synthetic import ENTITIES, synthetic_addresses, typo  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def labelling_cases():
+    """
+    Clean synthetic addresses with the feature values a geocoder could return for them: exact, with typos, missing
+    ('-'), with an extra word or repeated in other features.
+
+    :return: list of tuples (entities, clean address, feature values)
+    """
+    rand = Random(0)
+    cases = []
+    for lang in ['en', 'es']:
+        for _, values, (clean, _) in synthetic_addresses(25, lang, noise=0.1, seed=1):
+            tags = []
+            for value in values:
+                r = rand.random()
+                if r < 0.25:
+                    value = ' '.join(typo(word, rand) for word in value.split())
+                elif r < 0.35:
+                    value = '-'
+                elif r < 0.4:
+                    value += ' ' + rand.choice(clean.split())
+                elif r < 0.45:
+                    value = rand.choice(values)
+                tags.append(value)
+            cases.append((ENTITIES, clean, tags))
+    return cases
+
+
+@pytest.fixture(scope='session')
+def baseline_features(labelling_cases):
+    """
+    :return: features of the labelling cases identified by the original n-gram scan (slow, so computed once)
+    """
+    import baseline
+    return [baseline.identify_features(sentence, tags) for _, sentence, tags in labelling_cases]
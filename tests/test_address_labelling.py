@@ -0,0 +1,21 @@
+import pytest
+from addressner.sources.address_labelling import identify_features
+from addressner.sources.fuzzy import best_span, levenshtein_ratios
+
+
+@pytest.mark.parametrize('method', ['align', 'ngrams'])
+def test_identify_features_matches_ngram_scan(labelling_cases, baseline_features, method):
+    for (_, sentence, tags), expected in zip(labelling_cases, baseline_features):
+        assert identify_features(sentence, tags, method=method) == expected
+
+
+@pytest.mark.parametrize('tol', [0.0, 0.6, 0.9])
+def test_best_span_matches_exhaustive_search(labelling_cases, tol):
+    for _, sentence, tags in labelling_cases:
+        tokens = sentence.split()
+        spans = [(i, j) for n in range(1, len(tokens) + 1) for i in range(len(tokens) - n + 1) for j in [i + n]]
+        for tag in tags:
+            ratios = levenshtein_ratios(tag, [' '.join(tokens[i:j]) for i, j in spans])
+            best = max(ratios)
+            expected = (best,) + spans[ratios.index(best)] if best > tol else None
+            assert best_span(tag, tokens, tol) == expected
@@ -0,0 +1,60 @@
+import pytest
+from addressner.sources.benchmark import measure, Suite
+
+
+def test_measure_runs_every_call():
+    calls = []
+    result = measure(calls.append, [(1,), (2,), (3,)], repeat=2, min_time=0)
+    assert result['calls'] == 3
+    assert result['runs'] == 2
+    assert calls == [1, 2, 3, 1, 2, 3]
+    assert result['best_us'] <= result['median_us'] <= result['worst_us']
+
+
+def test_measure_rejects_no_calls():
+    with pytest.raises(ValueError):
+        measure(print, [])
+
+
+def suite_with(names: list) -> Suite:
+    suite = Suite(repeat=1, min_time=0)
+    for name in names:
+        suite.add(name, abs, [(-1,)], words=16)
+    return suite
+
+
+def test_run_adds_case_info():
+    results = suite_with(['abs']).run(verbose=False)
+    assert set(results) == {'abs'}
+    assert results['abs']['words'] == 16
+    assert results['abs']['calls'] == 1
+
+
+def test_compare_saves_missing_baseline(tmp_path):
+    path = str(tmp_path / 'benchmarks' / 'baseline.json')
+    suite = suite_with(['abs'])
+    suite.run(verbose=False)
+    assert suite.compare(path, verbose=False) == {}
+    assert suite.compare(path, verbose=False) == {'abs': 1.0}
+
+
+def test_compare_flags_regressions_and_changed_cases(tmp_path, capsys):
+    path = str(tmp_path / 'baseline.json')
+    baseline = suite_with(['fast', 'slow', 'same', 'renamed'])
+    baseline.results = {'fast': {'best_us': 10.0}, 'slow': {'best_us': 10.0}, 'same': {'best_us': 10.0},
+                        'renamed': {'best_us': 10.0}}
+    baseline.save(path)
+
+    suite = suite_with(['fast', 'slow', 'same', 'new'])
+    suite.results = {'fast': {'best_us': 5.0}, 'slow': {'best_us': 20.0}, 'same': {'best_us': 10.5},
+                     'new': {'best_us': 30.0}}
+    ratios = suite.compare(path, threshold=0.1)
+    assert ratios == {'fast': 0.5, 'slow': 2.0, 'same': 1.05}
+
+    lines = {line.split()[0]: line for line in capsys.readouterr().out.splitlines()}
+    assert lines['fast'].endswith('faster')
+    assert lines['slow'].endswith('REGRESSION')
+    assert 'REGRESSION' not in lines['same'] and 'faster' not in lines['same']
+    assert lines['new'].endswith('(new)')
+    assert lines['renamed'].endswith('(removed)')
+    assert lines['1'] == '1 regressions of 3 cases compared (1 new, 1 removed)'
@@ -0,0 +1,20 @@
+import pytest
+from addressner.sources.cleaning import Cleaner, cleaning
+from addressner.sources.synthetic import synthetic_addresses
+import baseline
+
+ADDRESSES = [raw for lang in ['en', 'es'] for raw, _, _ in synthetic_addresses(300, lang, noise=0.3, seed=2)] + [
+    'Calle Mayor 5, 3º Izda., 28013 Madrid', 'Flat 2B, 10 Downing St., London', 'Avda. São João nº 12 - 4ºD',
+    'Piso 1 Puerta 3, Çalle Ñandú', 'apt 4 floor 2 suite 100', 'C/ Ýbarra 7 1a', '', '   ']
+
+
+@pytest.mark.parametrize('options', [{}, {'additional_info': False}, {'accents': False}, {'symbols': False},
+                                     {'lower': False}, {'info_to_substitute': r'\d+', 'info_replacement': '#'},
+                                     {'symbol_replacement': '_'}])
+def test_cleaner_matches_cleaning(options):
+    cleaner = Cleaner(**options)
+    assert list(cleaner.clean_many(ADDRESSES)) == [baseline.cleaning(address, **options) for address in ADDRESSES]
+
+
+def test_cleaning_ignores_unknown_arguments():
+    assert cleaning('Calle Mayor 5, Piso 3º', additional_info=False, unknown=1) == 'calle mayor 5 piso 3'
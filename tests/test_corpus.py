@@ -0,0 +1,46 @@
+import pytest
+from addressner.sources import corpus
+from addressner.sources.corpus import Corpus, write_corpus, load_data, convert
+
+DATA = [('calle mayor 5 madrid', {'entities': [(0, 11, 'S'), (12, 13, 'N'), (14, 20, 'M')]}),
+        ('', {'entities': []}),
+        ('münchen straße 1 deutschland', {'entities': [(0, 7, 'M'), (8, 14, 'S'), (17, 28, 'C')]}),
+        ('sin entidades', {'entities': []})]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'data.ner')
+    write_corpus(DATA, path)
+    with Corpus(path) as data:
+        assert len(data) == len(DATA)
+        assert list(data) == DATA
+        assert data[1:3] == DATA[1:3]
+        assert data[-1] == DATA[-1]
+        assert list(data.texts()) == [text for text, _ in DATA]
+        with pytest.raises(IndexError):
+            data[len(DATA)]
+
+
+def test_round_trip_with_byteswap(tmp_path, monkeypatch):
+    # Writing and reading as a big-endian machine byteswaps the integers both ways
+    monkeypatch.setattr(corpus, 'byteorder', 'big')
+    path = str(tmp_path / 'data.ner')
+    write_corpus(DATA, path)
+    with Corpus(path) as data:
+        assert list(data) == DATA
+
+
+def test_convert_json(tmp_path):
+    from json import dump as json_dump
+    path = tmp_path / 'data.json'
+    with open(path, 'w') as f:
+        json_dump(DATA, f)
+    with load_data(convert(str(path))) as data:
+        assert list(data) == load_data(str(path)) == DATA
+
+
+def test_not_a_corpus(tmp_path):
+    path = tmp_path / 'data.ner'
+    path.write_bytes(b'NOTACORPUS' + bytes(64))
+    with pytest.raises(ValueError):
+        Corpus(str(path))
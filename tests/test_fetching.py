@@ -0,0 +1,53 @@
+import pytest
+from addressner.sources.fetching import percentile
+
+
+@pytest.mark.parametrize('q, expected', [(0, 1), (20, 1), (50, 3), (60, 3), (95, 5), (99, 5), (100, 5)])
+def test_percentile_nearest_rank(q, expected):
+    assert percentile([5, 3, 1, 4, 2], q) == expected
+
+
+def test_percentile_empty():
+    assert percentile([], 50) == 0.0
+
+
+def test_fetch_cached_keeps_only_queries_in_flight():
+    from asyncio import gather, run, sleep
+    from addressner.sources.fetching import GeocodingClient
+
+    client = GeocodingClient()
+    sent = []
+
+    async def fetch(url):
+        sent.append(url)
+        await sleep(0.01)
+        return {'url': url}
+
+    client.fetch = fetch
+
+    async def main():
+        results = await gather(*[client.fetch_cached(url) for url in ['http://a?q=1', 'http://a?q=1', 'http://a?q=2']])
+        assert not client.queried
+        return results
+
+    assert run(main()) == [{'url': 'http://a?q=1'}, {'url': 'http://a?q=1'}, {'url': 'http://a?q=2'}]
+    assert sent == ['http://a?q=1', 'http://a?q=2'] and client.duplicates == 1
+
+
+def test_unexpected_errors_do_not_cancel_the_batch():
+    from asyncio import run, sleep
+    from addressner.sources.fetching import GeocodingClient
+
+    client = GeocodingClient()
+
+    async def fetch(url):
+        await sleep(0.01)
+        if url.endswith('reset'):
+            raise ConnectionResetError('Connection reset by peer')
+        return {'url': url}
+
+    client.fetch = fetch
+    results = run(client.fetch_all(['http://a?q=1', 'http://a?q=reset', 'http://a?q=reset', 'http://a?q=2']))
+    assert results[0] == {'url': 'http://a?q=1'} and results[3] == {'url': 'http://a?q=2'}
+    assert all(isinstance(result, ConnectionResetError) for result in results[1:3])
+    assert not client.queried
@@ -0,0 +1,24 @@
+from random import Random
+import pytest
+from addressner.sources.fuzzy import match_masks, edit_distance, levenshtein_ratios
+import baseline
+
+
+def random_strings(n, seed):
+    rand = Random(seed)
+    return [''.join(rand.choice('abc d') for _ in range(rand.randrange(12))) for _ in range(n)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_ratios_match_dynamic_programming(seed):
+    tag, *candidates = random_strings(40, seed)
+    assert levenshtein_ratios(tag, candidates) == [baseline.levenshtein(candidate, tag) for candidate in candidates]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_edit_distance_matches_dynamic_programming(seed):
+    strings = random_strings(40, seed)
+    for s, t in zip(strings[::2], strings[1::2]):
+        if s and t:
+            expected = baseline.levenshtein(s, t, ratio_calc=False)
+            assert f'The strings are {edit_distance(match_masks(t), len(t), s)} edits away' == expected
@@ -0,0 +1,38 @@
+from random import Random
+import pytest
+from addressner.sources.address_labelling import identify_features
+from addressner.sources.gazetteer import Gazetteer
+
+
+def leftmost(value, tokens):
+    n = len(value.split())
+    for i in range(len(tokens) - n + 1):
+        if tokens[i:i + n] == value.split():
+            return i, i + n
+    return None
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_find_matches_brute_force(seed):
+    rand = Random(seed)
+    words = ['a', 'b', 'c', 'ab', 'san', 'juan']
+    for _ in range(200):
+        tokens = [rand.choice(words) for _ in range(rand.randrange(12))]
+        values = {' '.join(rand.choice(words) for _ in range(rand.randint(1, 3))) for _ in range(rand.randrange(6))}
+        found = Gazetteer(values).find(tokens)
+        expected = {value: leftmost(value, tokens) for value in values}
+        assert found == {value: span for value, span in expected.items() if span is not None}
+
+
+def test_only_token_boundaries_and_regular_spacing():
+    gazetteer = Gazetteer(['san juan'])
+    assert gazetteer.find('pasan juanes'.split()) == {}
+    assert gazetteer.find('calle san juan 5'.split()) == {'san juan': (1, 3)}
+    assert not gazetteer.add('san  juan') and not gazetteer.add('')
+
+
+def test_identify_features_with_a_shared_gazetteer(labelling_cases, baseline_features):
+    gazetteer = Gazetteer(value for _, _, tags in labelling_cases for value in tags)
+    for (_, sentence, tags), expected in zip(labelling_cases, baseline_features):
+        assert identify_features(sentence, tags) == expected
+        assert identify_features(sentence, tags, gazetteer=gazetteer) == expected
@@ -0,0 +1,48 @@
+from itertools import islice
+from addressner.sources.cleaning import Cleaner
+from addressner.sources.ingest import prefetch, clean_batches, join_fields
+from addressner.sources.instrumentation import INSTRUMENTATION
+
+
+def test_prefetch_yields_everything_and_errors():
+    assert list(prefetch(iter(range(10)), size=2)) == list(range(10))
+
+    def failing():
+        yield 1
+        raise OSError('Broken file')
+
+    batches = prefetch(failing())
+    assert next(batches) == 1
+    try:
+        next(batches)
+        assert False, 'The error of the iterable must be raised'
+    except OSError:
+        pass
+
+
+def test_prefetch_stops_the_producer_when_closed_early():
+    closed = []
+
+    def endless():
+        try:
+            n = 0
+            while True:
+                yield n
+                n += 1
+        finally:
+            closed.append(True)
+
+    batches = prefetch(endless(), size=2)
+    assert list(islice(batches, 3)) == [0, 1, 2]
+    batches.close()
+    assert closed == [True]
+
+
+def test_clean_batches_counts_the_records_kept():
+    INSTRUMENTATION.reset()
+    batches = [[('1', 'Calle Mayor 5', None), ('2', None, 'Madrid')], [('3', 'Gran Vía 1', 'Madrid')]]
+    cleaned = list(clean_batches(batches, Cleaner(additional_info=False), text=lambda record: join_fields(record[1:])))
+    assert [[clean for _, clean in batch] for batch in cleaned] == [['calle mayor 5'], ['gran via 1 madrid']]
+    counts = INSTRUMENTATION.get('cleaning').counts
+    assert (counts['records'], counts['dropped']) == (2, 1)
+    INSTRUMENTATION.reset()
@@ -0,0 +1,78 @@
+from json import load as json_load
+import pytest
+from addressner.sources.instrumentation import bucket, N_BUCKETS, Stage, Instrumentation
+
+
+def test_buckets_are_powers_of_two_of_microseconds():
+    assert bucket(0) == 0
+    assert bucket(1e-6) == 1
+    assert bucket(1.9e-6) == 1
+    assert bucket(2e-6) == 2
+    assert bucket(3e-6) == 2
+    assert bucket(1e9) == N_BUCKETS - 1
+
+
+def test_quantiles_are_bucket_bounds():
+    s = Stage('query')
+    for _ in range(90):
+        s.observe(3e-6)
+    for _ in range(10):
+        s.observe(100e-6)
+    assert s.quantile(0.5) == 4e-6
+    assert s.quantile(0.9) == 4e-6
+    # The bound of the last bucket is capped by the largest latency observed
+    assert s.quantile(0.95) == 100e-6
+    latency = s.report()['latency']
+    assert latency['n'] == 100
+    assert latency['max'] == 100e-6
+    assert latency['mean'] == pytest.approx(12.7e-6)
+    assert latency['histogram_us'] == {'<4': 90, '<128': 10}
+
+
+def test_counts_and_throughput():
+    s = Stage('cleaning')
+    s.count(records=500, bytes=1000)
+    s.count(records=100)
+    s.time = 2.0
+    report = s.report()
+    assert report['counts'] == {'records': 600, 'bytes': 1000}
+    assert report['throughput'] == {'records/s': 300.0, 'bytes/s': 500.0}
+    assert 'latency' not in report
+
+
+def test_stages_and_timed_functions():
+    instrumentation = Instrumentation()
+    for _ in range(2):
+        with instrumentation.stage('tokenisation', docs=3) as s:
+            s.count(bytes=10)
+
+    @instrumentation.timed('ner')
+    def parse(text):
+        return text.upper()
+
+    assert parse('calle') == 'CALLE'
+    instrumentation.count('ner', docs=1)
+    instrumentation.observe('ner', 1e-3)
+
+    stages = instrumentation.report()['stages']
+    assert stages['tokenisation']['calls'] == 2
+    assert stages['tokenisation']['counts'] == {'docs': 6, 'bytes': 20}
+    assert stages['ner']['calls'] == 1
+    assert stages['ner']['counts'] == {'docs': 1}
+    assert stages['ner']['latency']['n'] == 1
+
+
+def test_profiled_stages(tmp_path):
+    instrumentation = Instrumentation(profile={'ner'}, profile_top=5)
+    with instrumentation.stage('ner'):
+        with instrumentation.stage('tokenisation'):
+            sorted(range(1000))
+    path = str(tmp_path / 'reports' / 'run.json')
+    instrumentation.save(path)
+    with open(path, 'r') as f:
+        stages = json_load(f)['stages']
+    assert 0 < len(stages['ner']['profile']) <= 5
+    assert 'profile' not in stages['tokenisation']
+
+    instrumentation.reset()
+    assert instrumentation.report()['stages'] == {}
@@ -0,0 +1,93 @@
+from random import Random
+import pytest
+from addressner.sources.metrics import EntityMetrics
+from addressner.sources.synthetic import synthetic_addresses
+import baseline
+
+
+def records(seed):
+    """
+    :return: gold records of synthetic addresses and predictions with dropped, shifted, relabelled and extra entities
+    """
+    rand = Random(seed)
+    gold = [labelled for lang in ['en', 'es'] for _, _, labelled in synthetic_addresses(100, lang, seed=seed)]
+    gold.append(('', {'entities': []}))
+    pred = []
+    for text, annotations in gold:
+        entities = []
+        for start, end, label in annotations['entities']:
+            r = rand.random()
+            if r < 0.1:
+                continue
+            if r < 0.2:
+                end += 1
+            elif r < 0.3:
+                label = rand.choice(['N', 'S', 'M', 'SP', 'PC', 'C', 'X'])
+            entities.append((start, end, label))
+        if rand.random() < 0.2:
+            entities.append((0, 1, 'N'))
+        pred.append((text, {'entities': list(dict.fromkeys(entities))}))
+    return gold, pred
+
+
+def spacy_scores(gold, pred):
+    """
+    Scores as spaCy's Scorer computes them: sets of (label, start, end) per record, micro and per-label P/R/F in %.
+    """
+    counts = {}
+    for (_, gold_annotations), (_, pred_annotations) in zip(gold, pred):
+        gold_set = set(gold_annotations['entities'])
+        pred_set = set(pred_annotations['entities'])
+        for entity in gold_set | pred_set:
+            count = counts.setdefault(entity[2], [0, 0, 0])
+            count[0] += entity in gold_set and entity in pred_set
+            count[1] += entity in pred_set and entity not in gold_set
+            count[2] += entity in gold_set and entity not in pred_set
+
+    def prf(tp, fp, fn):
+        p = tp / (tp + fp) if tp + fp else 0.0
+        r = tp / (tp + fn) if tp + fn else 0.0
+        return {'p': p * 100, 'r': r * 100, 'f': 2 * p * r / (p + r) * 100 if p + r else 0.0}
+
+    total = [sum(count[i] for count in counts.values()) for i in range(3)]
+    return prf(*total), {label: prf(*count) for label, count in counts.items()}
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_entity_metrics_match_spacy_scores_and_accuracy(seed):
+    gold, pred = records(seed)
+    metrics = EntityMetrics()
+    metrics.update(gold, pred)
+    scores = metrics.scores()
+
+    micro, per_type = spacy_scores(gold, pred)
+    assert (scores['ents_p'], scores['ents_r'], scores['ents_f']) == pytest.approx((micro['p'], micro['r'], micro['f']))
+    assert set(scores['ents_per_type']) == set(per_type)
+    for label, label_scores in per_type.items():
+        assert scores['ents_per_type'][label] == pytest.approx(label_scores)
+    assert scores['acc'] == pytest.approx(baseline.accuracy(gold, pred))
+
+
+def test_batches_and_confusion():
+    gold, pred = records(0)
+    whole = EntityMetrics()
+    whole.update(gold, pred)
+    batched = EntityMetrics()
+    for b in range(0, len(gold), 7):
+        batched.update(gold[b:b + 7], pred[b:b + 7])
+    whole_scores, batched_scores = whole.scores(), batched.scores()
+    for key in ['acc', 'ents_p', 'ents_r', 'ents_f', 'ents_macro_p', 'ents_macro_r', 'ents_macro_f']:
+        assert batched_scores[key] == pytest.approx(whole_scores[key])
+    for label, label_scores in whole_scores['ents_per_type'].items():
+        assert batched_scores['ents_per_type'][label] == pytest.approx(label_scores)
+    assert batched_scores['confusion'] == whole_scores['confusion']
+
+    confusion = {}
+    for (_, gold_annotations), (_, pred_annotations) in zip(gold, pred):
+        gold_labels = {entity[:2]: entity[2] for entity in gold_annotations['entities']}
+        pred_labels = {entity[:2]: entity[2] for entity in pred_annotations['entities']}
+        for span in gold_labels.keys() | pred_labels.keys():
+            row = confusion.setdefault(gold_labels.get(span, ''), {})
+            column = pred_labels.get(span, '')
+            row[column] = row.get(column, 0) + 1
+    assert whole.scores()['confusion'] == confusion
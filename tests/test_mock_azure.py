@@ -0,0 +1,29 @@
+from random import Random
+from addressner.sources.mock_azure import MockAzureMaps
+from addressner.sources.synthetic import synthetic_address
+
+
+def test_payload_fields_of_synthetic_addresses():
+    rand = Random(0)
+    for lang in ['en', 'es']:
+        for _ in range(50):
+            _, values, (clean, _) = synthetic_address(rand, lang)
+            number, street, municipality, subdivision, postal_code, country = values
+            address = MockAzureMaps.payload(clean)['results'][0]['address']
+            assert address['streetNumber'] == number
+            assert address['streetName'] == street
+            assert address['municipality'] == municipality
+            assert address['countrySubdivisionName'] == subdivision
+            assert address['postalCode'] == postal_code
+            assert address['country'] == country
+
+
+def test_payload_unknown_places():
+    address = MockAzureMaps.payload('calle mayor 5 28013 getafe madrid espana')['results'][0]['address']
+    assert address['municipality'] == 'getafe'
+    assert (address['countrySubdivision'], address['countrySubdivisionName']) == ('MA', 'madrid')
+    assert (address['country'], address['countryCode']) == ('espana', 'ES')
+
+    # A single word before the country is the municipality
+    address = MockAzureMaps.payload('calle mayor 5 getafe espana')['results'][0]['address']
+    assert (address['municipality'], address['countrySubdivisionName']) == ('getafe', '')
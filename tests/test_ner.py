@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip('spacy')
+
+
+def test_train_grid_seeds_every_job(monkeypatch):
+    from addressner.sources import ner
+    seeds = {}
+
+    def train_job(task):
+        name, _, _, kwargs = task
+        seeds[name] = kwargs['seed']
+        return name, 0.0
+
+    monkeypatch.setattr(ner, 'train_job', train_job)
+    jobs = [('en_0', 'en', 'train.ner'), ('en_1', 'en', 'train.ner'), ('es_0', 'es', 'train.ner')]
+    ner.train_grid(jobs, n_jobs=1, seed=10, shuffle=True)
+    assert seeds == {'en_0': 10, 'en_1': 11, 'es_0': 12}
+    ner.train_grid(jobs, n_jobs=1)
+    assert set(seeds.values()) == {None}
+
+
+def test_fine_tune_fixes_the_seed(monkeypatch):
+    from addressner.sources import ner
+    seeds = []
+
+    def spacy_load(path):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(ner, 'fix_random_seed', seeds.append)
+    monkeypatch.setattr(ner, 'spacy_load', spacy_load)
+    with pytest.raises(FileNotFoundError):
+        ner.fine_tune([], 'en_0', path='models', seed=7)
+    assert seeds == [7]
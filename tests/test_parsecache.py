@@ -0,0 +1,87 @@
+import pytest
+from addressner.sources.parsecache import ParseCache, cached_parse
+
+
+def test_cached_parse_dedupes_and_counts():
+    cache = ParseCache(max_size=10)
+    calls = []
+
+    def parse(texts):
+        calls.append(list(texts))
+        return [[(0, len(text), 'S')] for text in texts]
+
+    assert cached_parse(['a', 'bb', 'a'], parse, cache) == [[(0, 1, 'S')], [(0, 2, 'S')], [(0, 1, 'S')]]
+    assert cached_parse(['bb', 'ccc'], parse, cache) == [[(0, 2, 'S')], [(0, 3, 'S')]]
+    assert calls == [['a', 'bb'], ['ccc']]
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['duplicates']) == (1, 3, 1)
+
+
+def test_spill_and_model_switch(tmp_path):
+    path = str(tmp_path / 'parses.sqlite')
+    with ParseCache(max_size=1, path=path, model='en/en_0@0.0.0') as cache:
+        cache.put('a', [(0, 1, 'S')])
+        cache.put('b', [(0, 1, 'N')])
+        assert cache.get('a') == [(0, 1, 'S')]
+        assert cache.stats()['disk_hits'] == 1
+        cache.set_model('en/en_1@0.0.0')
+        assert cache.get('a') is None and cache.get('b') is None
+    with ParseCache(max_size=1, path=path, model='en/en_0@0.0.0') as cache:
+        assert cache.get('b') == [(0, 1, 'N')]
+
+
+def test_registry_models_have_different_keys(tmp_path):
+    spacy = pytest.importorskip('spacy')
+    from addressner.sources.parsecache import model_key
+    from addressner.sources.registry import ModelRegistry
+
+    for name in ['en_0', 'en_1']:
+        nlp = spacy.blank('en')
+        nlp.meta['name'] = name
+        nlp.vocab.vectors.name = name
+        nlp.add_pipe(nlp.create_pipe('ner'))
+        nlp.begin_training()
+        nlp.to_disk(str(tmp_path / name))
+
+    registry = ModelRegistry(str(tmp_path) + '/', max_models=2)
+    en_0, en_1 = registry['en_0'], registry['en_1']
+    assert en_0.vocab is en_1.vocab
+    assert model_key(en_0) != model_key(en_1)
+
+
+def test_weights_saved_again_change_the_key(tmp_path):
+    from types import SimpleNamespace
+    from addressner.sources.parsecache import model_key
+
+    (tmp_path / 'ner').mkdir()
+    weights = tmp_path / 'ner' / 'model'
+    weights.write_bytes(b'old weights')
+    meta = {'lang': 'en', 'name': 'model', 'version': '0.0.0'}
+    old = model_key(SimpleNamespace(meta=meta, path=tmp_path))
+    weights.write_bytes(b'new weights, trained again')
+    new = model_key(SimpleNamespace(meta=meta, path=tmp_path))
+    assert old != new
+    assert model_key(SimpleNamespace(meta={**meta, 'training_id': 'a'})) != model_key(SimpleNamespace(meta=meta))
+
+    with ParseCache(path=str(tmp_path / 'parses.sqlite'), model=old) as cache:
+        cache.put('calle mayor 5', [(0, 11, 'S')])
+    with ParseCache(path=str(tmp_path / 'parses.sqlite'), model=new) as cache:
+        assert cache.get('calle mayor 5') is None
+
+
+def test_retrained_model_misses_the_cache(tmp_path):
+    spacy = pytest.importorskip('spacy')
+    from addressner.sources.ner import address_ner
+    from addressner.sources.parsecache import model_key
+
+    data = [('calle mayor 5', {'entities': [(0, 11, 'S'), (12, 13, 'N')]})]
+    keys = []
+    for _ in range(2):
+        address_ner(data, entities=['S', 'N'], name='model', progress=False, path=str(tmp_path))
+        keys.append(model_key(spacy.load(str(tmp_path / 'model'))))
+    assert keys[0] != keys[1]
+
+    with ParseCache(path=str(tmp_path / 'parses.sqlite'), model=keys[0]) as cache:
+        cache.put('calle mayor 5', [(0, 11, 'S')])
+    with ParseCache(path=str(tmp_path / 'parses.sqlite'), model=keys[1]) as cache:
+        assert cache.get('calle mayor 5') is None
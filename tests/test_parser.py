@@ -0,0 +1,21 @@
+import pytest
+
+spacy = pytest.importorskip('spacy')
+
+
+def test_post_rejects_bodies_that_are_not_objects():
+    from asyncio import run
+    from aiohttp.test_utils import TestClient, TestServer
+    from addressner.sources.parser import AddressParser, make_app
+
+    nlp = spacy.blank('en')
+    nlp.add_pipe(nlp.create_pipe('ner'))
+    nlp.begin_training()
+
+    async def main():
+        async with TestClient(TestServer(make_app(AddressParser(nlp)))) as client:
+            statuses = [(await client.post('/parse', json=body)).status for body in [['calle mayor 5'], 'calle', 5]]
+            ok = await client.post('/parse', json={'address': 'calle mayor 5'})
+            return statuses, ok.status
+
+    assert run(main()) == ([400, 400, 400], 200)
@@ -0,0 +1,34 @@
+from json import dump as json_dump
+from addressner.sources.sink import ResultsSink, ResultsReader, import_slices
+
+
+def test_import_slices(tmp_path):
+    for start in [0, 4]:
+        with open(tmp_path / f'AMr_{start}-{start + 2}.json', 'w') as f:
+            json_dump([{'row': start}, {'row': start + 1}], f)
+    path = str(tmp_path / 'AMr.jsonl')
+    with ResultsSink(path) as sink:
+        sink.write(1, {'row': 'queried'})
+        assert import_slices(str(tmp_path), sink, n_rows=6, slice_size=2, progress=False) == 3
+
+    results = ResultsReader(path)
+    assert [results[i] for i in range(6)] == [{'row': 0}, {'row': 'queried'}, None, None, {'row': 4}, {'row': 5}]
+    results.close()
+
+    # Importing again does not duplicate rows
+    with ResultsSink(path) as sink:
+        assert import_slices(str(tmp_path), sink, n_rows=6, slice_size=2, progress=False) == 0
+
+
+def test_only_dict_results_are_done(tmp_path):
+    path = str(tmp_path / 'AMr.jsonl')
+    results = [{'results': []}, None, 'oops', [1, 2], {'error': 'ClientError: 500'}]
+    with ResultsSink(path) as sink:
+        for index, result in enumerate(results):
+            sink.write(index, result)
+        assert sink.done == {0}
+    with ResultsSink(path) as sink:
+        assert sink.done == {0}
+    reader = ResultsReader(path)
+    assert [reader[i] for i in range(len(results))] == results
+    reader.close()
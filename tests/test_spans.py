@@ -0,0 +1,46 @@
+from random import Random
+import pytest
+from addressner.sources.address_labelling import address_labelling
+from addressner.sources.spans import SpanIndex, token_offsets
+import baseline
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_span_index_matches_brute_force(seed):
+    rand = Random(seed)
+    index = SpanIndex()
+    spans = []
+    for _ in range(300):
+        start = rand.randrange(100)
+        end = start + rand.randint(1, 8)
+        overlaps = any(min(end, e) > max(start, s) for s, e in spans)
+        assert index.overlaps(start, end) == overlaps
+        if not overlaps:
+            index.add(start, end)
+            spans.append((start, end))
+    assert len(index) == len(spans)
+
+
+def test_token_offsets():
+    assert token_offsets(' calle  mayor 5 ') == [(1, 6), (8, 13), (14, 15)]
+
+
+def test_address_labelling_matches_baseline(labelling_cases):
+    for entities, sentence, tags in labelling_cases:
+        assert address_labelling(entities, sentence, tags) == baseline.address_labelling(entities, sentence, tags)
+
+
+def test_repeated_values():
+    entities = ['M', 'SP', 'C']
+    sentence = 'calle mayor 5 buenos aires buenos aires argentina'
+    tags = ['buenos aires', 'buenos aires', 'argentina']
+    assert address_labelling(entities, sentence, tags) == baseline.address_labelling(entities, sentence, tags)
+
+
+def test_repeated_tokens_hide_overlapping_occurrences():
+    entities = ['N', 'S', 'M']
+    sentence = 'a juan calle calle calle 5'
+    tags = ['5', 'calle', 'calle calle']
+    labelled = address_labelling(entities, sentence, tags)
+    assert labelled == ('a juan calle calle calle 5', {'entities': [(25, 26, 'N'), (7, 12, 'S')]})
+    assert labelled == baseline.address_labelling(entities, sentence, tags)
@@ -0,0 +1,53 @@
+import pytest
+from numpy import array_equal, concatenate, sort, arange
+from addressner.sources.corpus import write_corpus
+from addressner.sources.splits import Splits
+
+DATA = [(f'calle {i}', {'entities': [(0, 5, 'S'), (6, 6 + len(str(i)), 'N')]}) for i in range(103)]
+
+
+@pytest.fixture
+def corpus_path(tmp_path):
+    path = str(tmp_path / 'data.ner')
+    write_corpus(DATA, path)
+    return path
+
+
+@pytest.mark.parametrize('kfold', [False, True])
+def test_splits_partition_the_corpus(corpus_path, kfold):
+    splits = Splits(corpus_path, n_splits=5, train_ratio=0.7, kfold=kfold, seed=3)
+    tests = []
+    for k in range(len(splits)):
+        train, test = splits.indices(k)
+        assert array_equal(sort(concatenate([train, test])), arange(len(DATA)))
+        assert list(splits.test(k)) == [DATA[i] for i in test]
+        assert splits.train(k)[:3] == [DATA[i] for i in train[:3]]
+        assert list(splits.test(k).texts()) == [DATA[i][0] for i in test]
+        tests.append(test)
+        if not kfold:
+            assert len(train) == round(0.7 * len(DATA))
+    if kfold:
+        assert array_equal(sort(concatenate(tests)), arange(len(DATA)))
+    with pytest.raises(IndexError):
+        splits.indices(5)
+    splits.close()
+
+
+@pytest.mark.parametrize('kfold', [False, True])
+def test_save_load_round_trip(corpus_path, tmp_path, kfold):
+    splits = Splits(corpus_path, n_splits=3, kfold=kfold, seed=7)
+    splits.save(str(tmp_path / 'splits.json'))
+    loaded = Splits.load(str(tmp_path / 'splits.json'))
+    for k in range(3):
+        for saved_indices, loaded_indices in zip(splits.indices(k), loaded.indices(k)):
+            assert array_equal(saved_indices, loaded_indices)
+    assert array_equal(Splits(corpus_path, n_splits=3, kfold=kfold, seed=7).assignments, loaded.assignments)
+    splits.close()
+    loaded.close()
+
+
+def test_splits_must_match_the_corpus(corpus_path, tmp_path):
+    other = str(tmp_path / 'other.ner')
+    write_corpus(DATA[:10], other)
+    with pytest.raises(ValueError):
+        Splits(other, assignments=Splits(corpus_path).assignments)